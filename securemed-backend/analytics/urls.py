@@ -8,6 +8,7 @@ urlpatterns = [
     path('staff/', views.get_staff, name='staff'),
     path('alerts/', views.get_alerts, name='alerts'),
     path('audit-logs/', views.get_audit_logs, name='audit_logs'),
+    path('metrics/', views.get_metrics, name='metrics'),
     
     # Clinical Analytics (Epic 8 Story 8.1)
     path('analytics/', views.get_analytics, name='analytics'),
@@ -562,19 +562,75 @@ def health_check(request):
 @permission_classes([IsAuthenticated])
 def get_audit_logs(request):
     """
-    Returns the content of privacy_audit.log.
+    Returns entries from privacy_audit.log, newest first.
     GET /api/admin/audit-logs/
+
+    Optional query params: user_id, hours (look-back window) or since/until
+    (ISO 8601), page (from 1) and page_size (default 100, max 500).
     """
-    log_file_path = os.path.join(settings.BASE_DIR, 'privacy_audit.log')
-    logs = []
+    from django.utils.dateparse import parse_datetime
+    from authentication.audit import audit_stats
+    from authentication.audit_reader import AuditLogReader
+
+    params = request.query_params
+    bounds = {}
     try:
-        if os.path.exists(log_file_path):
-            with open(log_file_path, 'r') as f:
-                # Read last 100 lines for performance
-                lines = f.readlines()
-                logs = [line.strip() for line in lines[-100:]]
-                logs.reverse() # Newest first
-    except Exception as e:
-        print(f"Error reading audit log: {e}")
-        
-    return Response({'logs': logs})
+        for name in ('since', 'until'):
+            if params.get(name):
+                value = parse_datetime(params[name])
+                if value is None:
+                    raise ValueError(f"Invalid {name} datetime")
+                if timezone.is_naive(value):
+                    value = timezone.make_aware(value)
+                bounds[name] = value
+        if params.get('hours') and 'since' not in bounds:
+            try:
+                bounds['since'] = timezone.now() - timedelta(hours=float(params['hours']))
+            except OverflowError:
+                raise ValueError("hours is out of range")
+        page = int(params.get('page', 1))
+        page_size = int(params.get('page_size', 100))
+    except ValueError as e:
+        return Response({'error': str(e)}, status=400)
+
+    result = AuditLogReader(settings.PRIVACY_AUDIT_LOG).query(
+        user_id=params.get('user_id') or None,
+        page=page,
+        page_size=page_size,
+        **bounds,
+    )
+    return Response({
+        'logs': [entry.line for entry in result.entries],
+        'entries': [entry.as_dict() for entry in result.entries],
+        'page': result.page,
+        'page_size': result.page_size,
+        'has_next': result.has_next,
+        'pipeline': audit_stats(),
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_metrics(request):
+    """
+    Returns in-process counters for the shared infrastructure clients.
+    GET /api/admin/metrics/
+
+    Values are per worker process.
+    """
+    from authentication.audit import audit_stats
+    from authentication.blacklist import get_blacklist_filter
+    from authentication.captcha import get_captcha_client
+    from authentication.hashing import get_hashing_executor
+    from consents.cache import get_consent_cache
+    from core.ratelimit import get_rate_limiter
+
+    return Response({
+        'pid': os.getpid(),
+        'audit_pipeline': audit_stats(),
+        'password_hashing': get_hashing_executor().stats(),
+        'recaptcha': get_captcha_client().stats(),
+        'jwt_blacklist_filter': get_blacklist_filter().stats(),
+        'rate_limits': get_rate_limiter().stats(),
+        'consent_cache': get_consent_cache().stats(),
+    })
@@ -6,10 +6,21 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from django.utils import timezone
-from datetime import datetime, timedelta
+from datetime import datetime, time
 
 from departments.models import Doctor
-from .models import Appointment
+from .bitmaps import search
+from .slots import doctor_slots
+
+MAX_SEARCH_DAYS = 60
+MAX_SEARCH_RESULTS = 50
+
+# period -> (after, before) for slot search
+PERIODS = {
+    'morning': (None, time(12, 0)),
+    'afternoon': (time(12, 0), time(17, 0)),
+    'evening': (time(17, 0), None),
+}
 
 
 @api_view(['GET'])
@@ -18,6 +29,9 @@ def get_doctor_availability(request, doctor_id):
     """
     Get available time slots for a specific doctor on a given date.
     
+    Slots follow the doctor's DoctorSchedule for that weekday (see
+    appointments.slots).
+    
     GET /api/appointments/doctors/{doctor_id}/availability/?date=2026-02-10
     
     Response:
@@ -26,8 +40,8 @@ def get_doctor_availability(request, doctor_id):
         "doctor_name": "Dr. Smith",
         "date": "2026-02-10",
         "slots": [
-            {"time": "09:00", "available": true},
-            {"time": "09:30", "available": false},
+            {"time": "09:00", "end_time": "09:30", "available": true},
+            {"time": "09:30", "end_time": "10:00", "available": false},
             ...
         ]
     }
@@ -56,34 +70,19 @@ def get_doctor_availability(request, doctor_id):
         )
     
     try:
-        doctor = Doctor.objects.get(id=doctor_id)
+        doctor = Doctor.objects.select_related('user').get(id=doctor_id)
     except Doctor.DoesNotExist:
         return Response(
             {'error': 'Doctor not found'},
             status=status.HTTP_404_NOT_FOUND
         )
     
-    # Get existing appointments for this doctor on this date
-    existing_appointments = Appointment.objects.filter(
-        doctor=doctor,
-        appointment_date=date,
-        status__in=['scheduled', 'confirmed']
-    ).values_list('appointment_time', flat=True)
-    
-    booked_times = set(str(t)[:5] for t in existing_appointments)
-    
-    # Generate time slots (9 AM to 5 PM, 30-minute intervals)
-    slots = []
-    current_time = datetime.strptime('09:00', '%H:%M')
-    end_time = datetime.strptime('17:00', '%H:%M')
-    
-    while current_time < end_time:
-        time_str = current_time.strftime('%H:%M')
-        slots.append({
-            'time': time_str,
-            'available': time_str not in booked_times
-        })
-        current_time += timedelta(minutes=30)
+    # Slots from the doctor's schedule, minus booked appointments (two queries)
+    slots = [{
+        'time': slot.start.strftime('%H:%M'),
+        'end_time': slot.end.strftime('%H:%M'),
+        'available': slot.available
+    } for slot in doctor_slots(doctor.id, date)]
     
     return Response({
         'doctor_id': doctor.id,
@@ -110,7 +109,7 @@ def get_available_doctors(request):
         ]
     }
     """
-    doctors = Doctor.objects.select_related('user').all()
+    doctors = Doctor.objects.select_related('user', 'department').all()
     
     doctor_list = [{
         'id': doctor.id,
@@ -120,3 +119,121 @@ def get_available_doctors(request):
     } for doctor in doctors]
     
     return Response({'doctors': doctor_list})
+
+
+
+def _int_param(request, name, default, maximum):
+    value = request.query_params.get(name, default)
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{name} must be a number')
+    if not 1 <= value <= maximum:
+        raise ValueError(f'{name} must be between 1 and {maximum}')
+    return value
+
+
+def _time_param(request, name):
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%H:%M').time()
+    except ValueError:
+        raise ValueError(f'Invalid {name} format. Use HH:MM')
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def search_available_slots(request):
+    """
+    Earliest free slots across doctors and days.
+    
+    Served from the precomputed slot bitmaps (appointments.bitmaps), so a
+    search over hundreds of doctors and weeks does not read appointments.
+    
+    GET /api/appointments/slots/search/?specialty=cardiology&days=14&period=morning&limit=10
+    
+    Query parameters (all optional):
+        specialty   doctor specialization
+        department  department code
+        start_date  YYYY-MM-DD, default today
+        days        days to search from start_date (default 14, max 60)
+        period      morning (before 12:00), afternoon (12:00-17:00) or
+                    evening (from 17:00)
+        after       HH:MM, earliest slot start (overrides period)
+        before      HH:MM, slots must start before this (overrides period)
+        limit       number of slots (default 10, max 50)
+    
+    Response:
+    {
+        "start_date": "2026-02-10",
+        "days": 14,
+        "slots": [
+            {"doctor_id": 3, "doctor_name": "Dr. Smith", "specialty": "cardiology",
+             "department": "Cardiology", "date": "2026-02-10", "time": "09:00", "end_time": "09:30"},
+            ...
+        ]
+    }
+    """
+    params = request.query_params
+    today = timezone.localdate()
+    start_date = today
+    if params.get('start_date'):
+        try:
+            start_date = datetime.strptime(params['start_date'], '%Y-%m-%d').date()
+        except ValueError:
+            return Response(
+                {'error': 'Invalid start_date format. Use YYYY-MM-DD'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+    
+    period = params.get('period')
+    if period and period not in PERIODS:
+        return Response(
+            {'error': f"period must be one of: {', '.join(PERIODS)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        days = _int_param(request, 'days', 14, MAX_SEARCH_DAYS)
+        limit = _int_param(request, 'limit', 10, MAX_SEARCH_RESULTS)
+        after, before = PERIODS.get(period, (None, None))
+        after = _time_param(request, 'after') or after
+        before = _time_param(request, 'before') or before
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    if start_date < today:
+        return Response(
+            {'error': 'Cannot search availability for past dates'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    doctors = Doctor.objects.filter(is_active=True, is_available=True)
+    if params.get('specialty'):
+        doctors = doctors.filter(specialization__iexact=params['specialty'])
+    if params.get('department'):
+        doctors = doctors.filter(department__code__iexact=params['department'])
+    
+    found = search(doctors, start_date, days, after=after, before=before, limit=limit)
+    found_doctors = Doctor.objects.select_related('user', 'department').in_bulk({slot.doctor_id for slot in found})
+    
+    slots = []
+    for slot in found:
+        doctor = found_doctors[slot.doctor_id]
+        slots.append({
+            'doctor_id': doctor.id,
+            'doctor_name': f"Dr. {doctor.user.last_name}",
+            'specialty': doctor.specialization,
+            'department': doctor.department.name if doctor.department else None,
+            'date': str(slot.date),
+            'time': slot.start.strftime('%H:%M'),
+            'end_time': slot.end.strftime('%H:%M'),
+        })
+    
+    return Response({
+        'start_date': str(start_date),
+        'days': days,
+        'slots': slots
+    })
\ No newline at end of file
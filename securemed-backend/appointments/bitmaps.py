@@ -0,0 +1,234 @@
+"""
+Slot bitmaps: precomputed free slots for searching across doctors and days.
+
+Each SlotBitmap row holds one doctor's free slots on one date as a 1440-bit
+bitmap, bit m set when a free slot (appointments.slots) starts at minute m.
+search() answers "the earliest N free slots for these doctors in the next D
+days, between these times" from the bitmaps alone, without reading the
+appointments table: one query for the doctors, one counting their stored
+days, one reading bitmaps day by day until enough slots are found, and one
+for the schedules of the doctors it returns.
+
+Keeping the bitmaps current:
+
+- Saving or deleting an Appointment recomputes the bitmaps of its doctor and
+  date, and of its previous doctor and date when it was rescheduled, once
+  the transaction commits (receivers below). The recompute locks the bitmap
+  rows, so concurrent bookings for the same day are applied in turn.
+- Saving or deleting a DoctorSchedule recomputes that doctor's future rows.
+- Days nobody has searched yet are built on first search; the
+  build_slot_bitmaps command precomputes a horizon and prunes past days.
+  A build only inserts missing rows: an existing row may hold a refresh()
+  that committed after the build read the appointments.
+
+Bulk queryset.update() calls on Appointment send no signals; callers that
+change dates, times, durations or statuses that way call refresh().
+"""
+from collections import namedtuple
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from departments.models import Doctor, DoctorSchedule
+
+from .models import Appointment, SlotBitmap
+from .slots import _minutes, _time, blocks_for, booked_intervals, compute_slots, load_schedules
+
+MINUTES_PER_DAY = 24 * 60
+BITMAP_BYTES = MINUTES_PER_DAY // 8
+
+FoundSlot = namedtuple('FoundSlot', ['doctor_id', 'date', 'start', 'end'])
+
+
+def encode(slots):
+    """Bitmap bytes for one day's slots."""
+    bits = 0
+    for slot in slots:
+        if slot.available:
+            bits |= 1 << _minutes(slot.start)
+    return bits.to_bytes(BITMAP_BYTES, 'little')
+
+
+def decode(data):
+    return int.from_bytes(bytes(data), 'little')
+
+
+def window_mask(after=None, before=None):
+    """Bits of the slots starting at or after `after` and before `before`."""
+    low = _minutes(after) if after else 0
+    high = _minutes(before) if before else MINUTES_PER_DAY
+    if high <= low:
+        return 0
+    return (1 << high) - (1 << low)
+
+
+def compute_bitmaps(pairs):
+    """
+    Bitmap bytes for each (doctor_id, date) pair, from DoctorSchedule and
+    Appointment; two queries.
+    """
+    pairs = set(pairs)
+    if not pairs:
+        return {}
+    doctor_ids = {doctor_id for doctor_id, _ in pairs}
+    dates = [date for _, date in pairs]
+    schedules = load_schedules(doctor_ids)
+    booked = booked_intervals(doctor_ids, min(dates), max(dates))
+    return {
+        (doctor_id, date): encode(compute_slots(blocks_for(schedules[doctor_id], date), booked.get((doctor_id, date), [])))
+        for doctor_id, date in pairs
+    }
+
+
+def build(doctor_ids, start_date, days):
+    """
+    Compute and store the missing bitmaps of these doctors for `days` days.
+    Stored rows are left as they are; refresh() recomputes those.
+    """
+    dates = [start_date + timedelta(days=offset) for offset in range(days)]
+    bitmaps = compute_bitmaps((doctor_id, date) for doctor_id in doctor_ids for date in dates)
+    SlotBitmap.objects.bulk_create(
+        [SlotBitmap(doctor_id=doctor_id, date=date, free=free) for (doctor_id, date), free in bitmaps.items()],
+        ignore_conflicts=True,
+        batch_size=500,
+    )
+    return bitmaps
+
+
+def refresh(pairs):
+    """
+    Recompute the stored bitmaps for these (doctor_id, date) pairs; past
+    dates are skipped. Call after the appointment change has committed.
+    """
+    today = timezone.localdate()
+    pairs = {(doctor_id, date) for doctor_id, date in pairs if date >= today}
+    if not pairs:
+        return
+    # The change may have been the doctor's deletion cascading to appointments
+    doctor_ids = set(Doctor.objects.filter(id__in={doctor_id for doctor_id, _ in pairs}).values_list('id', flat=True))
+    pairs = {(doctor_id, date) for doctor_id, date in pairs if doctor_id in doctor_ids}
+    if not pairs:
+        return
+    with transaction.atomic():
+        # Create missing rows, then lock them all: a recompute that started
+        # later waits here and reads the appointments committed meanwhile.
+        SlotBitmap.objects.bulk_create(
+            [SlotBitmap(doctor_id=doctor_id, date=date, free=b'') for doctor_id, date in pairs],
+            ignore_conflicts=True,
+        )
+        rows = {
+            (row.doctor_id, row.date): row
+            for row in SlotBitmap.objects.select_for_update().filter(
+                doctor_id__in=doctor_ids,
+                date__in={date for _, date in pairs},
+            ).only('pk', 'doctor_id', 'date')
+        }
+        bitmaps = compute_bitmaps(pairs)
+        now = timezone.now()
+        for pair, free in bitmaps.items():
+            rows[pair].free = free
+            rows[pair].updated_at = now
+        SlotBitmap.objects.bulk_update([rows[pair] for pair in bitmaps], ['free', 'updated_at'])
+
+
+def refresh_doctor(doctor_id):
+    """Recompute every stored future bitmap of one doctor."""
+    dates = SlotBitmap.objects.filter(doctor_id=doctor_id, date__gte=timezone.localdate()).values_list('date', flat=True)
+    refresh((doctor_id, date) for date in dates)
+
+
+def search(doctors, start_date, days, after=None, before=None, limit=10, now=None):
+    """
+    The earliest `limit` free slots of `doctors` (a Doctor queryset) from
+    start_date for `days` days, starting between `after` and `before`, as
+    FoundSlots ordered by date, time and doctor. Slots that already started
+    today are left out.
+    """
+    now = timezone.localtime(now)
+    end_date = start_date + timedelta(days=days - 1)
+    doctor_ids = set(doctors.values_list('id', flat=True))
+    rows = SlotBitmap.objects.filter(doctor_id__in=doctor_ids, date__range=(start_date, end_date))
+
+    # Build the days nobody has searched (or built) yet
+    stored = dict(rows.values('date').annotate(doctors=Count('id')).values_list('date', 'doctors'))
+    if any(stored.get(start_date + timedelta(days=offset)) != len(doctor_ids) for offset in range(days)):
+        present = set(rows.values_list('doctor_id', 'date'))
+        missing = {
+            doctor_id
+            for doctor_id in doctor_ids
+            for offset in range(days)
+            if (doctor_id, start_date + timedelta(days=offset)) not in present
+        }
+        build(missing, start_date, days)
+
+    window = window_mask(after, before)
+    found = []
+    current_date = None
+    # Read a day of bitmaps at a time, and stop once a day has filled `limit`:
+    # every slot on a later day comes after the ones found so far.
+    for doctor_id, date, free in rows.order_by('date', 'doctor_id').values_list(
+        'doctor_id', 'date', 'free'
+    ).iterator(chunk_size=max(len(doctor_ids), 1)):
+        if date != current_date:
+            if len(found) >= limit:
+                break
+            current_date = date
+            mask = window
+            if date == now.date():
+                mask &= ~((1 << (now.hour * 60 + now.minute + 1)) - 1)
+            elif date < now.date():
+                mask = 0
+        bits = decode(free) & mask
+        taken = 0
+        while bits and taken < limit:
+            lowest = bits & -bits
+            found.append((date, lowest.bit_length() - 1, doctor_id))
+            bits ^= lowest
+            taken += 1
+    found = sorted(found)[:limit]
+
+    schedules = load_schedules({doctor_id for _, _, doctor_id in found})
+    return [
+        FoundSlot(doctor_id, date, _time(minute), _time(_slot_end(schedules[doctor_id], date, minute)))
+        for date, minute, doctor_id in found
+    ]
+
+
+def _slot_end(schedule, date, minute):
+    for block in blocks_for(schedule, date):
+        if _minutes(block.start) <= minute < _minutes(block.end):
+            return (minute + block.slot_duration) % MINUTES_PER_DAY
+    return minute
+
+
+def _slot_day(appointment):
+    # Dates assigned as strings stay strings on the instance after save
+    return appointment.doctor_id, Appointment._meta.get_field('appointment_date').to_python(appointment.appointment_date)
+
+
+@receiver(pre_save, sender=Appointment)
+def _remember_slot_day(sender, instance, **kwargs):
+    # A reschedule frees the old doctor and date
+    instance._slot_days = {_slot_day(instance)}
+    if instance.pk:
+        instance._slot_days.update(
+            Appointment.objects.filter(pk=instance.pk).values_list('doctor_id', 'appointment_date')
+        )
+
+
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+def _refresh_slot_day(sender, instance, **kwargs):
+    pairs = getattr(instance, '_slot_days', {_slot_day(instance)})
+    transaction.on_commit(lambda: refresh(pairs))
+
+
+@receiver(post_save, sender=DoctorSchedule)
+@receiver(post_delete, sender=DoctorSchedule)
+def _refresh_doctor_schedule(sender, instance, **kwargs):
+    doctor_id = instance.doctor_id
+    transaction.on_commit(lambda: refresh_doctor(doctor_id))
@@ -0,0 +1,182 @@
+"""
+Slot holds: reserve a slot, then confirm the booking within
+SLOT_HOLD_SECONDS.
+
+When a popular calendar opens, many patients go for the same slots at once.
+reserve() settles each slot with a single INSERT into slot_holds: its
+unique (doctor, date, time) index lets exactly one patient in, and the
+database makes a concurrent insert of the same slot wait for the first to
+commit and then fail. The losers get SlotUnavailable (409) straight away,
+before any booking work, and can try another slot. Most never get as far as
+the INSERT: a slot already booked or held is refused on reads alone.
+
+confirm() locks the hold row (SELECT ... FOR UPDATE), so a confirm racing a
+release or another confirm of the same hold runs once. It turns the hold
+into an Appointment in the same transaction.
+
+Bookings that skip the hold (a direct POST of an appointment) go through
+the same index: hold_for_booking() inserts a hold for the slot inside the
+booking's transaction and the booking deletes it again before committing,
+so a concurrent reserve() waits for the booking and then finds the slot
+taken, and a booking that meets someone else's hold gets SlotUnavailable.
+
+A hold lapses at expires_at. Lapsed holds are ignored everywhere, and
+reserve() deletes the doctor's lapsed holds before inserting, so a patient
+who walks away frees the slot without a separate sweeper. A patient has at
+most one hold: reserving another slot releases the previous one, with the
+patient row locked so two reserves by one patient run one after the other.
+"""
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotFound, ValidationError
+
+from patients.models import Patient
+
+from .models import Appointment, SlotHold
+from .slots import _minutes, doctor_slots
+
+
+class SlotUnavailable(APIException):
+    """The slot is booked or held by another patient."""
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'This slot is no longer available. Please choose another time.'
+    default_code = 'slot_unavailable'
+
+
+class HoldExpired(APIException):
+    """The hold lapsed before it was confirmed."""
+    status_code = status.HTTP_410_GONE
+    default_detail = 'Your hold on this slot has expired. Please choose a slot again.'
+    default_code = 'hold_expired'
+
+
+def is_held_by_other(doctor, date, start_time, patient):
+    """True when another patient holds this slot right now."""
+    return SlotHold.objects.filter(
+        doctor=doctor, appointment_date=date, appointment_time=start_time, expires_at__gt=timezone.now()
+    ).exclude(patient=patient).exists()
+
+
+def hold_for_booking(patient, doctor, date, start_time):
+    """
+    Hold the slot for a direct booking; call inside the booking's
+    transaction and delete the returned hold once the appointment is saved.
+
+    Raises SlotUnavailable when another patient holds the slot. The
+    patient's own hold is returned (and used up by the booking).
+    """
+    now = timezone.now()
+    SlotHold.objects.filter(
+        doctor=doctor, appointment_date=date, appointment_time=start_time, expires_at__lte=now
+    ).delete()
+    try:
+        with transaction.atomic():
+            return SlotHold.objects.create(
+                doctor=doctor,
+                patient=patient,
+                appointment_date=date,
+                appointment_time=start_time,
+                expires_at=now + timedelta(seconds=settings.SLOT_HOLD_SECONDS),
+            )
+    except IntegrityError:
+        hold = SlotHold.objects.select_for_update().filter(
+            doctor=doctor, appointment_date=date, appointment_time=start_time, patient=patient
+        ).first()
+        if hold is None:
+            raise SlotUnavailable()
+        return hold
+
+
+def reserve(patient, doctor, date, start_time):
+    """
+    Hold the doctor's slot starting at start_time for the patient.
+
+    Raises ValidationError when start_time is not a slot in the doctor's
+    schedule, and SlotUnavailable when the slot is booked or held.
+    """
+    slot = next((slot for slot in doctor_slots(doctor.id, date) if slot.start == start_time), None)
+    if slot is None:
+        raise ValidationError({'appointment_time': "Not a slot in the doctor's schedule"})
+    # Most of a burst loses here, on reads alone, without writing anything
+    if not slot.available or is_held_by_other(doctor, date, start_time, patient):
+        raise SlotUnavailable()
+
+    now = timezone.now()
+    with transaction.atomic():
+        # Nothing in slot_holds stops a patient holding two slots; the second
+        # of two concurrent reserves waits here and then deletes the first hold
+        list(Patient.objects.select_for_update().filter(pk=patient.pk).values_list('pk', flat=True))
+        # Lapsed holds free their slots, and the patient's previous hold goes
+        SlotHold.objects.filter(doctor=doctor, expires_at__lte=now).delete()
+        SlotHold.objects.filter(patient=patient).exclude(
+            doctor=doctor, appointment_date=date, appointment_time=start_time
+        ).delete()
+        try:
+            with transaction.atomic():
+                hold = SlotHold.objects.create(
+                    doctor=doctor,
+                    patient=patient,
+                    appointment_date=date,
+                    appointment_time=start_time,
+                    duration=(_minutes(slot.end) - _minutes(slot.start)) % (24 * 60),
+                    expires_at=now + timedelta(seconds=settings.SLOT_HOLD_SECONDS),
+                )
+        except IntegrityError:
+            # Someone holds it already: the patient asking again keeps their hold
+            hold = SlotHold.objects.filter(
+                doctor=doctor, appointment_date=date, appointment_time=start_time, patient=patient
+            ).first()
+            if hold is None:
+                raise SlotUnavailable()
+            return hold
+        # A confirm may have turned the previous hold into an appointment
+        # after the slot check above; it committed before our insert got in.
+        if Appointment.objects.filter(
+            doctor=doctor, appointment_date=date, appointment_time=start_time
+        ).exclude(status='cancelled').exists():
+            raise SlotUnavailable()
+        return hold
+
+
+def confirm(hold_id, patient, reason, notes='', created_by=None):
+    """
+    Book the patient's held slot; returns the Appointment.
+
+    Raises NotFound for an unknown or released hold, HoldExpired when it
+    lapsed, and SlotUnavailable if the slot was booked around the hold.
+    """
+    with transaction.atomic():
+        hold = SlotHold.objects.select_for_update().filter(pk=hold_id, patient=patient).first()
+        if hold is None:
+            raise NotFound('Hold not found. It may have been released or taken over after expiring.')
+        expired = hold.expires_at <= timezone.now()
+        appointment = None
+        if not expired:
+            try:
+                with transaction.atomic():
+                    appointment = Appointment.objects.create(
+                        appointment_id=f"APT-{uuid.uuid4().hex[:8].upper()}",
+                        patient=patient,
+                        doctor_id=hold.doctor_id,
+                        appointment_date=hold.appointment_date,
+                        appointment_time=hold.appointment_time,
+                        duration=hold.duration,
+                        reason=reason,
+                        notes=notes,
+                        created_by=created_by,
+                    )
+            except IntegrityError:
+                pass
+        # The hold is used up either way; raise after the delete commits
+        hold.delete()
+
+    if expired:
+        raise HoldExpired()
+    if appointment is None:
+        raise SlotUnavailable()
+    return appointment
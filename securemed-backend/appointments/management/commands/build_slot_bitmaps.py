@@ -0,0 +1,70 @@
+"""
+Management command that precomputes the slot search bitmaps.
+
+Builds the SlotBitmap rows of every active doctor for the next --days days
+and deletes the rows of past days (appointments.bitmaps). Appointment and
+schedule changes keep existing rows current, so run this once a day (cron or
+another scheduler) to add the day entering the horizon, or with --rebuild
+after bulk changes that sent no signals. --rebuild recomputes through
+refresh(), which locks the rows, so it can run while bookings are made.
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.utils import timezone
+
+from appointments.bitmaps import build, refresh
+from appointments.models import SlotBitmap
+from departments.models import Doctor
+
+
+class Command(BaseCommand):
+    help = 'Precompute slot search bitmaps and prune past days'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=30,
+            help='Days from today to precompute (default: 30)',
+        )
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Recompute existing rows too instead of only adding missing ones',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Doctors computed per batch (default: 100)',
+        )
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        days = options['days']
+        pruned, _ = SlotBitmap.objects.filter(date__lt=today).delete()
+
+        doctors = Doctor.objects.filter(is_active=True)
+        if not options['rebuild']:
+            # Doctors missing at least one day of the horizon
+            complete = SlotBitmap.objects.filter(
+                date__range=(today, today + timedelta(days=days - 1))
+            ).values('doctor_id').annotate(
+                days=Count('id')
+            ).filter(days=days).values('doctor_id')
+            doctors = doctors.exclude(id__in=complete)
+        doctor_ids = list(doctors.order_by('id').values_list('id', flat=True))
+
+        batch_size = options['batch_size']
+        for i in range(0, len(doctor_ids), batch_size):
+            batch = doctor_ids[i:i + batch_size]
+            if options['rebuild']:
+                refresh((doctor_id, today + timedelta(days=offset)) for doctor_id in batch for offset in range(days))
+            else:
+                build(batch, today, days)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Built {days} day(s) for {len(doctor_ids)} doctor(s); pruned {pruned} past row(s)'
+        ))
@@ -0,0 +1,47 @@
+"""
+Management command that queues appointment reminders.
+
+Scans the 24h and 2h reminder buckets (appointments.reminders) and queues
+the due reminders in the email outbox, which dispatch_outbox delivers.
+Polls by default; several copies can run at once, each claiming its own
+batches. Use --once from cron or another scheduler.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from appointments.reminders import DEFAULT_BATCH_SIZE, schedule_reminders
+
+
+class Command(BaseCommand):
+    help = 'Queue 24h and 2h appointment reminders that are due'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Queue what is due now and exit instead of polling',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=f'Appointments claimed per transaction (default: {DEFAULT_BATCH_SIZE})',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=60.0,
+            help='Seconds to sleep between scans',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            queued = schedule_reminders(batch_size=options['batch_size'])
+            if any(queued.values()) or options['once']:
+                self.stdout.write(', '.join(f'{count} {kind} reminder(s)' for kind, count in queued.items()) + ' queued')
+            if options['once']:
+                break
+            time.sleep(options['interval'])
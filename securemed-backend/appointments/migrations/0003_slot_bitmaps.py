@@ -0,0 +1,30 @@
+# Generated by Django 6.0.2 on 2026-10-17 05:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0002_add_referral_model'),
+        ('departments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlotBitmap',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('free', models.BinaryField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slot_bitmaps', to='departments.doctor')),
+            ],
+            options={
+                'db_table': 'slot_bitmaps',
+                'indexes': [models.Index(fields=['date', 'doctor'], name='slot_bitmap_date_53f8fd_idx')],
+                'unique_together': {('doctor', 'date')},
+            },
+        ),
+    ]
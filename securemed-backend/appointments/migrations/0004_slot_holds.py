@@ -0,0 +1,58 @@
+# Generated by Django 6.0.2 on 2026-10-17 05:18
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0003_slot_bitmaps'),
+        ('departments', '0001_initial'),
+        ('patients', '0002_add_wellness_tip'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlotHold',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('appointment_date', models.DateField()),
+                ('appointment_time', models.TimeField()),
+                ('duration', models.IntegerField(default=30, help_text='Duration in minutes')),
+                ('expires_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'slot_holds',
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='appointment',
+            unique_together=set(),
+        ),
+        migrations.AddConstraint(
+            model_name='appointment',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'cancelled'), _negated=True), fields=('doctor', 'appointment_date', 'appointment_time'), name='appointments_doctor_slot_uniq'),
+        ),
+        migrations.AddField(
+            model_name='slothold',
+            name='doctor',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slot_holds', to='departments.doctor'),
+        ),
+        migrations.AddField(
+            model_name='slothold',
+            name='patient',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slot_holds', to='patients.patient'),
+        ),
+        migrations.AddIndex(
+            model_name='slothold',
+            index=models.Index(fields=['doctor', 'expires_at'], name='slot_holds_doctor__4f91fc_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='slothold',
+            unique_together={('doctor', 'appointment_date', 'appointment_time')},
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 6.0.2 on 2026-10-17 09:55
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_appointment_start(apps, schema_editor):
+    # Existing reminders were for the appointment's current start
+    Appointment = apps.get_model('appointments', 'Appointment')
+    AppointmentReminder = apps.get_model('appointments', 'AppointmentReminder')
+    appointment = Appointment.objects.filter(pk=OuterRef('appointment_id'))
+    AppointmentReminder.objects.update(
+        appointment_date=Subquery(appointment.values('appointment_date')[:1]),
+        appointment_time=Subquery(appointment.values('appointment_time')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0005_appointment_reminders'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='appointmentreminder',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='appointmentreminder',
+            name='appointment_date',
+            field=models.DateField(null=True),
+        ),
+        migrations.AddField(
+            model_name='appointmentreminder',
+            name='appointment_time',
+            field=models.TimeField(null=True),
+        ),
+        migrations.RunPython(copy_appointment_start, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='appointmentreminder',
+            name='appointment_date',
+            field=models.DateField(),
+        ),
+        migrations.AlterField(
+            model_name='appointmentreminder',
+            name='appointment_time',
+            field=models.TimeField(),
+        ),
+        migrations.AlterUniqueTogether(
+            name='appointmentreminder',
+            unique_together={('appointment', 'kind', 'appointment_date', 'appointment_time')},
+        ),
+    ]
@@ -40,12 +40,86 @@ class Appointment(models.Model):
             models.Index(fields=['doctor', 'appointment_date']),
             models.Index(fields=['status', 'appointment_date']),
         ]
-        unique_together = ['doctor', 'appointment_date', 'appointment_time']
+        constraints = [
+            # A cancelled appointment frees its slot for rebooking
+            models.UniqueConstraint(
+                fields=['doctor', 'appointment_date', 'appointment_time'],
+                condition=~models.Q(status='cancelled'),
+                name='appointments_doctor_slot_uniq',
+            ),
+        ]
     
     def __str__(self):
         return f"{self.appointment_id} - {self.patient.patient_id} with Dr. {self.doctor.user.last_name}"
 
 
+class AppointmentReminder(models.Model):
+    """
+    A reminder the scheduler (appointments.reminders) has queued for an
+    appointment; at most one per appointment, kind and start time, so a
+    rescheduled appointment is reminded of its new time.
+    """
+    appointment = models.ForeignKey(Appointment, on_delete=models.CASCADE, related_name='reminders')
+    kind = models.CharField(max_length=10)
+    # The appointment's start when the reminder was queued
+    appointment_date = models.DateField()
+    appointment_time = models.TimeField()
+    queued_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'appointment_reminders'
+        unique_together = ['appointment', 'kind', 'appointment_date', 'appointment_time']
+
+    def __str__(self):
+        return f"{self.appointment.appointment_id} {self.kind} reminder"
+
+
+class SlotHold(models.Model):
+    """
+    A patient's short lease on one slot (appointments.holds): until it is
+    confirmed, released or expires, nobody else can hold or book the slot.
+    """
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='slot_holds')
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='slot_holds')
+    appointment_date = models.DateField()
+    appointment_time = models.TimeField()
+    duration = models.IntegerField(default=30, help_text="Duration in minutes")
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'slot_holds'
+        unique_together = ['doctor', 'appointment_date', 'appointment_time']
+        indexes = [
+            models.Index(fields=['doctor', 'expires_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.doctor_id} {self.appointment_date} {self.appointment_time} held until {self.expires_at}"
+
+
+class SlotBitmap(models.Model):
+    """
+    A doctor's free slots on one date, precomputed for slot search
+    (appointments.bitmaps): bit m of `free` is set when a free slot starts at
+    minute m of the day.
+    """
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='slot_bitmaps')
+    date = models.DateField()
+    free = models.BinaryField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'slot_bitmaps'
+        unique_together = ['doctor', 'date']
+        indexes = [
+            models.Index(fields=['date', 'doctor']),
+        ]
+
+    def __str__(self):
+        return f"{self.doctor_id} on {self.date}"
+
+
 class AppointmentHistory(models.Model):
     appointment = models.ForeignKey(Appointment, on_delete=models.CASCADE, related_name='history')
     status = models.CharField(max_length=20)
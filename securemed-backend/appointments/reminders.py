@@ -0,0 +1,133 @@
+"""
+Appointment reminder scheduler.
+
+Reminders go out in time buckets before each appointment (REMINDER_BUCKETS):
+the 24h reminder for appointments starting between 2 and 24 hours from now,
+the 2h reminder for those starting within 2 hours. An appointment that
+enters a bucket late (booked 5 hours ahead, or while the scheduler was down)
+gets only the reminders whose bucket it is still in.
+
+schedule_reminders() scans each bucket through the (status,
+appointment_date) index and claims batches of due appointments: in one
+transaction it locks them (skipping rows another worker has locked), records
+an AppointmentReminder per appointment and queues the emails in the outbox.
+The reminders are looked up again once the rows are locked, so a batch
+another worker committed meanwhile is dropped rather than sent twice.
+A crash before the commit leaves nothing behind to retry over; after it, the
+AppointmentReminder rows keep any worker from queueing them again, and the
+outbox dedupe keys would drop a duplicate anyway. Both record the start time
+the reminder was for, so an appointment rescheduled after its reminders gets
+them again for the new time. The outbox dispatcher
+(core.outbox) sends each batch over one SMTP connection.
+
+SMS reminders are sent after the commit, so a crash can lose one but never
+repeat it.
+"""
+import logging
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from core.notifications import NotificationService
+from core.outbox import enqueue_emails
+
+from .models import Appointment, AppointmentReminder
+from .slots import ACTIVE_STATUSES
+
+logger = logging.getLogger(__name__)
+
+# (kind, lead time), longest lead first
+REMINDER_BUCKETS = [
+    ('24h', timedelta(hours=24)),
+    ('2h', timedelta(hours=2)),
+]
+DEFAULT_BATCH_SIZE = 200
+
+
+def _starts_between(start, end):
+    """Appointments starting after `start` and at or before `end` (local datetimes)."""
+    after = Q(appointment_date__gt=start.date()) | Q(appointment_date=start.date(), appointment_time__gt=start.time())
+    until = Q(appointment_date__lt=end.date()) | Q(appointment_date=end.date(), appointment_time__lte=end.time())
+    return Q(appointment_date__range=(start.date(), end.date())) & after & until
+
+
+def due_reminders(kind, now=None):
+    """Appointments in the `kind` bucket that have not had that reminder for their current start."""
+    now = timezone.localtime(now).replace(tzinfo=None)
+    leads = dict(REMINDER_BUCKETS)
+    shorter = [lead for _, lead in REMINDER_BUCKETS if lead < leads[kind]]
+    window_start = now + max(shorter, default=timedelta(0))
+    return Appointment.objects.filter(
+        _starts_between(window_start, now + leads[kind]),
+        status__in=ACTIVE_STATUSES,
+    ).exclude(
+        Exists(AppointmentReminder.objects.filter(
+            appointment=OuterRef('pk'), kind=kind,
+            appointment_date=OuterRef('appointment_date'), appointment_time=OuterRef('appointment_time'),
+        ))
+    )
+
+
+def _already_reminded(appointments, kind):
+    """The pks of `appointments` whose `kind` reminder for their current start is recorded."""
+    starts = {appointment.pk: (appointment.appointment_date, appointment.appointment_time)
+              for appointment in appointments}
+    return {
+        pk for pk, date, start_time in AppointmentReminder.objects.filter(
+            appointment_id__in=starts, kind=kind,
+        ).values_list('appointment_id', 'appointment_date', 'appointment_time')
+        if starts[pk] == (date, start_time)
+    }
+
+
+def claim_batch(kind, now=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Queue one batch of `kind` reminders; returns the appointments claimed,
+    or None when none were due.
+    """
+    with transaction.atomic():
+        appointments = list(
+            due_reminders(kind, now)
+            .select_for_update(skip_locked=True, of=('self',))
+            .select_related('patient__user', 'doctor__user')
+            .order_by('appointment_date', 'appointment_time')[:batch_size]
+        )
+        if not appointments:
+            return None
+        # The lock doesn't re-run the NOT EXISTS: a worker that committed
+        # these reminders while our SELECT ran has released the rows to us
+        reminded = _already_reminded(appointments, kind)
+        appointments = [appointment for appointment in appointments if appointment.pk not in reminded]
+        if not appointments:
+            return []
+        AppointmentReminder.objects.bulk_create(
+            [
+                AppointmentReminder(
+                    appointment=appointment, kind=kind, appointment_date=appointment.appointment_date,
+                    appointment_time=appointment.appointment_time,
+                )
+                for appointment in appointments
+            ],
+            ignore_conflicts=True,
+        )
+        enqueue_emails([
+            NotificationService.appointment_reminder_email(appointment, kind, now) for appointment in appointments
+        ])
+    return appointments
+
+
+def schedule_reminders(now=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Queue every due reminder; returns {kind: number queued}."""
+    queued = {}
+    for kind, _ in REMINDER_BUCKETS:
+        queued[kind] = 0
+        while True:
+            appointments = claim_batch(kind, now, batch_size)
+            if appointments is None:
+                break
+            queued[kind] += len(appointments)
+            for appointment in appointments:
+                NotificationService.send_appointment_sms_reminder(appointment)
+    return queued
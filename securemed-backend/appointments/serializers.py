@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Doctor, Appointment, AppointmentHistory, Referral
+from .models import Doctor, Appointment, AppointmentHistory, Referral, SlotHold
 from departments.models import Department
 from django.contrib.auth import get_user_model
 
@@ -64,6 +64,21 @@ class AppointmentSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
+class SlotHoldSerializer(serializers.ModelSerializer):
+    """A patient's hold on a slot; confirm it before expires_at."""
+    class Meta:
+        model = SlotHold
+        fields = ['id', 'doctor', 'appointment_date', 'appointment_time', 'duration', 'expires_at']
+        read_only_fields = ['id', 'duration', 'expires_at']
+        # Conflicts are settled by appointments.holds.reserve, not a pre-check
+        validators = []
+
+
+class HoldConfirmSerializer(serializers.Serializer):
+    reason = serializers.CharField()
+    notes = serializers.CharField(required=False, allow_blank=True, default='')
+
+
 class ReferralSerializer(serializers.ModelSerializer):
     """Serializer for Story 3.4: Patient Assignment"""
     patient_name = serializers.SerializerMethodField()
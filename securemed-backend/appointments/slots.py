@@ -0,0 +1,136 @@
+"""
+Slot engine: a doctor's bookable slots from DoctorSchedule and Appointment.
+
+A doctor works one or more DoctorSchedule blocks per weekday. Each block is
+cut into slots of its slot_duration, starting at its start_time; a slot that
+would run past the block's end_time is dropped. A slot is free unless it
+overlaps the interval [appointment_time, appointment_time + duration) of a
+scheduled or confirmed appointment, so a 60 minute appointment takes two 30
+minute slots and one at 09:15 takes both the 09:00 and 09:30 slots.
+
+Doctors without any active schedule keep the old fixed hours
+(DEFAULT_SCHEDULE, every day); a doctor with a schedule but no block on some
+weekday has no slots that day.
+
+Loading slots for any number of doctors and consecutive days takes two
+queries: the schedules, and the booked intervals for the date range.
+"""
+from collections import defaultdict, namedtuple
+from datetime import time, timedelta
+
+from departments.models import DoctorSchedule
+
+from .models import Appointment
+
+# Appointments in these states occupy their slot
+ACTIVE_STATUSES = ('scheduled', 'confirmed')
+
+# (start_time, end_time, slot_duration in minutes)
+Block = namedtuple('Block', ['start', 'end', 'slot_duration'])
+Slot = namedtuple('Slot', ['start', 'end', 'available'])
+
+DEFAULT_SCHEDULE = [Block(time(9, 0), time(17, 0), 30)]
+
+
+def _minutes(value):
+    return value.hour * 60 + value.minute
+
+
+def _time(minutes):
+    return time(minutes // 60, minutes % 60)
+
+
+def load_schedules(doctor_ids):
+    """
+    doctor_id -> {weekday: list of Blocks}, or None for a doctor without an
+    active schedule (who works DEFAULT_SCHEDULE every day). One query.
+    """
+    blocks = {doctor_id: defaultdict(list) for doctor_id in doctor_ids}
+    schedules = DoctorSchedule.objects.filter(doctor_id__in=blocks, is_active=True).order_by('weekday', 'start_time')
+    for doctor_id, weekday, start, end, slot_duration in schedules.values_list(
+        'doctor_id', 'weekday', 'start_time', 'end_time', 'slot_duration'
+    ):
+        blocks[doctor_id][weekday].append(Block(start, end, slot_duration))
+    return {doctor_id: dict(days) or None for doctor_id, days in blocks.items()}
+
+
+def blocks_for(schedule, date):
+    if schedule is None:
+        return DEFAULT_SCHEDULE
+    return schedule.get(date.weekday(), [])
+
+
+def booked_intervals(doctor_ids, start_date, end_date):
+    """
+    (doctor_id, date) -> merged, sorted (start, end) minute intervals taken by
+    active appointments between start_date and end_date inclusive. One query.
+    """
+    raw = defaultdict(list)
+    appointments = Appointment.objects.filter(
+        doctor_id__in=doctor_ids,
+        appointment_date__range=(start_date, end_date),
+        status__in=ACTIVE_STATUSES,
+    ).values_list('doctor_id', 'appointment_date', 'appointment_time', 'duration')
+    for doctor_id, date, start_time, duration in appointments:
+        start = _minutes(start_time)
+        raw[doctor_id, date].append((start, start + max(duration, 1)))
+    return {key: merge_intervals(intervals) for key, intervals in raw.items()}
+
+
+def merge_intervals(intervals):
+    """Sort and merge overlapping or touching (start, end) intervals."""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def compute_slots(blocks, booked):
+    """
+    Slots for one day.
+
+    Args:
+        blocks: the day's schedule Blocks
+        booked: merged, sorted (start, end) minute intervals
+    """
+    slots = []
+    for block in sorted(blocks):
+        start, end, step = _minutes(block.start), _minutes(block.end), block.slot_duration
+        # Booked intervals are sorted, so one pass per block finds every overlap
+        i = 0
+        for slot_start in range(start, end - step + 1, step):
+            slot_end = slot_start + step
+            while i < len(booked) and booked[i][1] <= slot_start:
+                i += 1
+            available = i == len(booked) or booked[i][0] >= slot_end
+            slots.append(Slot(_time(slot_start), _time(slot_end % (24 * 60)), available))
+    return slots
+
+
+def doctors_slots_range(doctor_ids, start_date, days):
+    """
+    (doctor_id, date) -> slots for each doctor on `days` consecutive days
+    from start_date; two queries whatever the number of doctors.
+    """
+    dates = [start_date + timedelta(days=offset) for offset in range(days)]
+    schedules = load_schedules(doctor_ids)
+    booked = booked_intervals(doctor_ids, dates[0], dates[-1])
+    return {
+        (doctor_id, date): compute_slots(blocks_for(schedule, date), booked.get((doctor_id, date), []))
+        for doctor_id, schedule in schedules.items()
+        for date in dates
+    }
+
+
+def doctor_slots_range(doctor_id, start_date, days):
+    """date -> slots for `days` consecutive days from start_date; two queries."""
+    slots = doctors_slots_range([doctor_id], start_date, days)
+    return {date: day_slots for (_, date), day_slots in slots.items()}
+
+
+def doctor_slots(doctor_id, date):
+    """The doctor's slots on one date; two queries."""
+    return doctor_slots_range(doctor_id, date, 1)[date]
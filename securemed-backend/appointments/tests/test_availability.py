@@ -0,0 +1,218 @@
+import os
+from datetime import time, timedelta
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from appointments.bitmaps import build, decode, search
+from appointments.models import Appointment, SlotBitmap
+from appointments.slots import Block, compute_slots, doctor_slots, merge_intervals
+from authentication.models import User
+from departments.models import Department, Doctor, DoctorSchedule
+from patients.models import Patient
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class SlotEngineTest(TestCase):
+    """Slots from DoctorSchedule minus booked intervals, in constant queries."""
+
+    def setUp(self):
+        dept = Department.objects.create(
+            name='Cardiology', code='CARD', floor=1, building='A', phone='1234567890', email='card@test.com'
+        )
+        self.doctor_user = User.objects.create_user(
+            username='slot_doctor', email='slot_doctor@test.com', password='testpass123',
+            first_name='John', last_name='Doe', role='doctor'
+        )
+        self.doctor = Doctor.objects.create(
+            user=self.doctor_user, doctor_id='DOC-SLOT-001', specialization='cardiology',
+            license_number='LIC-SLOT-001', qualification='MD', experience_years=10,
+            department=dept, consultation_fee=500.00, phone='1234567890'
+        )
+        patient_user = User.objects.create_user(
+            username='slot_patient', email='slot_patient@test.com', password='testpass123', role='patient'
+        )
+        self.patient = Patient.objects.create(
+            user=patient_user, patient_id='P-SLOT-001', date_of_birth='1990-01-01', gender='F'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(patient_user)
+        self.date = timezone.now().date() + timedelta(days=7)
+
+    def book(self, at, duration=30, status='scheduled'):
+        return Appointment.objects.create(
+            appointment_id=f'APT-{at.replace(":", "")}-{duration}', patient=self.patient, doctor=self.doctor,
+            appointment_date=self.date, appointment_time=at, duration=duration, reason='Checkup', status=status,
+        )
+
+    def test_interval_arithmetic(self):
+        self.assertEqual(merge_intervals([(60, 90), (0, 30), (20, 45), (90, 100)]), [(0, 45), (60, 100)])
+        slots = compute_slots(
+            [Block(time(9, 0), time(11, 0), 30)],
+            merge_intervals([(9 * 60 + 15, 10 * 60)]),  # 09:15-10:00
+        )
+        self.assertEqual(
+            [(slot.start.strftime('%H:%M'), slot.available) for slot in slots],
+            [('09:00', False), ('09:30', False), ('10:00', True), ('10:30', True)],
+        )
+
+    def test_schedule_and_durations_decide_slots(self):
+        DoctorSchedule.objects.create(doctor=self.doctor, weekday=self.date.weekday(),
+                                      start_time='08:00', end_time='10:00', slot_duration=20)
+        DoctorSchedule.objects.create(doctor=self.doctor, weekday=self.date.weekday(),
+                                      start_time='14:00', end_time='15:00', slot_duration=30)
+        self.book('08:20', duration=40)
+        self.book('14:00', status='cancelled')
+
+        slots = doctor_slots(self.doctor.id, self.date)
+        self.assertEqual(
+            [(slot.start.strftime('%H:%M'), slot.available) for slot in slots],
+            [('08:00', True), ('08:20', False), ('08:40', False), ('09:00', True), ('09:20', True),
+             ('09:40', True), ('14:00', True), ('14:30', True)],
+        )
+        # A weekday without a block is a day off
+        self.assertEqual(doctor_slots(self.doctor.id, self.date + timedelta(days=1)), [])
+
+    def test_doctor_without_schedule_keeps_default_hours(self):
+        self.book('10:00', duration=60)
+        response = self.client.get(f'/api/appointments/doctors/{self.doctor.id}/availability/',
+                                   {'date': str(self.date)})
+        slots = response.data['slots']
+        self.assertEqual((slots[0]['time'], slots[-1]['time'], len(slots)), ('09:00', '16:30', 16))
+        self.assertEqual([s['time'] for s in slots if not s['available']], ['10:00', '10:30'])
+
+    def test_both_endpoints_use_constant_queries(self):
+        def queries(url, params):
+            with CaptureQueriesContext(connection) as captured:
+                response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            return len(captured.captured_queries)
+
+        urls = [f'/api/appointments/doctors/{self.doctor.id}/available_slots/',
+                f'/api/appointments/doctors/{self.doctor.id}/availability/']
+        empty = [queries(url, {'date': str(self.date)}) for url in urls]
+        for hour in range(9, 17):
+            self.book(f'{hour:02d}:00')
+        self.assertEqual([queries(url, {'date': str(self.date)}) for url in urls], empty)
+        self.assertEqual(empty, [3, 3])
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class SlotSearchTest(TestCase):
+    """First-available search over slot bitmaps kept current by signals."""
+
+    def setUp(self):
+        self.dept = Department.objects.create(
+            name='Cardiology', code='CARD', floor=1, building='A', phone='1234567890', email='card@test.com'
+        )
+        self.date = timezone.localdate() + timedelta(days=7)
+        self.doctors = [self.make_doctor(i, 'cardiology') for i in range(3)]
+        self.make_doctor(9, 'neurology')
+        patient_user = User.objects.create_user(
+            username='search_patient', email='search_patient@test.com', password='testpass123', role='patient'
+        )
+        self.patient = Patient.objects.create(
+            user=patient_user, patient_id='P-SEARCH-001', date_of_birth='1990-01-01', gender='F'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(patient_user)
+
+    def make_doctor(self, i, specialization):
+        user = User.objects.create_user(
+            username=f'search_doctor{i}', email=f'search_doctor{i}@test.com', password='testpass123',
+            last_name=f'Doc{i}', role='doctor'
+        )
+        return Doctor.objects.create(
+            user=user, doctor_id=f'DOC-SEARCH-{i}', specialization=specialization,
+            license_number=f'LIC-SEARCH-{i}', qualification='MD', experience_years=10,
+            department=self.dept, consultation_fee=500.00, phone='1234567890'
+        )
+
+    def book(self, doctor, at, date=None, duration=30):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Appointment.objects.create(
+                appointment_id=f'APT-{doctor.id}-{at.replace(":", "")}', patient=self.patient, doctor=doctor,
+                appointment_date=date or self.date, appointment_time=at, duration=duration, reason='Checkup',
+            )
+
+    def free_times(self, doctor, date=None):
+        bits = decode(SlotBitmap.objects.get(doctor=doctor, date=date or self.date).free)
+        return [f'{m // 60:02d}:{m % 60:02d}' for m in range(24 * 60) if bits >> m & 1]
+
+    def test_bitmaps_follow_bookings_cancellations_and_reschedules(self):
+        doctor = self.doctors[0]
+        appointment = self.book(doctor, '09:00', duration=60)
+        self.assertEqual(self.free_times(doctor)[:2], ['10:00', '10:30'])
+        self.assertEqual(len(self.free_times(doctor)), 14)
+
+        # Reschedule to the next day frees the old day and takes the new one
+        with self.captureOnCommitCallbacks(execute=True):
+            appointment.appointment_date = self.date + timedelta(days=1)
+            appointment.save()
+        self.assertEqual(len(self.free_times(doctor)), 16)
+        self.assertNotIn('09:00', self.free_times(doctor, self.date + timedelta(days=1)))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            appointment.status = 'cancelled'
+            appointment.save()
+        self.assertIn('09:00', self.free_times(doctor, self.date + timedelta(days=1)))
+
+        # A new schedule recomputes the doctor's stored days
+        with self.captureOnCommitCallbacks(execute=True):
+            DoctorSchedule.objects.create(doctor=doctor, weekday=self.date.weekday(),
+                                          start_time='13:00', end_time='14:00', slot_duration=20)
+        self.assertEqual(self.free_times(doctor), ['13:00', '13:20', '13:40'])
+
+    def test_search_returns_earliest_slots_across_doctors(self):
+        for doctor in self.doctors:
+            self.book(doctor, '09:00', date=self.date)
+        self.book(self.doctors[1], '09:30', date=self.date)
+        params = {'specialty': 'cardiology', 'start_date': str(self.date), 'days': 14,
+                  'period': 'morning', 'limit': 4}
+        # The first search builds the missing days
+        self.client.get('/api/appointments/slots/search/', params)
+
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get('/api/appointments/slots/search/', params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(s['doctor_name'], s['date'], s['time'], s['end_time']) for s in response.data['slots']],
+            [('Dr. Doc0', str(self.date), '09:30', '10:00'), ('Dr. Doc2', str(self.date), '09:30', '10:00'),
+             ('Dr. Doc0', str(self.date), '10:00', '10:30'), ('Dr. Doc1', str(self.date), '10:00', '10:30')],
+        )
+        sql = [query['sql'] for query in captured.captured_queries]
+        self.assertFalse([q for q in sql if '"appointments"' in q])
+        self.assertEqual(len(sql), 5)
+
+        response = self.client.get('/api/appointments/slots/search/', {**params, 'after': '16:00', 'period': ''})
+        self.assertEqual({s['time'] for s in response.data['slots']}, {'16:00', '16:30'})
+        response = self.client.get('/api/appointments/slots/search/', {'period': 'night'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_search_skips_past_slots_today(self):
+        today = timezone.localdate()
+        now = timezone.localtime().replace(hour=12, minute=10)
+        found = search(Doctor.objects.filter(pk=self.doctors[0].pk), today, 1, limit=2, now=now)
+        self.assertEqual([slot.start for slot in found], [time(12, 30), time(13, 0)])
+
+    def test_build_command_precomputes_and_prunes(self):
+        SlotBitmap.objects.create(doctor=self.doctors[0], date=timezone.localdate() - timedelta(days=1), free=b'')
+        call_command('build_slot_bitmaps', days=3, stdout=open(os.devnull, 'w'))
+        self.assertEqual(SlotBitmap.objects.count(), 4 * 3)
+        self.assertFalse(SlotBitmap.objects.filter(date__lt=timezone.localdate()).exists())
+
+        stale = SlotBitmap.objects.filter(doctor=self.doctors[0], date=timezone.localdate())
+        stale.update(free=b'')
+        call_command('build_slot_bitmaps', days=3, rebuild=True, stdout=open(os.devnull, 'w'))
+        self.assertNotEqual(bytes(stale.get().free), b'')
+
+    def test_build_leaves_stored_rows_alone(self):
+        # As written by a refresh() that committed while the build computed
+        SlotBitmap.objects.create(doctor=self.doctors[0], date=self.date, free=b'refreshed')
+        build([self.doctors[0].pk], self.date, 2)
+        self.assertEqual(bytes(SlotBitmap.objects.get(doctor=self.doctors[0], date=self.date).free), b'refreshed')
+        self.assertTrue(SlotBitmap.objects.filter(doctor=self.doctors[0], date=self.date + timedelta(days=1)).exists())
@@ -0,0 +1,141 @@
+from datetime import time, timedelta
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from appointments.holds import hold_for_booking
+from appointments.models import Appointment, SlotHold
+from authentication.models import User
+from departments.models import Department, Doctor
+from patients.models import Patient
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'], SLOT_HOLD_SECONDS=120)
+class SlotHoldTest(TestCase):
+    """Reserve-then-confirm booking and 409s for contended slots."""
+
+    def setUp(self):
+        dept = Department.objects.create(
+            name='Cardiology', code='CARD', floor=1, building='A', phone='1234567890', email='card@test.com'
+        )
+        doctor_user = User.objects.create_user(
+            username='hold_doctor', email='hold_doctor@test.com', password='testpass123',
+            last_name='Doe', role='doctor'
+        )
+        self.doctor = Doctor.objects.create(
+            user=doctor_user, doctor_id='DOC-HOLD-001', specialization='cardiology',
+            license_number='LIC-HOLD-001', qualification='MD', experience_years=10,
+            department=dept, consultation_fee=500.00, phone='1234567890'
+        )
+        self.alice, self.alice_client = self.make_patient('alice')
+        self.bob, self.bob_client = self.make_patient('bob')
+        self.date = str(timezone.now().date() + timedelta(days=3))
+
+    def make_patient(self, name):
+        user = User.objects.create_user(
+            username=f'hold_{name}', email=f'hold_{name}@test.com', password='testpass123', role='patient'
+        )
+        patient = Patient.objects.create(
+            user=user, patient_id=f'P-HOLD-{name}', date_of_birth='1990-01-01', gender='F'
+        )
+        client = APIClient()
+        client.force_authenticate(user)
+        return patient, client
+
+    def hold(self, client, at='10:00'):
+        return client.post('/api/appointments/holds/', {
+            'doctor': self.doctor.id, 'appointment_date': self.date, 'appointment_time': at,
+        })
+
+    def book(self, client, at='10:00'):
+        return client.post('/api/appointments/appointments/', {
+            'doctor': self.doctor.id, 'appointment_date': self.date, 'appointment_time': at, 'reason': 'Checkup',
+        })
+
+    def test_hold_then_confirm(self):
+        response = self.hold(self.alice_client)
+        self.assertEqual(response.status_code, 201)
+        hold_id = response.data['id']
+        self.assertEqual(response.data['duration'], 30)
+
+        # The slot is Alice's until she confirms or the hold lapses
+        self.assertEqual(self.hold(self.bob_client).status_code, 409)
+        self.assertEqual(self.book(self.bob_client).status_code, 409)
+        # Asking again keeps her hold
+        self.assertEqual(self.hold(self.alice_client).data['id'], hold_id)
+
+        with mock.patch('core.notifications.NotificationService.send_appointment_confirmation') as confirmation:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.alice_client.post(f'/api/appointments/holds/{hold_id}/confirm/',
+                                                  {'reason': 'Chest pain'})
+        self.assertEqual(response.status_code, 201)
+        confirmation.assert_called_once()
+        appointment = Appointment.objects.get(appointment_id=response.data['appointment_id'])
+        self.assertEqual((appointment.patient, appointment.reason), (self.alice, 'Chest pain'))
+        self.assertFalse(SlotHold.objects.exists())
+        self.assertEqual(self.hold(self.bob_client).status_code, 409)
+
+        # Another patient's hold is invisible, released ones are gone
+        response = self.hold(self.bob_client, at='11:00')
+        self.assertEqual(self.alice_client.post(f"/api/appointments/holds/{response.data['id']}/confirm/",
+                                                {'reason': 'x'}).status_code, 404)
+        self.assertEqual(self.bob_client.delete(f"/api/appointments/holds/{response.data['id']}/").status_code, 204)
+        self.assertEqual(self.hold(self.alice_client, at='11:00').status_code, 201)
+
+    def test_lapsed_holds_free_the_slot(self):
+        hold_id = self.hold(self.alice_client).data['id']
+        SlotHold.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        response = self.alice_client.post(f'/api/appointments/holds/{hold_id}/confirm/', {'reason': 'Late'})
+        self.assertEqual(response.status_code, 410)
+        self.assertFalse(SlotHold.objects.exists())
+
+        hold_id = self.hold(self.alice_client).data['id']
+        SlotHold.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        # Bob takes over the lapsed hold
+        self.assertEqual(self.hold(self.bob_client).status_code, 201)
+        response = self.alice_client.post(f'/api/appointments/holds/{hold_id}/confirm/', {'reason': 'Late'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_one_hold_per_patient_and_schedule_slots_only(self):
+        self.hold(self.alice_client, at='10:00')
+        self.hold(self.alice_client, at='10:30')
+        self.assertEqual(list(SlotHold.objects.values_list('appointment_time', flat=True)),
+                         [time(10, 30)])
+        self.assertEqual(self.hold(self.alice_client, at='10:10').status_code, 400)
+
+    def book_after(self, rival):
+        """Alice books 10:00 directly, with `rival` run just before her hold goes in."""
+        def rival_goes_first(*args):
+            rival()
+            return hold_for_booking(*args)
+
+        with mock.patch('appointments.views.hold_for_booking', side_effect=rival_goes_first), \
+                mock.patch('core.notifications.NotificationService.send_appointment_confirmation') as confirmation:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.book(self.alice_client)
+        self.assertEqual(response.status_code, 409)
+        self.assertIn('no longer available', response.data['error'])
+        confirmation.assert_not_called()
+        self.assertFalse(Appointment.objects.filter(patient=self.alice).exists())
+
+    def test_losing_a_booking_race_is_a_conflict(self):
+        self.book_after(lambda: Appointment.objects.create(
+            appointment_id='APT-RIVAL', patient=self.bob, doctor=self.doctor,
+            appointment_date=self.date, appointment_time='10:00', reason='Rival',
+        ))
+
+    def test_booking_racing_a_hold_is_a_conflict(self):
+        self.book_after(lambda: self.hold(self.bob_client))
+
+    def test_booking_uses_up_own_hold(self):
+        self.hold(self.alice_client)
+        self.assertEqual(self.book(self.alice_client).status_code, 201)
+        self.assertFalse(SlotHold.objects.exists())
+
+    def test_cancelled_slot_can_be_booked_again(self):
+        self.assertEqual(self.book(self.alice_client).status_code, 201)
+        Appointment.objects.update(status='cancelled')
+        self.assertEqual(self.book(self.bob_client).status_code, 201)
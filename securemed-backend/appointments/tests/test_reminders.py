@@ -0,0 +1,133 @@
+import os
+from datetime import timedelta
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from appointments.models import Appointment, AppointmentReminder
+from appointments import reminders
+from appointments.reminders import schedule_reminders
+from authentication.models import User
+from core.models import OutboxEmail
+from departments.models import Department, Doctor
+from patients.models import Patient
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ReminderSchedulerTest(TestCase):
+    """24h / 2h reminder buckets, claimed once and queued in the outbox."""
+
+    def setUp(self):
+        dept = Department.objects.create(
+            name='Cardiology', code='CARD', floor=1, building='A', phone='1234567890', email='card@test.com'
+        )
+        doctor_user = User.objects.create_user(
+            username='reminder_doctor', email='reminder_doctor@test.com', password='testpass123',
+            first_name='John', last_name='Doe', role='doctor'
+        )
+        self.doctor = Doctor.objects.create(
+            user=doctor_user, doctor_id='DOC-REM-001', specialization='cardiology',
+            license_number='LIC-REM-001', qualification='MD', experience_years=10,
+            department=dept, consultation_fee=500.00, phone='1234567890'
+        )
+        self.patient_user = User.objects.create_user(
+            username='reminder_patient', email='reminder_patient@test.com', password='testpass123',
+            first_name='Jane', last_name='Smith', role='patient'
+        )
+        self.patient = Patient.objects.create(
+            user=self.patient_user, patient_id='P-REM-001', date_of_birth='1990-01-01', gender='F',
+            phone='+15550001111'
+        )
+        self.now = (timezone.localtime() + timedelta(days=1)).replace(hour=10, minute=0, second=0, microsecond=0)
+
+    def book(self, hours_ahead, status='scheduled'):
+        starts_at = self.now + timedelta(hours=hours_ahead)
+        return Appointment.objects.create(
+            appointment_id=f'APT-REM-{hours_ahead}', patient=self.patient, doctor=self.doctor,
+            appointment_date=starts_at.date(), appointment_time=starts_at.time(), reason='Checkup', status=status,
+        )
+
+    def reminder_key(self, appointment, kind):
+        starts_at = f'{appointment.appointment_date}T{appointment.appointment_time:%H:%M}'
+        return f'appointment-reminder:{appointment.pk}:{kind}:{starts_at}'
+
+    def test_buckets_are_queued_once(self):
+        soon, later, far = self.book(1), self.book(5), self.book(27)
+        self.book(6, status='cancelled')
+
+        self.assertEqual(schedule_reminders(self.now), {'24h': 1, '2h': 1})
+        self.assertEqual(
+            set(OutboxEmail.objects.values_list('dedupe_key', flat=True)),
+            {self.reminder_key(later, '24h'), self.reminder_key(soon, '2h')},
+        )
+        self.assertIn('Today at 03:00 PM', OutboxEmail.objects.get(dedupe_key=self.reminder_key(later, '24h')).subject)
+
+        # A restart rescans without queueing anything twice
+        self.assertEqual(schedule_reminders(self.now), {'24h': 0, '2h': 0})
+
+        # Four hours on, the 5h appointment reaches the 2h bucket and the 27h one the 24h bucket
+        self.assertEqual(schedule_reminders(self.now + timedelta(hours=4)), {'24h': 1, '2h': 1})
+        self.assertEqual(
+            sorted(AppointmentReminder.objects.values_list('appointment_id', 'kind')),
+            sorted([(soon.pk, '2h'), (later.pk, '24h'), (later.pk, '2h'), (far.pk, '24h')]),
+        )
+
+    def test_rescheduled_appointment_is_reminded_of_its_new_time(self):
+        appointment = self.book(5)
+        self.assertEqual(schedule_reminders(self.now), {'24h': 1, '2h': 0})
+
+        starts_at = self.now + timedelta(hours=8)
+        Appointment.objects.filter(pk=appointment.pk).update(
+            appointment_date=starts_at.date(), appointment_time=starts_at.time()
+        )
+        appointment.refresh_from_db()
+        self.assertEqual(schedule_reminders(self.now), {'24h': 1, '2h': 0})
+        email = OutboxEmail.objects.get(dedupe_key=self.reminder_key(appointment, '24h'))
+        self.assertIn('Today at 06:00 PM', email.subject)
+        self.assertEqual(appointment.reminders.count(), 2)
+
+    def test_reminder_committed_during_the_claim_is_not_sent_again(self):
+        appointment = self.book(5)
+        already_reminded = reminders._already_reminded
+
+        def other_worker_commits_first(appointments, kind):
+            # Worker A's claim commits after our SELECT read the appointment
+            AppointmentReminder.objects.create(
+                appointment=appointment, kind=kind, appointment_date=appointment.appointment_date,
+                appointment_time=appointment.appointment_time,
+            )
+            return already_reminded(appointments, kind)
+
+        with mock.patch.object(reminders, '_already_reminded', side_effect=other_worker_commits_first), \
+                mock.patch('core.notifications.NotificationService.send_appointment_sms_reminder') as sms:
+            self.assertEqual(schedule_reminders(self.now), {'24h': 0, '2h': 0})
+        sms.assert_not_called()
+        self.assertFalse(OutboxEmail.objects.exists())
+
+    def test_failed_claim_leaves_nothing_behind(self):
+        self.book(5)
+        with mock.patch('appointments.reminders.enqueue_emails', side_effect=RuntimeError('db gone')):
+            with self.assertRaises(RuntimeError):
+                schedule_reminders(self.now)
+        self.assertFalse(AppointmentReminder.objects.exists())
+
+        call_command('send_appointment_reminders', once=True, stdout=open(os.devnull, 'w'))
+        self.assertEqual(OutboxEmail.objects.count(), 0)  # the command uses the real clock
+        self.assertEqual(schedule_reminders(self.now), {'24h': 1, '2h': 0})
+
+    def test_booking_queues_confirmation_but_no_reminder(self):
+        client = APIClient()
+        client.force_authenticate(self.patient_user)
+        with mock.patch('core.notifications.NotificationService.send_appointment_sms_reminder') as sms:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = client.post('/api/appointments/appointments/', {
+                    'doctor': self.doctor.id, 'appointment_date': str(self.now.date() + timedelta(days=3)),
+                    'appointment_time': '10:00', 'reason': 'Checkup',
+                })
+        self.assertEqual(response.status_code, 201)
+        sms.assert_not_called()
+        self.assertEqual(list(OutboxEmail.objects.values_list('dedupe_key', flat=True)),
+                         [f"appointment-confirmation:{response.data['id']}"])
@@ -1,17 +1,20 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import DoctorViewSet, AppointmentViewSet, ReferralViewSet
-from .availability import get_doctor_availability, get_available_doctors
+from .views import DoctorViewSet, AppointmentViewSet, ReferralViewSet, SlotHoldViewSet
+from .availability import get_doctor_availability, get_available_doctors, search_available_slots
 
 router = DefaultRouter()
 router.register(r'doctors', DoctorViewSet, basename='doctor')
 router.register(r'appointments', AppointmentViewSet, basename='appointment')
 router.register(r'referrals', ReferralViewSet, basename='referral')
+router.register(r'holds', SlotHoldViewSet, basename='slot-hold')
 
 urlpatterns = [
-    path('', include(router.urls)),
-    # Availability endpoints
+    # Availability endpoints, ahead of the router so doctors/<pk>/ doesn't
+    # swallow doctors/available/
     path('doctors/<int:doctor_id>/availability/', get_doctor_availability, name='doctor-availability'),
     path('doctors/available/', get_available_doctors, name='available-doctors'),
+    path('slots/search/', search_available_slots, name='slot-search'),
+    path('', include(router.urls)),
 ]
 
@@ -1,12 +1,18 @@
 from django.shortcuts import render
-from rest_framework import viewsets, permissions, status, serializers
+from rest_framework import viewsets, mixins, permissions, status, serializers
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from rest_framework.exceptions import PermissionDenied
+from django.db import IntegrityError, transaction
 from django.db.models import Q
 from django.utils import timezone
-from .models import Doctor, Appointment, Referral
-from .serializers import DoctorSerializer, AppointmentSerializer, ReferralSerializer
+from datetime import timedelta
+from .models import Doctor, Appointment, Referral, SlotHold
+from .serializers import (
+    DoctorSerializer, AppointmentSerializer, ReferralSerializer, SlotHoldSerializer, HoldConfirmSerializer
+)
+from .holds import SlotUnavailable, confirm, hold_for_booking, reserve
+from .slots import doctor_slots
 from authentication.permissions import IsDoctor
 import uuid
 
@@ -16,7 +22,7 @@ class DoctorViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [permissions.AllowAny]
     
     def get_queryset(self):
-        queryset = Doctor.objects.filter(is_active=True, is_available=True)
+        queryset = Doctor.objects.filter(is_active=True, is_available=True).select_related('user', 'department')
         specialty = self.request.query_params.get('specialty', None)
         search = self.request.query_params.get('search', None)
         
@@ -41,32 +47,16 @@ class DoctorViewSet(viewsets.ReadOnlyModelViewSet):
             return Response({"error": "Date parameter is required"}, status=status.HTTP_400_BAD_REQUEST)
             
         try:
-            from datetime import datetime, timedelta
+            from datetime import datetime
             date = datetime.strptime(date_str, '%Y-%m-%d').date()
         except ValueError:
             return Response({"error": "Invalid date format. Use YYYY-MM-DD"}, status=status.HTTP_400_BAD_REQUEST)
 
-        slots = []
-        start_time = datetime.combine(date, datetime.min.time()).replace(hour=9)
-        end_time = datetime.combine(date, datetime.min.time()).replace(hour=17)
-        
-        current = start_time
-        while current < end_time:
-            time_str = current.strftime('%H:%M')
-            
-            is_booked = Appointment.objects.filter(
-                doctor=doctor,
-                appointment_date=date,
-                appointment_time__hour=current.hour,
-                appointment_time__minute=current.minute,
-                status__in=['scheduled', 'confirmed']
-            ).exists()
-            
-            slots.append({
-                "time": time_str,
-                "available": not is_booked
-            })
-            current += timedelta(minutes=30)
+        slots = [{
+            "time": slot.start.strftime('%H:%M'),
+            "end_time": slot.end.strftime('%H:%M'),
+            "available": slot.available
+        } for slot in doctor_slots(doctor.id, date)]
             
         return Response(slots)
 
@@ -76,52 +66,112 @@ class AppointmentViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
+        """Optimize queryset with select_related to prevent N+1 queries"""
         user = self.request.user
+        base_queryset = Appointment.objects.select_related('patient', 'doctor__user', 'doctor__department')
         if hasattr(user, 'patient_profile'):
-            return Appointment.objects.filter(patient=user.patient_profile)
+            return base_queryset.filter(patient=user.patient_profile)
         elif hasattr(user, 'doctor_profile'):
-            return Appointment.objects.filter(doctor=user.doctor_profile)
+            return base_queryset.filter(doctor=user.doctor_profile)
         elif user.is_staff:
-            return Appointment.objects.all()
+            return base_queryset.all()
         return Appointment.objects.none()
 
     def perform_create(self, serializer):
-        from datetime import datetime, timedelta
-        
         appointment_id = f"APT-{uuid.uuid4().hex[:8].upper()}"
+        patient = _patient_profile(self.request.user)
+        data = serializer.validated_data
+        validate_appointment_date(data.get('appointment_date'))
         
-        if not hasattr(self.request.user, 'patient_profile'):
-            raise PermissionDenied(
-                f"Patient profile not found for user '{self.request.user.email}'. "
-                "Please complete your patient registration first."
-            )
+        # Concurrent bookings of one slot all pass the serializer's uniqueness
+        # check; the constraint lets one in and the rest get a 409. The hold
+        # taken for the length of the transaction does the same against
+        # patients holding or reserving the slot (appointments.holds).
+        try:
+            with transaction.atomic():
+                hold = hold_for_booking(patient, data['doctor'], data['appointment_date'], data['appointment_time'])
+                appointment = serializer.save(
+                    patient=patient,
+                    appointment_id=appointment_id,
+                    created_by=self.request.user
+                )
+                hold.delete()
+        except IntegrityError:
+            raise SlotUnavailable()
         
-        # Validate appointment date
-        appointment_date = serializer.validated_data.get('appointment_date')
-        if appointment_date:
-            today = timezone.now().date()
-            max_future_date = today + timedelta(days=180)  # 6 months
-            
-            if appointment_date < today:
-                raise serializers.ValidationError({
-                    'appointment_date': 'Cannot book appointments in the past'
-                })
-            
-            if appointment_date > max_future_date:
-                raise serializers.ValidationError({
-                    'appointment_date': 'Cannot book appointments more than 6 months in advance'
-                })
-              
-        appointment = serializer.save(
-            patient=self.request.user.patient_profile,
-            appointment_id=appointment_id,
-            created_by=self.request.user
+        transaction.on_commit(lambda: send_booking_notifications(appointment))
+
+
+class SlotHoldViewSet(mixins.RetrieveModelMixin, mixins.DestroyModelMixin, viewsets.GenericViewSet):
+    """
+    Two-step booking (appointments.holds):
+    
+    POST   /api/appointments/holds/                {doctor, appointment_date, appointment_time}
+    POST   /api/appointments/holds/{id}/confirm/   {reason, notes}
+    DELETE /api/appointments/holds/{id}/           release the slot
+    
+    A hold lasts SLOT_HOLD_SECONDS. A slot that is booked or held by someone
+    else answers 409; confirming a lapsed hold answers 410.
+    """
+    serializer_class = SlotHoldSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get_queryset(self):
+        patient = getattr(self.request.user, 'patient_profile', None)
+        if patient is None:
+            return SlotHold.objects.none()
+        return SlotHold.objects.filter(patient=patient)
+    
+    def create(self, request):
+        patient = _patient_profile(request.user)
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        validate_appointment_date(data['appointment_date'])
+        
+        hold = reserve(patient, data['doctor'], data['appointment_date'], data['appointment_time'])
+        return Response(self.get_serializer(hold).data, status=status.HTTP_201_CREATED)
+    
+    @action(detail=True, methods=['post'])
+    def confirm(self, request, pk=None):
+        patient = _patient_profile(request.user)
+        serializer = HoldConfirmSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        appointment = confirm(pk, patient, created_by=request.user, **serializer.validated_data)
+        transaction.on_commit(lambda: send_booking_notifications(appointment))
+        return Response(AppointmentSerializer(appointment).data, status=status.HTTP_201_CREATED)
+
+
+def _patient_profile(user):
+    if not hasattr(user, 'patient_profile'):
+        raise PermissionDenied(
+            f"Patient profile not found for user '{user.email}'. "
+            "Please complete your patient registration first."
         )
+    return user.patient_profile
+
+
+def validate_appointment_date(appointment_date):
+    if appointment_date:
+        today = timezone.now().date()
+        max_future_date = today + timedelta(days=180)  # 6 months
+        
+        if appointment_date < today:
+            raise serializers.ValidationError({
+                'appointment_date': 'Cannot book appointments in the past'
+            })
         
-        # Send confirmation (Email + SMS)
-        from core.notifications import NotificationService
-        NotificationService.send_appointment_confirmation(appointment)
-        NotificationService.send_appointment_sms_reminder(appointment) 
+        if appointment_date > max_future_date:
+            raise serializers.ValidationError({
+                'appointment_date': 'Cannot book appointments more than 6 months in advance'
+            })
+
+
+def send_booking_notifications(appointment):
+    """Send the confirmation email; reminders come from appointments.reminders"""
+    from core.notifications import NotificationService
+    NotificationService.send_appointment_confirmation(appointment)
 
 
 class ReferralViewSet(viewsets.ModelViewSet):
@@ -138,7 +188,8 @@ class ReferralViewSet(viewsets.ModelViewSet):
         base_queryset = Referral.objects.select_related(
             'referring_doctor__user',
             'specialist__user',
-            'patient__user'
+            'patient__user',
+            'department'
         )
         
         if hasattr(user, 'doctor_profile'):
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User
+from .models import User, AccessAuditLog
 
 
 @admin.register(User)
@@ -121,3 +121,27 @@ class UserAdmin(BaseUserAdmin):
         )
     
     reset_failed_attempts.short_description = "Reset failed login attempts"
+
+
+@admin.register(AccessAuditLog)
+class AccessAuditLogAdmin(admin.ModelAdmin):
+    """
+    Read-only view of the database audit sink.
+    """
+
+    list_display = ('timestamp', 'user_id', 'method', 'path')
+    list_filter = ('method',)
+    search_fields = ('path',)
+    date_hierarchy = 'timestamp'
+    readonly_fields = ('timestamp', 'user_id', 'method', 'path')
+
+    def has_add_permission(self, request):
+        # Entries are only written by the audit pipeline
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        # An audit trail admins could prune would prove nothing
+        return False
@@ -0,0 +1,303 @@
+"""
+Asynchronous, batched writer for the privacy audit trail.
+
+AsyncAuditHandler is a logging handler whose emit() only places the record
+on a bounded in-memory queue. A background thread drains the queue in
+batches and hands each batch to a sink:
+
+- FileAuditSink appends the batch with a single write and rotates the file
+  by size and by (UTC) date.
+- DatabaseAuditSink bulk-inserts AccessAuditLog rows.
+
+When the queue is full the record is dropped and counted rather than
+blocking the request thread. Counters are available from audit_stats().
+"""
+import logging
+import os
+import queue
+import threading
+import time
+import weakref
+from datetime import datetime, timezone as dt_timezone
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+# Live handlers, so audit_stats() can report on whatever LOGGING configured
+_handlers = weakref.WeakSet()
+
+
+class FileAuditSink:
+    """
+    Append-only audit file rotated by size and date.
+
+    Rotated files are renamed to `<filename>.<YYYY-MM-DD>[.<n>]` after the
+    day their entries were written on; only the newest `backup_count` are
+    kept. Several gunicorn workers may share the file, so the sink reopens
+    it whenever another process has rotated it away.
+    """
+
+    def __init__(self, filename, max_bytes=50 * 1024 * 1024, backup_count=30):
+        self.filename = os.fspath(filename)
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.stream = None
+        self.opened_on = None
+
+    def _open(self):
+        self.stream = open(self.filename, 'a', encoding='utf-8')
+        # An existing file belongs to the day it was last written on
+        stat = os.fstat(self.stream.fileno())
+        if stat.st_size:
+            self.opened_on = datetime.fromtimestamp(stat.st_mtime, tz=dt_timezone.utc).date()
+        else:
+            self.opened_on = _utc_today()
+
+    def _stale(self):
+        """True if the open stream no longer refers to `filename`."""
+        try:
+            on_disk = os.stat(self.filename)
+        except FileNotFoundError:
+            return True
+        current = os.fstat(self.stream.fileno())
+        return (on_disk.st_dev, on_disk.st_ino) != (current.st_dev, current.st_ino)
+
+    def _rotation_target(self, day):
+        base = f"{self.filename}.{day.isoformat()}"
+        target, n = base, 0
+        while os.path.exists(target):
+            n += 1
+            target = f"{base}.{n}"
+        return target
+
+    def _prune(self):
+        if not self.backup_count:
+            return
+        directory = os.path.dirname(os.path.abspath(self.filename))
+        prefix = os.path.basename(self.filename) + '.'
+        rotated = sorted(
+            (entry for entry in os.scandir(directory) if entry.name.startswith(prefix)),
+            key=lambda entry: entry.stat().st_mtime,
+        )
+        for entry in rotated[:-self.backup_count]:
+            os.remove(entry.path)
+
+    def _rotate(self):
+        day = self.opened_on
+        self.stream.close()
+        self.stream = None
+        if os.path.exists(self.filename):
+            os.rename(self.filename, self._rotation_target(day))
+            self._prune()
+        self._open()
+
+    def write(self, lines):
+        if self.stream is None:
+            self._open()
+        elif self._stale():
+            self.stream.close()
+            self._open()
+
+        if self.opened_on != _utc_today():
+            self._rotate()
+        elif self.max_bytes and self.stream.tell() >= self.max_bytes:
+            self._rotate()
+
+        self.stream.write(''.join(line + '\n' for line in lines))
+        self.stream.flush()
+
+    def close(self):
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+
+
+class DatabaseAuditSink:
+    """Bulk-inserts each batch into the AccessAuditLog table."""
+
+    def write_records(self, records):
+        from django.db import close_old_connections
+        from .models import AccessAuditLog
+
+        close_old_connections()
+        AccessAuditLog.objects.bulk_create([
+            AccessAuditLog(
+                timestamp=datetime.fromtimestamp(record.created, tz=dt_timezone.utc),
+                user_id=getattr(record, 'user_id', None),
+                method=getattr(record, 'method', ''),
+                path=getattr(record, 'path', record.getMessage())[:512],
+            )
+            for record in records
+        ])
+
+    def close(self):
+        from django.db import connection
+        connection.close()
+
+
+def _utc_today():
+    return datetime.now(dt_timezone.utc).date()
+
+
+class AsyncAuditHandler(logging.Handler):
+    """
+    Logging handler that never writes on the calling thread.
+
+    Configured from settings.LOGGING; `sink` selects 'file' (default) or
+    'db'. The worker thread starts lazily in each process, so the handler is
+    safe to configure before gunicorn forks its workers.
+    """
+
+    def __init__(self, filename='privacy_audit.log', sink='file', max_bytes=50 * 1024 * 1024,
+                 backup_count=30, queue_size=10000, batch_size=500, flush_interval=1.0):
+        super().__init__()
+        self.sink_name = sink
+        if sink == 'db':
+            self.sink = DatabaseAuditSink()
+        else:
+            self.sink = FileAuditSink(filename, max_bytes=max_bytes, backup_count=backup_count)
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self.queue = queue.Queue(maxsize=queue_size)
+        self._worker = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+        self.enqueued = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+        self.write_errors = 0
+        self.high_water = 0
+        self._dropped_reported = 0
+        _handlers.add(self)
+
+    # Request thread ---------------------------------------------------
+
+    def _ensure_worker(self):
+        if self._pid == os.getpid() and self._worker is not None:
+            return
+        with self._start_lock:
+            if self._pid == os.getpid() and self._worker is not None:
+                return
+            if self._pid is not None:
+                # Forked child: the parent's queue and thread did not survive
+                self.queue = queue.Queue(maxsize=self.queue_size)
+            self._pid = os.getpid()
+            self._worker = threading.Thread(
+                target=self._run, name='privacy-audit-writer', daemon=True
+            )
+            self._worker.start()
+
+    def emit(self, record):
+        self._ensure_worker()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            return
+        self.enqueued += 1
+        depth = self.queue.qsize()
+        if depth > self.high_water:
+            self.high_water = depth
+
+    # Worker thread ----------------------------------------------------
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            try:
+                record = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            if record is _STOP:
+                break
+
+            # Group everything already waiting into one write
+            batch = [record]
+            while len(batch) < self.batch_size:
+                try:
+                    record = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if record is _STOP:
+                    stopping = True
+                    break
+                batch.append(record)
+
+            self._write(batch)
+            self._report_drops()
+
+    def _write(self, batch):
+        try:
+            if self.sink_name == 'db':
+                self.sink.write_records(batch)
+            else:
+                self.sink.write([self.format(record) for record in batch])
+        except Exception:
+            self.write_errors += 1
+            self.failed += len(batch)
+            logger.exception("Failed to write %d privacy audit events", len(batch))
+            return
+        self.written += len(batch)
+        self.batches += 1
+
+    def _report_drops(self):
+        if self.dropped > self._dropped_reported:
+            logger.warning(
+                "Privacy audit queue full: %d events dropped so far (queue size %d)",
+                self.dropped, self.queue_size,
+            )
+            self._dropped_reported = self.dropped
+
+    # Lifecycle --------------------------------------------------------
+
+    def flush(self, timeout=5.0):
+        """Wait (up to `timeout` seconds) for queued events to be written."""
+        if self._worker is None or self._pid != os.getpid():
+            return
+        deadline = time.monotonic() + timeout
+        while self.written + self.failed < self.enqueued and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def close(self):
+        if self._worker is not None and self._pid == os.getpid() and self._worker.is_alive():
+            self.queue.put(_STOP)
+            self._worker.join(timeout=5.0)
+        self._worker = None
+        self.sink.close()
+        super().close()
+
+    def stats(self):
+        return {
+            'sink': self.sink_name,
+            'queue_depth': self.queue.qsize(),
+            'queue_size': self.queue_size,
+            'queue_high_water': self.high_water,
+            'enqueued': self.enqueued,
+            'written': self.written,
+            'dropped': self.dropped,
+            'failed': self.failed,
+            'batches': self.batches,
+            'write_errors': self.write_errors,
+        }
+
+
+def record_export(request, description):
+    """
+    Record a bulk data export in the privacy audit trail, next to the access
+    lines PrivacyLoggingMiddleware writes and, like them, by user ID only.
+    """
+    logging.getLogger('authentication.middleware_logging').info(
+        "EXPORT: User ID %s downloaded %s", request.user.id, description,
+        extra={'user_id': request.user.id, 'path': request.path, 'method': 'EXPORT'},
+    )
+
+
+def audit_stats():
+    """Backpressure and drop counters for every live AsyncAuditHandler."""
+    return [handler.stats() for handler in list(_handlers)]
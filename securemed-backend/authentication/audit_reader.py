@@ -0,0 +1,292 @@
+"""
+Seekable, indexed reader for the privacy audit trail.
+
+The audit file is append-only, so it is split into ~8 KB blocks of whole
+lines and each block is summarised once: its byte range, the earliest and
+latest timestamp in it, and a small Bloom filter of the user IDs it
+mentions. The summaries are kept per file (keyed by inode, so they survive
+rotation) and only the bytes appended since the last query are indexed.
+
+A query walks the blocks newest-first, skips blocks outside the time window
+or whose filter rules out the user, and reads only the blocks that can
+contain a match. Rotated files (`<filename>.<YYYY-MM-DD>[.n]`) are indexed
+lazily, only when a query reaches back that far.
+"""
+import os
+import re
+import threading
+import zlib
+from datetime import datetime
+
+BLOCK_SIZE = 8 * 1024
+READ_SIZE = 1024 * 1024
+BLOOM_BITS = 1024
+MAX_PAGE_SIZE = 500
+
+# Formatter 'verbose' in settings.LOGGING: "{asctime} {levelname} {message}"
+TIMESTAMP_WIDTH = len('2026-01-01 00:00:00,000')
+LINE_RE = re.compile(
+    r'^(?P<timestamp>\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3}) (?P<level>\w+) (?P<message>.*)$'
+)
+ACCESS_RE = re.compile(r'^ACCESS: User ID (?P<user_id>\S+) accessed (?P<path>.*) via (?P<method>\w+)$')
+USER_TOKEN_RE = re.compile(rb' ACCESS: User ID (\S+) ')
+
+
+def _bloom_bits(token):
+    h = zlib.crc32(token)
+    return (1 << (h % BLOOM_BITS)) | (1 << ((h >> 10) % BLOOM_BITS))
+
+
+def _log_time(value):
+    """
+    Render an aware datetime the way logging's asctime does (local time of
+    the process, which Django pins to settings.TIME_ZONE), so timestamps
+    can be compared as fixed-width strings.
+    """
+    local = datetime.fromtimestamp(value.timestamp())
+    return local.strftime('%Y-%m-%d %H:%M:%S,') + f'{local.microsecond // 1000:03d}'
+
+
+class _Block:
+    __slots__ = ('start', 'end', 'first_ts', 'last_ts', 'users')
+
+    def __init__(self, start):
+        self.start = start
+        self.end = start
+        self.first_ts = None
+        self.last_ts = None
+        self.users = 0
+
+    def add(self, line, end):
+        self.end = end
+        ts = line[:TIMESTAMP_WIDTH]
+        if self.first_ts is None or ts < self.first_ts:
+            self.first_ts = ts
+        if self.last_ts is None or ts > self.last_ts:
+            self.last_ts = ts
+        match = USER_TOKEN_RE.search(line)
+        if match:
+            self.users |= _bloom_bits(match.group(1))
+
+    def may_contain(self, user_bits):
+        return self.users & user_bits == user_bits
+
+
+class _FileIndex:
+    """Block summaries for one audit file, extended as the file grows."""
+
+    def __init__(self, key):
+        self.key = key
+        self.blocks = []
+        self.indexed_to = 0
+        self.last_ts = None
+        self.lock = threading.Lock()
+
+    def refresh(self, path, size):
+        with self.lock:
+            if size < self.indexed_to:
+                # Truncated in place: start over
+                self.blocks = []
+                self.indexed_to = 0
+                self.last_ts = None
+            if size > self.indexed_to:
+                self._extend(path, size)
+
+    def _extend(self, path, size):
+        with open(path, 'rb') as f:
+            f.seek(self.indexed_to)
+            offset = self.indexed_to
+            if self.blocks and self.blocks[-1].end - self.blocks[-1].start < BLOCK_SIZE:
+                # Keep filling the short tail block instead of adding another
+                block = self.blocks.pop()
+            else:
+                block = _Block(offset)
+            pending = b''
+            while offset + len(pending) < size:
+                chunk = f.read(min(READ_SIZE, size - offset - len(pending)))
+                if not chunk:
+                    break
+                data = pending + chunk
+                lines = data.split(b'\n')
+                # The last piece is a partial line (or empty); keep it for later
+                pending = lines.pop()
+                for line in lines:
+                    offset += len(line) + 1
+                    if line:
+                        block.add(line, offset)
+                    else:
+                        block.end = offset
+                    if block.end - block.start >= BLOCK_SIZE:
+                        self._close_block(block)
+                        block = _Block(offset)
+            if block.end > block.start:
+                self._close_block(block)
+            # A trailing line without its newline is still being written
+            self.indexed_to = offset
+
+    def _close_block(self, block):
+        self.blocks.append(block)
+        if block.last_ts and (self.last_ts is None or block.last_ts > self.last_ts):
+            self.last_ts = block.last_ts
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def _get_index(stat):
+    key = (stat.st_dev, stat.st_ino)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = _indexes[key] = _FileIndex(key)
+        return index
+
+
+def _forget_missing(live_keys):
+    with _indexes_lock:
+        for key in list(_indexes):
+            if key not in live_keys:
+                del _indexes[key]
+
+
+class AuditEntry:
+    """One parsed line of the audit file."""
+
+    __slots__ = ('line', 'timestamp', 'level', 'message', 'user_id', 'path', 'method')
+
+    def __init__(self, line):
+        self.line = line
+        self.timestamp = self.level = self.user_id = self.path = self.method = None
+        self.message = line
+        match = LINE_RE.match(line)
+        if match:
+            self.timestamp = match.group('timestamp')
+            self.level = match.group('level')
+            self.message = match.group('message')
+            access = ACCESS_RE.match(self.message)
+            if access:
+                self.user_id = access.group('user_id')
+                self.path = access.group('path')
+                self.method = access.group('method')
+
+    def as_dict(self):
+        return {
+            'timestamp': self.timestamp,
+            'level': self.level,
+            'user_id': self.user_id,
+            'path': self.path,
+            'method': self.method,
+            'message': self.message,
+        }
+
+
+class AuditPage:
+    def __init__(self, entries, page, page_size, has_next):
+        self.entries = entries
+        self.page = page
+        self.page_size = page_size
+        self.has_next = has_next
+
+
+class AuditLogReader:
+    """
+    Newest-first, filtered and paginated access to the audit file and its
+    rotated predecessors.
+
+    Entries within a file are assumed to be in time order up to the writer's
+    batching skew; a query stops reading a file at the first block that ends
+    before `since`.
+    """
+
+    def __init__(self, filename):
+        self.filename = os.fspath(filename)
+
+    def _files(self):
+        """(path, stat) for the live file then rotated files, newest first."""
+        directory = os.path.dirname(os.path.abspath(self.filename))
+        prefix = os.path.basename(self.filename) + '.'
+        files = []
+        try:
+            files.append((self.filename, os.stat(self.filename)))
+        except FileNotFoundError:
+            pass
+        try:
+            rotated = [
+                (entry.path, entry.stat())
+                for entry in os.scandir(directory)
+                if entry.name.startswith(prefix)
+            ]
+        except FileNotFoundError:
+            rotated = []
+        rotated.sort(key=lambda item: item[1].st_mtime, reverse=True)
+        files.extend(rotated)
+        return files
+
+    def query(self, user_id=None, since=None, until=None, page=1, page_size=100):
+        """
+        Return an AuditPage of entries matching all the given filters.
+
+        `since` and `until` are aware datetimes; `user_id` matches the ID
+        recorded by PrivacyLoggingMiddleware. Pages are numbered from 1.
+        """
+        page = max(int(page), 1)
+        page_size = min(max(int(page_size), 1), MAX_PAGE_SIZE)
+        since_key = _log_time(since).encode() if since else None
+        until_key = _log_time(until).encode() if until else None
+        user_token = str(user_id).encode() if user_id is not None else None
+        user_bits = _bloom_bits(user_token) if user_token else 0
+
+        to_skip = (page - 1) * page_size
+        wanted = page_size + 1
+        entries = []
+
+        files = self._files()
+        _forget_missing({(stat.st_dev, stat.st_ino) for _, stat in files})
+
+        for path, stat in files:
+            # A file's mtime is when its newest entry was written
+            if since and stat.st_mtime < since.timestamp() - 1:
+                break
+            index = _get_index(stat)
+            try:
+                index.refresh(path, stat.st_size)
+            except FileNotFoundError:
+                # Rotated or pruned while we were listing
+                continue
+
+            with open(path, 'rb') as f:
+                for block in reversed(index.blocks):
+                    if block.last_ts is None:
+                        continue
+                    if since_key and block.last_ts < since_key:
+                        break
+                    if until_key and block.first_ts > until_key:
+                        continue
+                    if user_token and not block.may_contain(user_bits):
+                        continue
+
+                    f.seek(block.start)
+                    lines = f.read(block.end - block.start).split(b'\n')
+                    for line in reversed(lines):
+                        if not line:
+                            continue
+                        ts = line[:TIMESTAMP_WIDTH]
+                        if since_key and ts < since_key:
+                            continue
+                        if until_key and ts > until_key:
+                            continue
+                        if user_token:
+                            match = USER_TOKEN_RE.search(line)
+                            if not match or match.group(1) != user_token:
+                                continue
+                        if to_skip:
+                            to_skip -= 1
+                            continue
+                        entries.append(AuditEntry(line.decode('utf-8', errors='replace')))
+                        if len(entries) == wanted:
+                            return AuditPage(entries[:page_size], page, page_size, True)
+            if since_key and index.last_ts and index.last_ts < since_key:
+                break
+
+        return AuditPage(entries, page, page_size, False)
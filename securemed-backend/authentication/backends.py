@@ -0,0 +1,114 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils.functional import SimpleLazyObject
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings
+
+from .tokens import PRINCIPAL_CLAIMS
+
+# Sentinel for "this request has not been JWT-authenticated yet"
+_NOT_AUTHENTICATED = object()
+
+
+class ClaimsPrincipal(SimpleLazyObject):
+    """
+    Request user backed by the claims of a validated access token.
+
+    `id`, `pk`, `role`, `is_active` and `accepted_policy_version` are answered
+    from the token, so RoleMiddleware and the permission classes never touch
+    the database. Any other attribute loads the User row once and delegates
+    to it, which keeps views that need the model instance working unchanged.
+    """
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, validated_token):
+        user_model = get_user_model()
+        # simplejwt serialises the user id claim as a string
+        user_id = user_model._meta.get_field(api_settings.USER_ID_FIELD).to_python(
+            validated_token[api_settings.USER_ID_CLAIM]
+        )
+        super().__init__(
+            lambda: user_model.objects.get(**{api_settings.USER_ID_FIELD: user_id})
+        )
+        self.__dict__['_user_id'] = user_id
+        self.__dict__['_claims'] = {
+            field: validated_token[claim] for claim, field in PRINCIPAL_CLAIMS.items()
+        }
+
+    @property
+    def id(self):
+        return self.__dict__['_user_id']
+
+    pk = id
+
+    @property
+    def role(self):
+        return self.__dict__['_claims']['role']
+
+    @property
+    def is_active(self):
+        return self.__dict__['_claims']['is_active']
+
+    @property
+    def accepted_policy_version(self):
+        return self.__dict__['_claims']['accepted_policy_version']
+
+    def __bool__(self):
+        return True
+
+    def __repr__(self):
+        return f"<ClaimsPrincipal user_id={self.__dict__['_user_id']}>"
+
+
+class RequestJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that runs at most once per request.
+
+    RoleMiddleware authenticates the request before the view is resolved;
+    the result is stored on the underlying HttpRequest and handed back to
+    DRF here instead of decoding the token and loading the user again.
+    """
+
+    def authenticate(self, request):
+        django_request = getattr(request, '_request', request)
+        cached = getattr(django_request, '_jwt_auth', _NOT_AUTHENTICATED)
+        if cached is not _NOT_AUTHENTICATED:
+            return cached
+
+        # Failures are not cached so DRF re-raises them as a proper 401
+        result = super().authenticate(request)
+        django_request._jwt_auth = result
+        return result
+
+    def get_user(self, validated_token):
+        if not getattr(settings, 'JWT_CLAIMS_PRINCIPAL', False):
+            return super().get_user(validated_token)
+
+        # Tokens issued before the claims were added fall back to the DB
+        if any(claim not in validated_token for claim in PRINCIPAL_CLAIMS):
+            return super().get_user(validated_token)
+
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not validated_token['is_active']:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        return ClaimsPrincipal(validated_token)
+
+
+def authenticate_request(request):
+    """
+    Authenticate a plain Django request from its Authorization header.
+
+    Returns the (user, token) pair, or None when there is no usable token.
+    The result is cached on the request for RequestJWTAuthentication.
+    """
+    try:
+        return RequestJWTAuthentication().authenticate(request)
+    except (InvalidToken, AuthenticationFailed, TokenError):
+        return None
@@ -0,0 +1,231 @@
+"""
+In-process Bloom filter in front of simplejwt's refresh token blacklist.
+
+simplejwt checks every refresh token against BlacklistedToken with a join on
+OutstandingToken. Each worker process instead keeps a Bloom filter of the
+JTIs of blacklisted, unexpired tokens: a JTI the filter has never seen is
+certainly not blacklisted and skips the database, and only a filter hit (a
+blacklisted token, or a rare false positive) runs the exact query.
+
+Keeping the filter current:
+
+- Tokens blacklisted in this process are added as the row is saved.
+- Every JWT_BLACKLIST_FILTER_SYNC_SECONDS the filter pulls the rows other
+  processes added since its last look, with a primary key cursor. Keys are
+  handed out before a transaction commits, so a row can become visible
+  after the cursor has passed it: keys the cursor skipped are looked up
+  again, by key, on each sync for SYNC_OVERLAP, which must outlast any
+  blacklisting transaction. A sync reads only new rows and late ones.
+- Every JWT_BLACKLIST_FILTER_REBUILD_SECONDS it is rebuilt from scratch,
+  which drops expired tokens and resizes it for the current blacklist. The
+  rebuild runs in a background thread; checks are answered (and synced) from
+  the old filter until the new one is swapped in.
+
+A token blacklisted by another process can therefore be accepted here for
+at most the sync interval; setting it to 0 syncs before every check.
+"""
+import hashlib
+import math
+import threading
+import time
+from datetime import timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import connection
+from django.db.models import Q
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+MIN_CAPACITY = 10_000
+
+# How long a key the sync cursor skipped (its row not committed yet, or
+# rolled back) is looked for again. Must cover the longest a blacklisting
+# transaction stays open, plus clock skew between app servers for rebuilds.
+SYNC_OVERLAP = timedelta(seconds=5)
+# Most skipped keys tracked at once; a jump in the key sequence beyond this
+# only tracks the keys nearest the new rows
+MAX_SKIPPED_KEYS = 10_000
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings, using double hashing."""
+
+    def __init__(self, capacity, error_rate=0.001):
+        capacity = max(capacity, 1)
+        self.num_bits = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.num_bits for i in range(self.num_hashes))
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class BlacklistFilter:
+    """Per-process Bloom filter of blacklisted refresh token JTIs."""
+
+    def __init__(self, sync_interval=2.0, rebuild_interval=900.0, error_rate=0.001):
+        self.sync_interval = sync_interval
+        self.rebuild_interval = rebuild_interval
+        self.error_rate = error_rate
+        self._lock = threading.Lock()
+        self._bloom = None
+        self._high_water = 0
+        # Keys below the cursor not seen yet: {pk: monotonic time to give up}
+        self._skipped = {}
+        self._built_at = self._synced_at = 0.0
+        self._rebuilding = False
+        self.checks = 0
+        self.db_checks = 0
+        self.blacklisted = 0
+        self.rebuilds = 0
+        self.syncs = 0
+        self.rows_synced = 0
+
+    def _unexpired(self):
+        return BlacklistedToken.objects.filter(token__expires_at__gt=timezone.now())
+
+    def rebuild(self):
+        """Reload the filter from every unexpired blacklisted token."""
+        # Rows stamped SYNC_OVERLAP before the build are committed (or rolled
+        # back) by the time it reads; the next sync reads every key after the
+        # last of them, which covers rows the build can't see yet
+        settled = BlacklistedToken.objects.filter(
+            blacklisted_at__lt=timezone.now() - SYNC_OVERLAP
+        ).order_by('-blacklisted_at').values_list('pk', flat=True).first() or 0
+        rows = self._unexpired()
+        bloom = BloomFilter(max(MIN_CAPACITY, rows.count() * 2), self.error_rate)
+        for jti in rows.values_list('token__jti', flat=True).iterator(chunk_size=10_000):
+            bloom.add(jti)
+        now = time.monotonic()
+        with self._lock:
+            self._bloom = bloom
+            self._high_water = settled
+            self._skipped = {}
+            self._built_at = self._synced_at = now
+            self.rebuilds += 1
+
+    def sync(self):
+        """Add the tokens blacklisted (by any process) since the last sync."""
+        with self._lock:
+            high_water, skipped, rebuilds = self._high_water, list(self._skipped), self.rebuilds
+        new = Q(pk__gt=high_water)
+        if skipped:
+            new |= Q(pk__in=skipped)
+        rows = list(BlacklistedToken.objects.filter(new).values_list('pk', 'token__jti'))
+        now = time.monotonic()
+        with self._lock:
+            for _, jti in rows:
+                self._bloom.add(jti)
+            self.syncs += 1
+            self.rows_synced += len(rows)
+            self._synced_at = now
+            if self.rebuilds != rebuilds:
+                # A rebuild swapped in meanwhile and set its own cursor
+                return
+            seen = {pk for pk, _ in rows}
+            top = max(seen, default=high_water)
+            give_up = now + SYNC_OVERLAP.total_seconds()
+            self._skipped = {pk: until for pk, until in self._skipped.items() if pk not in seen and until > now}
+            for pk in range(max(high_water + 1, top - MAX_SKIPPED_KEYS), top):
+                if pk not in seen:
+                    self._skipped[pk] = give_up
+            self._high_water = max(high_water, top)
+
+    def _rebuild_in_background(self):
+        try:
+            self.rebuild()
+        finally:
+            with self._lock:
+                self._rebuilding = False
+            connection.close()
+
+    def _refresh(self):
+        now = time.monotonic()
+        if self._bloom is None:
+            self.rebuild()
+            return
+        if now - self._built_at >= self.rebuild_interval:
+            with self._lock:
+                start = not self._rebuilding
+                self._rebuilding = True
+            if start:
+                threading.Thread(
+                    target=self._rebuild_in_background, name='blacklist-filter-rebuild', daemon=True
+                ).start()
+        if now - self._synced_at >= self.sync_interval:
+            self.sync()
+
+    def add(self, jti):
+        with self._lock:
+            if self._bloom is not None:
+                self._bloom.add(jti)
+
+    def is_blacklisted(self, jti):
+        """Exact answer; the database is only asked when the filter matches."""
+        self._refresh()
+        with self._lock:
+            self.checks += 1
+            if jti not in self._bloom:
+                return False
+            self.db_checks += 1
+        blacklisted = BlacklistedToken.objects.filter(token__jti=jti).exists()
+        if blacklisted:
+            with self._lock:
+                self.blacklisted += 1
+        return blacklisted
+
+    def stats(self):
+        with self._lock:
+            bloom = self._bloom
+            return {
+                'entries': bloom.count if bloom else 0,
+                'size_bytes': len(bloom.bits) if bloom else 0,
+                'checks': self.checks,
+                'db_checks': self.db_checks,
+                'blacklisted': self.blacklisted,
+                # Share of checks that reached the database for a token that
+                # turned out not to be blacklisted
+                'false_positive_rate': (
+                    round((self.db_checks - self.blacklisted) / self.checks, 5) if self.checks else None
+                ),
+                'rebuilds': self.rebuilds,
+                'syncs': self.syncs,
+                'rows_per_sync': round(self.rows_synced / self.syncs, 2) if self.syncs else None,
+            }
+
+
+@lru_cache(maxsize=None)
+def get_blacklist_filter():
+    return BlacklistFilter(
+        sync_interval=settings.JWT_BLACKLIST_FILTER_SYNC_SECONDS,
+        rebuild_interval=settings.JWT_BLACKLIST_FILTER_REBUILD_SECONDS,
+        error_rate=settings.JWT_BLACKLIST_FILTER_ERROR_RATE,
+    )
+
+
+@receiver(setting_changed)
+def _reset_blacklist_filter(setting, **kwargs):
+    if setting.startswith('JWT_BLACKLIST_FILTER'):
+        get_blacklist_filter.cache_clear()
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def _add_blacklisted_token(sender, instance, created, **kwargs):
+    if created:
+        get_blacklist_filter().add(instance.token.jti)
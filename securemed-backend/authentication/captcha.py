@@ -0,0 +1,228 @@
+"""
+Google reCAPTCHA verification client.
+
+One RecaptchaClient per process keeps a pooled keep-alive requests.Session,
+so registrations do not open a new TLS connection to Google each time. Calls
+use a short timeout and go through a circuit breaker: after a run of
+transport failures the client stops calling out and fails fast until a
+cool-down has passed, then lets a single trial request through.
+
+Setting RECAPTCHA_TRANSPORT='stub' mounts StubRecaptchaAdapter in place of
+the network, for tests and offline environments.
+"""
+import json
+import logging
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+from urllib.parse import parse_qs
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_VERIFY_URL = 'https://www.google.com/recaptcha/api/siteverify'
+
+
+class CaptchaUnavailable(Exception):
+    """The verification service could not be reached (or the circuit is open)."""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    closed    -> calls go through; `failure_threshold` failures in a row open it
+    open      -> calls are refused until `reset_timeout` seconds have passed
+    half-open -> one trial call; success closes the circuit, failure re-opens it
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half-open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return True
+            # Open, or half-open with the trial call still in flight
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning("reCAPTCHA circuit opened after %d failures", self.failures)
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class StubRecaptchaAdapter(BaseAdapter):
+    """
+    requests transport that answers siteverify locally.
+
+    Every token passes except those starting with 'invalid', which fail with
+    'invalid-input-response'. `delay` simulates a slow service; `fail` makes
+    every call raise a connection error.
+    """
+
+    def __init__(self, delay=0.0, fail=False):
+        super().__init__()
+        self.delay = delay
+        self.fail = fail
+
+    def send(self, request, **kwargs):
+        if self.fail:
+            raise requests.exceptions.ConnectionError('stub reCAPTCHA transport is failing')
+        timeout = kwargs.get('timeout')
+        read_timeout = timeout[1] if isinstance(timeout, tuple) else timeout
+        if self.delay:
+            if read_timeout is not None and self.delay > read_timeout:
+                time.sleep(read_timeout)
+                raise requests.exceptions.ReadTimeout('stub reCAPTCHA transport timed out')
+            time.sleep(self.delay)
+
+        body = request.body or ''
+        if isinstance(body, bytes):
+            body = body.decode()
+        token = parse_qs(body).get('response', [''])[0]
+        if not token:
+            result = {'success': False, 'error-codes': ['missing-input-response']}
+        elif token.startswith('invalid'):
+            result = {'success': False, 'error-codes': ['invalid-input-response']}
+        else:
+            result = {'success': True, 'hostname': 'localhost'}
+
+        response = requests.Response()
+        response.status_code = 200
+        response._content = json.dumps(result).encode()
+        response.headers['Content-Type'] = 'application/json'
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+def _percentile(ordered, fraction):
+    if not ordered:
+        return None
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * fraction))], 1)
+
+
+class RecaptchaClient:
+    """Pooled, circuit-broken client for the siteverify endpoint."""
+
+    def __init__(self, secret, verify_url=DEFAULT_VERIFY_URL, timeout=3.0,
+                 failure_threshold=5, reset_timeout=30.0, pool_size=10, adapter=None):
+        self.secret = secret
+        self.verify_url = verify_url
+        self.timeout = timeout
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.session = requests.Session()
+        if adapter is None:
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+            self.session.mount('https://', adapter)
+            self.session.mount('http://', adapter)
+        else:
+            self.session.mount(verify_url, adapter)
+
+        self._lock = threading.Lock()
+        self.latencies_ms = deque(maxlen=1000)
+        self.calls = 0
+        self.failures = 0
+        self.short_circuited = 0
+
+    def verify(self, token, remote_ip=None):
+        """
+        Return Google's verdict as a dict (`success`, `error-codes`, ...).
+
+        Raises CaptchaUnavailable on timeouts, connection errors, non-200
+        answers and while the circuit is open.
+        """
+        if not self.breaker.allow():
+            with self._lock:
+                self.short_circuited += 1
+            raise CaptchaUnavailable('reCAPTCHA verification is temporarily unavailable')
+
+        payload = {'secret': self.secret, 'response': token}
+        if remote_ip:
+            payload['remoteip'] = remote_ip
+
+        start = time.perf_counter()
+        try:
+            response = self.session.post(self.verify_url, data=payload, timeout=self.timeout)
+            response.raise_for_status()
+            result = response.json()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            self._record(start, failed=True)
+            self.breaker.record_failure()
+            raise CaptchaUnavailable(str(e)) from e
+
+        self._record(start, failed=False)
+        self.breaker.record_success()
+        return result
+
+    def _record(self, start, failed):
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self.calls += 1
+            self.failures += failed
+            self.latencies_ms.append(elapsed_ms)
+        logger.debug("reCAPTCHA siteverify took %.1f ms (failed=%s)", elapsed_ms, failed)
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self.latencies_ms)
+        return {
+            'calls': self.calls,
+            'failures': self.failures,
+            'short_circuited': self.short_circuited,
+            'circuit': self.breaker.state,
+            'latency_ms': {
+                'p50': _percentile(latencies, 0.50),
+                'p95': _percentile(latencies, 0.95),
+                'p99': _percentile(latencies, 0.99),
+                'max': _percentile(latencies, 1.0),
+            },
+        }
+
+
+@lru_cache(maxsize=None)
+def get_captcha_client():
+    adapter = StubRecaptchaAdapter() if settings.RECAPTCHA_TRANSPORT == 'stub' else None
+    return RecaptchaClient(
+        secret=settings.RECAPTCHA_SECRET_KEY,
+        verify_url=settings.RECAPTCHA_VERIFY_URL,
+        timeout=settings.RECAPTCHA_TIMEOUT,
+        failure_threshold=settings.RECAPTCHA_BREAKER_THRESHOLD,
+        reset_timeout=settings.RECAPTCHA_BREAKER_RESET_SECONDS,
+        adapter=adapter,
+    )
+
+
+@receiver(setting_changed)
+def _reset_captcha_client(setting, **kwargs):
+    if setting.startswith('RECAPTCHA_'):
+        get_captcha_client.cache_clear()
@@ -0,0 +1,143 @@
+"""
+Bounded executor for slow password hashing.
+
+PBKDF2 is run on a small per-process thread pool instead of on the request
+thread (hashlib releases the GIL while deriving, so the pool really runs in
+parallel). The pool has a fixed backlog: once PASSWORD_HASHING_MAX_PENDING
+jobs are queued or running, further requests are rejected at once with
+HTTP 503 rather than piling up behind a login storm, and the threads serving
+other endpoints keep the CPU they need.
+
+Only the hashing runs on the pool; anything touching the database (such as
+saving an upgraded hash) stays on the request thread.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class HashingBusy(APIException):
+    """The hashing pool is saturated; the client should retry shortly."""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Authentication is temporarily busy. Please retry in a moment.'
+    default_code = 'hashing_busy'
+
+
+class HashingExecutor:
+    """
+    Thread pool with a hard limit on queued plus running jobs.
+
+    run() blocks the caller until its job finishes, but never waits for a
+    slot: when the backlog is full it raises HashingBusy immediately.
+    """
+
+    def __init__(self, max_workers=2, max_pending=8, timeout=10.0):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pid = None
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def _get_pool(self):
+        # A pool inherited across fork has no threads; build one per process
+        if self._pid != os.getpid():
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix='password-hashing'
+            )
+            self._pid = os.getpid()
+            self.pending = 0
+        return self._pool
+
+    def _done(self, future):
+        with self._lock:
+            self.pending -= 1
+            self.completed += 1
+
+    def run(self, fn, *args, **kwargs):
+        with self._lock:
+            pool = self._get_pool()
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise HashingBusy()
+            self.pending += 1
+        future = pool.submit(fn, *args, **kwargs)
+        future.add_done_callback(self._done)
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            # The job still finishes and frees its slot; we just stop waiting
+            with self._lock:
+                self.timed_out += 1
+            raise HashingBusy()
+
+    def stats(self):
+        return {
+            'workers': self.max_workers,
+            'max_pending': self.max_pending,
+            'pending': self.pending,
+            'completed': self.completed,
+            'rejected': self.rejected,
+            'timed_out': self.timed_out,
+        }
+
+
+@lru_cache(maxsize=None)
+def get_hashing_executor():
+    return HashingExecutor(
+        max_workers=settings.PASSWORD_HASHING_WORKERS,
+        max_pending=settings.PASSWORD_HASHING_MAX_PENDING,
+        timeout=settings.PASSWORD_HASHING_TIMEOUT,
+    )
+
+
+@receiver(setting_changed)
+def _reset_hashing_executor(setting, **kwargs):
+    if setting.startswith('PASSWORD_HASHING_') or setting == 'PASSWORD_HASHERS':
+        get_hashing_executor.cache_clear()
+
+
+def hash_password(raw_password):
+    """make_password() on the hashing pool."""
+    return get_hashing_executor().run(hashers.make_password, raw_password)
+
+
+def hash_passwords(raw_passwords):
+    """Hash several values as one job, so a batch takes a single pool slot."""
+    return get_hashing_executor().run(
+        lambda: [hashers.make_password(raw) for raw in raw_passwords]
+    )
+
+
+def verify_hash(raw_password, encoded):
+    """check_password() against an encoded hash, on the hashing pool."""
+    return get_hashing_executor().run(hashers.check_password, raw_password, encoded)
+
+
+def verify_password(user, raw_password):
+    """
+    Pool-backed equivalent of user.check_password().
+
+    Like Django's version, a correct password stored with outdated hasher
+    settings is re-hashed and saved (only the password column).
+    """
+    needs_upgrade = []
+    valid = get_hashing_executor().run(
+        hashers.check_password, raw_password, user.password, needs_upgrade.append
+    )
+    if valid and needs_upgrade:
+        user.password = hash_password(raw_password)
+        user.save(update_fields=['password'])
+    return valid
@@ -0,0 +1,204 @@
+"""
+Bulk invitations.
+
+bulk_invite() invites a whole list of addresses at once (e.g. a new clinic's
+staff) with a fixed number of statements however long the list is:
+
+- one query per LOOKUP_CHUNK addresses for existing users, and one for
+  active invitations (matched case-insensitively, through
+  invitations_email_lower_idx),
+- multi-row INSERTs for the new Invitation rows,
+- multi-row INSERTs into the email outbox (core.outbox.enqueue_emails), which
+  the dispatcher sends in batches over one SMTP connection.
+
+Every input row gets an entry in the returned report saying what happened
+to it. parse_invite_list() reads the list from CSV or JSON text.
+"""
+import csv
+import io
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from core.outbox import enqueue_emails
+
+from .models import Invitation
+
+User = get_user_model()
+
+INVITATION_LIFETIME = timedelta(hours=48)
+MAX_BULK_INVITES = 5000
+LOOKUP_CHUNK = 500
+
+STATUS_INVITED = 'invited'
+STATUS_INVALID = 'invalid_email'
+STATUS_DUPLICATE = 'duplicate'
+STATUS_USER_EXISTS = 'user_exists'
+STATUS_ALREADY_INVITED = 'already_invited'
+
+
+def registration_link(invitation):
+    return f"{settings.FRONTEND_URL}/register?token={invitation.token}"
+
+
+def invitation_email(invitation, inviter):
+    """The invitation email for `invitation`, as enqueue_email() arguments."""
+    return {
+        'subject': "You're invited to join SecureMed",
+        'message': f"""Hello,
+
+You have been invited to join SecureMed by {inviter.get_full_name()}.
+
+Please click the link below to complete your registration:
+{registration_link(invitation)}
+
+This invitation will expire in 48 hours.
+Expires at: {invitation.expires_at.strftime('%Y-%m-%d %H:%M:%S UTC')}
+""",
+        'recipient_list': [invitation.email],
+        'dedupe_key': f"invitation:{invitation.token}",
+    }
+
+
+def parse_invite_list(content, fmt):
+    """
+    Read email addresses from CSV or JSON text.
+
+    CSV: an 'email' column if the first row names one, else the first column.
+    JSON: a list of addresses or of {"email": ...} objects, or an object
+    with such a list under "emails".
+
+    Raises ValueError if the content cannot be read.
+    """
+    if fmt == 'csv':
+        rows = [row for row in csv.reader(io.StringIO(content)) if any(cell.strip() for cell in row)]
+        if not rows:
+            return []
+        header = [cell.strip().lower() for cell in rows[0]]
+        if 'email' in header:
+            column = header.index('email')
+            rows = rows[1:]
+        else:
+            column = 0
+        return [row[column] if column < len(row) else '' for row in rows]
+
+    if fmt == 'json':
+        try:
+            data = json.loads(content)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON: {e}")
+        return emails_from_data(data)
+
+    raise ValueError(f"Unsupported format: {fmt!r}")
+
+
+def emails_from_data(data):
+    """Email addresses from already decoded JSON (see parse_invite_list())."""
+    if isinstance(data, dict):
+        data = data.get('emails')
+    if not isinstance(data, list):
+        raise ValueError('Expected a list of email addresses')
+    return [item.get('email', '') if isinstance(item, dict) else item for item in data]
+
+
+def _chunks(values, size=LOOKUP_CHUNK):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _existing_user_emails(emails):
+    found = set()
+    for chunk in _chunks(emails):
+        found.update(
+            User.objects.annotate(email_lower=Lower('email'))
+            .filter(email_lower__in=chunk)
+            .values_list('email_lower', flat=True)
+        )
+    return found
+
+
+def _active_invitations(emails, now):
+    """Case-folded email -> an active invitation for it."""
+    found = {}
+    for chunk in _chunks(emails):
+        invitations = (
+            Invitation.objects.annotate(email_lower=Lower('email'))
+            .filter(email_lower__in=chunk, expires_at__gt=now, is_used=False)
+            .only('email', 'token', 'expires_at')
+        )
+        for invitation in invitations:
+            found.setdefault(invitation.email_lower, invitation)
+    return found
+
+
+def bulk_invite(emails, sent_by):
+    """
+    Invite every new address in `emails` on behalf of `sent_by`.
+
+    Addresses that are malformed, repeated in the list, already registered or
+    already invited (and the invitation still active) are skipped. Returns
+    one report entry per input row, in input order:
+    {'row', 'email', 'status'} plus 'token' and 'expires_at' for invited and
+    already invited rows.
+    """
+    if len(emails) > MAX_BULK_INVITES:
+        raise ValueError(f"At most {MAX_BULK_INVITES} invitations per request")
+
+    report = []
+    candidates = {}
+    for row, raw in enumerate(emails, start=1):
+        email = str(raw or '').strip()
+        entry = {'row': row, 'email': email}
+        report.append(entry)
+        try:
+            validate_email(email)
+        except DjangoValidationError:
+            entry['status'] = STATUS_INVALID
+            continue
+        key = email.lower()
+        if key in candidates:
+            entry['status'] = STATUS_DUPLICATE
+            continue
+        candidates[key] = entry
+
+    now = timezone.now()
+    registered = _existing_user_emails(candidates)
+    invited = _active_invitations(candidates.keys() - registered, now)
+
+    new_invitations = []
+    for key, entry in candidates.items():
+        if key in registered:
+            entry['status'] = STATUS_USER_EXISTS
+        elif key in invited:
+            entry.update(
+                status=STATUS_ALREADY_INVITED,
+                token=str(invited[key].token),
+                expires_at=invited[key].expires_at,
+            )
+        else:
+            # bulk_create skips Invitation.save(), which would set expires_at
+            invitation = Invitation(email=entry['email'], sent_by=sent_by, expires_at=now + INVITATION_LIFETIME)
+            new_invitations.append(invitation)
+            entry.update(status=STATUS_INVITED, token=str(invitation.token), expires_at=invitation.expires_at)
+
+    with transaction.atomic():
+        Invitation.objects.bulk_create(new_invitations, batch_size=LOOKUP_CHUNK)
+        enqueue_emails([invitation_email(invitation, sent_by) for invitation in new_invitations])
+
+    return report
+
+
+def summarize(report):
+    """Count of report entries per status."""
+    counts = {}
+    for entry in report:
+        counts[entry['status']] = counts.get(entry['status'], 0) + 1
+    return counts
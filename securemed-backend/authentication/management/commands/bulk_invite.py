@@ -0,0 +1,74 @@
+"""
+Management command to send registration invitations from a CSV or JSON file.
+
+    python manage.py bulk_invite staff.csv --sent-by admin@securemed.com
+    python manage.py bulk_invite staff.json --sent-by admin@securemed.com --report report.csv
+
+See authentication.invitations for the file formats and row statuses.
+"""
+import csv
+import os
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from authentication.invitations import bulk_invite, parse_invite_list, summarize
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Send registration invitations to every address in a CSV or JSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV or JSON file of email addresses ('-' for stdin)")
+        parser.add_argument(
+            '--sent-by',
+            required=True,
+            help='Email of the admin the invitations are sent on behalf of',
+        )
+        parser.add_argument(
+            '--format',
+            choices=['csv', 'json'],
+            help='File format (default: from the file extension, else csv)',
+        )
+        parser.add_argument(
+            '--report',
+            help='Write the per-row report to this CSV file',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            sent_by = User.objects.get(email__iexact=options['sent_by'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user with email {options['sent_by']}")
+
+        path = options['path']
+        fmt = options['format'] or ('json' if path.lower().endswith('.json') else 'csv')
+        try:
+            if path == '-':
+                content = sys.stdin.read()
+            else:
+                with open(path, encoding='utf-8-sig') as f:
+                    content = f.read()
+            report = bulk_invite(parse_invite_list(content, fmt), sent_by)
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        if options['report']:
+            with open(options['report'], 'w', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=['row', 'email', 'status', 'token', 'expires_at'])
+                writer.writeheader()
+                writer.writerows(report)
+        elif options['verbosity'] > 1:
+            for entry in report:
+                self.stdout.write(f"{entry['row']:>6}  {entry['status']:<16} {entry['email']}")
+
+        summary = summarize(report)
+        for status, count in sorted(summary.items()):
+            self.stdout.write(f"  {status:<16} {count}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Invited {summary.get('invited', 0)} of {len(report)} address(es)"
+            + (f"; report written to {os.path.abspath(options['report'])}" if options['report'] else '')
+        ))
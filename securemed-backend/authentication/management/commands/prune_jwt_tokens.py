@@ -0,0 +1,67 @@
+"""
+Management command to delete expired refresh tokens from simplejwt's
+outstanding and blacklisted token tables.
+
+simplejwt's own flushexpiredtokens deletes everything in one statement,
+loading every expired row into memory and locking them all in one long
+transaction. This deletes in short batches found through the expires_at
+index (migration 0011), each committed on its own, so refreshes and logins
+are never blocked for long. An expired token is rejected on its `exp` claim
+alone, so its blacklist entry is no longer needed either.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+
+class Command(BaseCommand):
+    help = 'Delete expired outstanding and blacklisted JWT refresh tokens in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Outstanding tokens deleted per transaction (default: 5000)',
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0.0,
+            help='Seconds to sleep between batches, to spread the load (default: 0)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only count the expired tokens',
+        )
+
+    def handle(self, *args, **options):
+        expired = OutstandingToken.objects.filter(expires_at__lte=timezone.now())
+
+        if options['dry_run']:
+            self.stdout.write(
+                self.style.WARNING(f'DRY RUN: Would delete {expired.count()} expired token(s)')
+            )
+            return
+
+        batch_size = options['batch_size']
+        outstanding = blacklisted = batches = 0
+        while True:
+            ids = list(expired.order_by('expires_at').values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                break
+            # Blacklist entries go with their token (ON DELETE CASCADE)
+            _, deleted = OutstandingToken.objects.filter(pk__in=ids).only('pk').delete()
+            outstanding += deleted.get(OutstandingToken._meta.label, 0)
+            blacklisted += deleted.get(BlacklistedToken._meta.label, 0)
+            batches += 1
+            if options['pause']:
+                time.sleep(options['pause'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {outstanding} expired token(s) and {blacklisted} blacklist '
+            f'entr{"y" if blacklisted == 1 else "ies"} in {batches} batch(es)'
+        ))
@@ -0,0 +1,48 @@
+"""
+Management command to delete expired password reset tokens.
+
+Rows are deleted in primary key batches found through the expires_at index,
+so each DELETE is short and never locks the whole table.
+"""
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from authentication.models import PasswordResetToken
+
+
+class Command(BaseCommand):
+    help = 'Delete expired password reset tokens'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Rows deleted per statement (default: 5000)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only count the expired tokens',
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        expired = PasswordResetToken.objects.filter(expires_at__lte=now)
+
+        if options['dry_run']:
+            self.stdout.write(
+                self.style.WARNING(f'DRY RUN: Would delete {expired.count()} expired token(s)')
+            )
+            return
+
+        batch_size = options['batch_size']
+        total = 0
+        while True:
+            ids = list(expired.order_by('expires_at').values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                break
+            deleted, _ = PasswordResetToken.objects.filter(pk__in=ids).delete()
+            total += deleted
+
+        self.stdout.write(self.style.SUCCESS(f'Deleted {total} expired password reset token(s)'))
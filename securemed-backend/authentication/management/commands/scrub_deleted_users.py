@@ -1,50 +1,74 @@
+"""
+Management command to permanently scrub PII from users who requested
+deletion more than 30 days ago.
+
+Scrubbing is set-based and checkpointed (see authentication.scrubbing): an
+interrupted run resumes where it stopped when the command is run again.
+"""
+import time
+
 from django.core.management.base import BaseCommand
-from django.utils import timezone
-from django.contrib.auth import get_user_model
-from datetime import timedelta
-import uuid
 
-User = get_user_model()
+from authentication import scrubbing
+
 
 class Command(BaseCommand):
     help = 'Permanently scrub PII from users who requested deletion > 30 days ago'
 
-    def handle(self, *args, **options):
-        # 1. Calculate cutoff (30 days ago)
-        cutoff = timezone.now() - timedelta(days=30)
-        
-        self.stdout.write(f"Searching for users requesting deletion before {cutoff}...")
-
-        # 2. Find eligible users
-        users = User.objects.filter(
-            deletion_requested_at__lte=cutoff,
-            is_active=False
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Users scrubbed per transaction (default: 1000)',
         )
-        
-        if not users.exists():
-            self.stdout.write(self.style.WARNING("No users found pending permanent deletion."))
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Abandon an unfinished run instead of resuming it',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only count the users that would be scrubbed',
+        )
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            count = scrubbing.pending_users(scrubbing.default_cutoff()).count()
+            self.stdout.write(self.style.WARNING(f'DRY RUN: Would scrub {count} user(s)'))
             return
 
-        count = 0
-        for user in users:
-            self.stdout.write(f"Scrubbing user ID {user.id} (formerly {user.email})...")
-            
-            # 3. Anonymize PII (The "Hard Delete" logic)
-            user.username = f"deleted_{user.id}_{uuid.uuid4().hex[:8]}"
-            user.email = f"deleted_{user.id}_{uuid.uuid4().hex[:8]}@scrubbed.local"
-            user.first_name = "Deleted"
-            user.last_name = "User"
-            
-            # Security wipe
-            user.set_unusable_password()
-            user.mfa_secret = None
-            user.mfa_enabled = False
-            user.mfa_recovery_codes = []
-            
-            # Clear the request timestamp
-            user.deletion_requested_at = None
-            
-            user.save()
-            count += 1
-            
-        self.stdout.write(self.style.SUCCESS(f"✓ Successfully scrubbed {count} users."))
+        run = scrubbing.start_or_resume(restart=options['restart'])
+        if run.users_scrubbed:
+            self.stdout.write(
+                f"Resuming scrub run {run.pk} after user ID {run.last_user_id} "
+                f"({run.users_scrubbed} users already scrubbed)"
+            )
+        self.stdout.write(f"Scrubbing users who requested deletion before {run.cutoff}...")
+
+        verbosity = options['verbosity']
+        start = time.perf_counter()
+        scrubbed_before = run.users_scrubbed
+
+        def progress(run):
+            if verbosity >= 2:
+                self.stdout.write(f"  {run.users_scrubbed} users scrubbed (up to ID {run.last_user_id})")
+
+        scrubbing.run_scrub(run, chunk_size=options['chunk_size'], on_chunk=progress)
+        elapsed = time.perf_counter() - start
+
+        throughput = run.throughput()
+        for table, rows in run.table_rows.items():
+            rate = throughput[table]
+            rate_text = f"{rate:,.0f} rows/sec" if rate is not None else "-"
+            self.stdout.write(f"  {table:28} {rows:9,} rows  {run.table_seconds[table]:7.2f} s  {rate_text}")
+
+        scrubbed = run.users_scrubbed - scrubbed_before
+        if not run.users_scrubbed:
+            self.stdout.write(self.style.WARNING("No users found pending permanent deletion."))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ Successfully scrubbed {scrubbed} users in {elapsed:.1f}s "
+            f"({run.users_scrubbed} in run {run.pk})."
+        ))
@@ -11,6 +11,8 @@ class PrivacyLoggingMiddleware:
     but ONLY logs the user ID (not username or email) to protect privacy.
     
     All logs are written to privacy_audit.log for compliance tracking.
+    The write happens on a background thread (see authentication.audit),
+    so logging adds no I/O to the request.
     """
     
     def __init__(self, get_response):
@@ -34,7 +36,9 @@ class PrivacyLoggingMiddleware:
         if request.user.is_authenticated:
             # Log ONLY the user ID, not username or email (privacy protection)
             logger.info(
-                f"ACCESS: User ID {request.user.id} accessed {request.path} via {request.method}"
+                "ACCESS: User ID %s accessed %s via %s",
+                request.user.id, request.path, request.method,
+                extra={'user_id': request.user.id, 'path': request.path, 'method': request.method},
             )
         
         return response
@@ -0,0 +1,30 @@
+# Generated by Django 6.0.2 on 2026-10-17 04:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0007_add_password_reset_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccessAuditLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField(help_text='When the request was handled')),
+                ('user_id', models.BigIntegerField(help_text='ID of the authenticated user', null=True)),
+                ('method', models.CharField(blank=True, max_length=10)),
+                ('path', models.CharField(max_length=512)),
+            ],
+            options={
+                'verbose_name': 'Access Audit Log',
+                'verbose_name_plural': 'Access Audit Logs',
+                'db_table': 'access_audit_logs',
+                'ordering': ['-timestamp'],
+                'indexes': [models.Index(fields=['timestamp'], name='access_audi_timesta_793f4b_idx'), models.Index(fields=['user_id', 'timestamp'], name='access_audi_user_id_f3b35d_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 6.0.2 on 2026-10-17 04:36
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+import hashlib
+
+
+def move_outstanding_tokens(apps, schema_editor):
+    """Carry unexpired reset tokens over, hashed, so links already sent keep working."""
+    User = apps.get_model('authentication', 'User')
+    PasswordResetToken = apps.get_model('authentication', 'PasswordResetToken')
+    outstanding = User.objects.filter(
+        password_reset_token__isnull=False,
+        password_reset_expires__gt=timezone.now(),
+    ).exclude(password_reset_token='').values_list('pk', 'password_reset_token', 'password_reset_expires')
+    PasswordResetToken.objects.bulk_create(
+        [
+            PasswordResetToken(
+                user_id=pk,
+                token_hash=hashlib.sha256(token.encode()).hexdigest(),
+                expires_at=expires,
+            )
+            for pk, token, expires in outstanding.iterator()
+        ],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0009_user_list_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PasswordResetToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token_hash', models.CharField(help_text='SHA-256 hex digest of the reset token', max_length=64, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='When the token was issued')),
+                ('expires_at', models.DateTimeField(db_index=True, help_text='When the token expires')),
+                ('user', models.ForeignKey(help_text='User the token resets the password for', on_delete=django.db.models.deletion.CASCADE, related_name='password_reset_tokens', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Password Reset Token',
+                'verbose_name_plural': 'Password Reset Tokens',
+                'db_table': 'password_reset_tokens',
+            },
+        ),
+        migrations.RunPython(move_outstanding_tokens, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='user',
+            name='password_reset_expires',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='password_reset_token',
+        ),
+    ]
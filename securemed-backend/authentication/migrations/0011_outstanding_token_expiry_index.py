@@ -0,0 +1,31 @@
+# Generated by Django 6.0.2 on 2026-10-17 05:02
+
+from django.db import migrations
+
+# simplejwt's OutstandingToken has no index on expires_at, so finding
+# expired tokens to prune would scan the whole table. The model belongs to a
+# third-party app, so the index is created directly.
+INDEX_NAME = 'outstanding_token_expires_idx'
+
+
+def create_expiry_index(apps, schema_editor):
+    table = apps.get_model('token_blacklist', 'OutstandingToken')._meta.db_table
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {INDEX_NAME} ON {schema_editor.quote_name(table)} (expires_at)'
+    )
+
+
+def drop_expiry_index(apps, schema_editor):
+    schema_editor.execute(f'DROP INDEX IF EXISTS {INDEX_NAME}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0010_password_reset_tokens'),
+        ('token_blacklist', '0012_alter_outstandingtoken_user'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_expiry_index, drop_expiry_index),
+    ]
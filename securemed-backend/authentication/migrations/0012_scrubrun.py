@@ -0,0 +1,33 @@
+# Generated by Django 6.0.2 on 2026-10-17 04:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0011_outstanding_token_expiry_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScrubRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('running', 'Running'), ('completed', 'Completed'), ('abandoned', 'Abandoned')], default='running', max_length=20)),
+                ('cutoff', models.DateTimeField(help_text='Users who requested deletion before this are scrubbed')),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('last_user_id', models.BigIntegerField(default=0, help_text='Highest user ID scrubbed so far')),
+                ('users_scrubbed', models.IntegerField(default=0)),
+                ('table_rows', models.JSONField(default=dict, help_text='Rows updated or deleted per table')),
+                ('table_seconds', models.JSONField(default=dict, help_text='Time spent per table, in seconds')),
+            ],
+            options={
+                'verbose_name': 'PII Scrub Run',
+                'verbose_name_plural': 'PII Scrub Runs',
+                'db_table': 'pii_scrub_runs',
+                'ordering': ['-started_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-17 04:52
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0012_scrubrun'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='invitation',
+            index=models.Index(django.db.models.functions.text.Lower('email'), models.F('expires_at'), name='invitations_email_lower_idx'),
+        ),
+    ]
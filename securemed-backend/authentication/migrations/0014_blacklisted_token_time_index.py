@@ -0,0 +1,31 @@
+# Generated by Django 6.0.2 on 2026-10-17 09:40
+
+from django.db import migrations
+
+# The blacklist filter (authentication/blacklist.py) finds where a rebuild's
+# sync cursor starts by blacklisted_at, which simplejwt doesn't index.
+# Created directly, as in 0011, since the model is third-party.
+INDEX_NAME = 'blacklisted_token_time_idx'
+
+
+def create_time_index(apps, schema_editor):
+    table = apps.get_model('token_blacklist', 'BlacklistedToken')._meta.db_table
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {INDEX_NAME} ON {schema_editor.quote_name(table)} (blacklisted_at)'
+    )
+
+
+def drop_time_index(apps, schema_editor):
+    schema_editor.execute(f'DROP INDEX IF EXISTS {INDEX_NAME}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0013_invitation_email_index'),
+        ('token_blacklist', '0012_alter_outstandingtoken_user'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_time_index, drop_time_index),
+    ]
@@ -1,7 +1,11 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models import F
+from django.db.models.functions import Lower
 from django.utils import timezone
 from datetime import timedelta
+import hashlib
+import secrets
 import uuid
 
 
@@ -77,19 +81,6 @@ class User(AbstractUser):
         help_text="When the user accepted the latest policy"
     )
     
-    # Password Reset
-    password_reset_token = models.CharField(
-        max_length=64,
-        blank=True,
-        null=True,
-        help_text="Token for password reset (expires after 1 hour)"
-    )
-    password_reset_expires = models.DateTimeField(
-        blank=True,
-        null=True,
-        help_text="When the password reset token expires"
-    )
-    
     # Authentication configuration
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
@@ -101,7 +92,12 @@ class User(AbstractUser):
         indexes = [
             models.Index(fields=['email']),
             models.Index(fields=['role', 'is_active']),
+            # Keyset pagination of the user management list, unfiltered and by role
+            models.Index(fields=['-date_joined', '-id'], name='users_joined_id_idx'),
+            models.Index(fields=['role', '-date_joined', '-id'], name='users_role_joined_id_idx'),
         ]
+        # Prefix search indexes (UPPER(...) text_pattern_ops) are created by
+        # migration 0009_user_list_indexes on PostgreSQL only.
     
     def __str__(self):
         return f"{self.username} ({self.email})"
@@ -125,6 +121,54 @@ class User(AbstractUser):
         self.failed_login_attempts = 0
         self.save(update_fields=['locked_until', 'failed_login_attempts'])
 
+    def record_failed_login(self, max_attempts, lockout_duration):
+        """
+        Count one failed login and lock the account once the count exceeds
+        `max_attempts`.
+
+        The lockout columns are updated with a compare-and-swap UPDATE that
+        only succeeds if nobody changed them since they were read, retrying
+        otherwise. Concurrent failures therefore never lose an increment and
+        exactly one of them locks the account, without holding a row lock
+        or rewriting the rest of the user row. An expired lock restarts the
+        count.
+
+        Returns:
+            tuple: (attempts, newly_locked). `attempts` is None if the account
+            was already locked by another request.
+        """
+        rows = type(self).objects.filter(pk=self.pk)
+        while True:
+            attempts, locked_until = rows.values_list(
+                'failed_login_attempts', 'locked_until'
+            ).get()
+            now = timezone.now()
+            if locked_until and locked_until > now:
+                self.failed_login_attempts, self.locked_until = attempts, locked_until
+                return None, False
+
+            new_attempts = (0 if locked_until else attempts) + 1
+            new_locked_until = now + lockout_duration if new_attempts > max_attempts else None
+            swapped = rows.filter(
+                failed_login_attempts=attempts, locked_until=locked_until
+            ).update(failed_login_attempts=new_attempts, locked_until=new_locked_until)
+            if swapped:
+                self.failed_login_attempts, self.locked_until = new_attempts, new_locked_until
+                return new_attempts, new_locked_until is not None
+
+    def reset_failed_logins(self):
+        """
+        Clear the lockout counters after a successful login.
+
+        Issues a single narrow UPDATE that touches the row only if there is
+        something to clear.
+        """
+        type(self).objects.filter(pk=self.pk).exclude(
+            failed_login_attempts=0, locked_until=None
+        ).update(failed_login_attempts=0, locked_until=None)
+        self.failed_login_attempts = 0
+        self.locked_until = None
+
 
 class Invitation(models.Model):
     """
@@ -177,6 +221,10 @@ class Invitation(models.Model):
         verbose_name = 'Invitation'
         verbose_name_plural = 'Invitations'
         ordering = ['-created_at']
+        indexes = [
+            # Bulk invitations look up active invitations by case-folded email
+            models.Index(Lower('email'), F('expires_at'), name='invitations_email_lower_idx'),
+        ]
     
     def __str__(self):
         return f"Invitation for {self.email} (Token: {str(self.token)[:8]}...)"
@@ -213,3 +261,175 @@ class Invitation(models.Model):
         self.used_at = timezone.now()
         self.used_by = user
         self.save(update_fields=['is_used', 'used_at', 'used_by'])
+
+
+class PasswordResetToken(models.Model):
+    """
+    Outstanding password reset token.
+
+    Only the SHA-256 of the token is stored, under a unique index, so a
+    confirm request is a single index lookup and a leaked table cannot be
+    used to reset passwords. Issuing and consuming tokens never touches the
+    users table; expired rows are removed by `prune_password_reset_tokens`.
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='password_reset_tokens',
+        help_text='User the token resets the password for'
+    )
+    token_hash = models.CharField(
+        max_length=64,
+        unique=True,
+        help_text='SHA-256 hex digest of the reset token'
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        help_text='When the token was issued'
+    )
+    expires_at = models.DateTimeField(
+        db_index=True,
+        help_text='When the token expires'
+    )
+
+    class Meta:
+        db_table = 'password_reset_tokens'
+        verbose_name = 'Password Reset Token'
+        verbose_name_plural = 'Password Reset Tokens'
+
+    def __str__(self):
+        return f"Password reset token for user ID {self.user_id} (expires {self.expires_at})"
+
+    @staticmethod
+    def hash_token(token):
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    @classmethod
+    def issue(cls, user, lifetime=timedelta(hours=1)):
+        """
+        Create a token for `user`.
+
+        Returns:
+            tuple: (plain text token, PasswordResetToken). The plain token is
+            only ever sent to the user; it is not stored.
+        """
+        token = secrets.token_urlsafe(32)
+        reset_token = cls.objects.create(
+            user=user,
+            token_hash=cls.hash_token(token),
+            expires_at=timezone.now() + lifetime,
+        )
+        return token, reset_token
+
+    @classmethod
+    def lookup(cls, token):
+        """
+        Return the PasswordResetToken for a plain text token, with its user,
+        or None if there is no such token.
+        """
+        return cls.objects.select_related('user').filter(
+            token_hash=cls.hash_token(token)
+        ).first()
+
+    def is_expired(self):
+        return self.expires_at <= timezone.now()
+
+    def consume(self):
+        """
+        Use up this token and every other token outstanding for the user.
+
+        Returns:
+            bool: False if the token had already been used by a concurrent
+            request, in which case the caller must not reset the password.
+        """
+        deleted, _ = type(self).objects.filter(pk=self.pk).delete()
+        if not deleted:
+            return False
+        type(self).objects.filter(user_id=self.user_id).delete()
+        return True
+
+
+class AccessAuditLog(models.Model):
+    """
+    Privacy audit trail entry written by the audit pipeline's database sink.
+    Stores only the user ID (never username or email), like privacy_audit.log.
+    """
+
+    timestamp = models.DateTimeField(
+        help_text='When the request was handled'
+    )
+    user_id = models.BigIntegerField(
+        null=True,
+        help_text='ID of the authenticated user'
+    )
+    method = models.CharField(max_length=10, blank=True)
+    path = models.CharField(max_length=512)
+
+    class Meta:
+        db_table = 'access_audit_logs'
+        verbose_name = 'Access Audit Log'
+        verbose_name_plural = 'Access Audit Logs'
+        ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['timestamp']),
+            models.Index(fields=['user_id', 'timestamp']),
+        ]
+
+    def __str__(self):
+        return f"User ID {self.user_id} accessed {self.path} via {self.method}"
+
+
+class ScrubRun(models.Model):
+    """
+    Checkpoint of a PII scrubbing run (authentication.scrubbing).
+
+    Updated in the same transaction as each chunk of users it scrubs, so an
+    interrupted run resumes after the last committed chunk, with the cutoff
+    it started with.
+    """
+
+    STATUS_RUNNING = 'running'
+    STATUS_COMPLETED = 'completed'
+    STATUS_ABANDONED = 'abandoned'
+    STATUS_CHOICES = [
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_COMPLETED, 'Completed'),
+        (STATUS_ABANDONED, 'Abandoned'),
+    ]
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_RUNNING)
+    cutoff = models.DateTimeField(
+        help_text='Users who requested deletion before this are scrubbed'
+    )
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    last_user_id = models.BigIntegerField(
+        default=0,
+        help_text='Highest user ID scrubbed so far'
+    )
+    users_scrubbed = models.IntegerField(default=0)
+    table_rows = models.JSONField(
+        default=dict,
+        help_text='Rows updated or deleted per table'
+    )
+    table_seconds = models.JSONField(
+        default=dict,
+        help_text='Time spent per table, in seconds'
+    )
+
+    class Meta:
+        db_table = 'pii_scrub_runs'
+        verbose_name = 'PII Scrub Run'
+        verbose_name_plural = 'PII Scrub Runs'
+        ordering = ['-started_at']
+
+    def __str__(self):
+        return f"Scrub run {self.pk} ({self.status}, {self.users_scrubbed} users)"
+
+    def throughput(self):
+        """Rows per second for each table."""
+        return {
+            table: rows / self.table_seconds[table] if self.table_seconds.get(table) else None
+            for table, rows in self.table_rows.items()
+        }
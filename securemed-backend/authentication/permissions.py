@@ -1,57 +1,51 @@
 from rest_framework.permissions import BasePermission
 
+from .policy import get_route_policy
 
-class IsAdminUser(BasePermission):
+
+class RolePermission(BasePermission):
     """
-    Permission class to allow access only to users with ADMIN role.
-    User must be authenticated and have role == 'admin'.
+    Base class for role checks driven by settings.ROUTE_ACCESS_POLICY.
+    Grants access when the user's role is allowed into any of `areas`,
+    so the role lists live in the same table RoleMiddleware enforces.
     """
-    
+    areas = ()
+
     def has_permission(self, request, view):
-        return (
+        return bool(
             request.user and
             request.user.is_authenticated and
-            request.user.role == 'admin'
+            get_route_policy().role_allowed(self.areas, request.user.role)
         )
 
 
-class IsDoctor(BasePermission):
+class IsAdminUser(RolePermission):
+    """
+    Permission class to allow access only to users with ADMIN role.
+    User must be authenticated and have role == 'admin'.
+    """
+    areas = ('admin',)
+
+
+class IsDoctor(RolePermission):
     """
     Permission class to allow access only to users with DOCTOR role.
     User must be authenticated and have role == 'provider' (doctor).
     """
-    
-    def has_permission(self, request, view):
-        return (
-            request.user and
-            request.user.is_authenticated and
-            request.user.role == 'provider'
-        )
+    areas = ('doctor',)
 
 
-class IsPatient(BasePermission):
+class IsPatient(RolePermission):
     """
     Permission class to allow access only to users with PATIENT role.
     User must be authenticated and have role == 'patient'.
     """
-    
-    def has_permission(self, request, view):
-        return (
-            request.user and
-            request.user.is_authenticated and
-            request.user.role == 'patient'
-        )
+    areas = ('patient',)
 
 
-class IsDoctorOrPatient(BasePermission):
+class IsDoctorOrPatient(RolePermission):
     """
     Permission class to allow access to users with either DOCTOR or PATIENT role.
     Useful for shared endpoints that both doctors and patients can access.
     """
-    
-    def has_permission(self, request, view):
-        return (
-            request.user and
-            request.user.is_authenticated and
-            request.user.role in ['provider', 'patient']
-        )
+    areas = ('doctor', 'patient')
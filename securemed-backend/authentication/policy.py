@@ -0,0 +1,120 @@
+"""
+Route access policy shared by RoleMiddleware and the permission classes.
+
+settings.ROUTE_ACCESS_POLICY declares which roles may use each API area.
+The table is compiled once into a trie keyed on path segments, so matching
+a request costs O(path depth) no matter how many areas are declared.
+"""
+import logging
+import random
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+
+class AccessRule:
+    """Roles allowed into one API area and the message returned to others."""
+
+    __slots__ = ('area', 'roles', 'message')
+
+    def __init__(self, area, roles, message):
+        self.area = area
+        self.roles = frozenset(roles)
+        self.message = message
+
+    def allows(self, role):
+        return role in self.roles
+
+
+class _TrieNode:
+    __slots__ = ('children', 'rule')
+
+    def __init__(self):
+        self.children = {}
+        self.rule = None
+
+
+def _segments(path):
+    return [segment for segment in path.split('/') if segment]
+
+
+class RoutePolicy:
+    """
+    Compiled form of ROUTE_ACCESS_POLICY.
+
+    Every area prefix is inserted under every API mount, so `/api/admin/`
+    and `/api/v1/admin/` are governed by the same rule.
+    """
+
+    def __init__(self, mounts, areas):
+        self.root = _TrieNode()
+        self.rules = {}
+
+        for area, spec in areas.items():
+            rule = AccessRule(area, spec['roles'], spec['message'])
+            self.rules[area] = rule
+            for mount in mounts:
+                node = self.root
+                for segment in _segments(mount) + _segments(spec['prefix']):
+                    node = node.children.setdefault(segment, _TrieNode())
+                node.rule = rule
+
+    def match(self, path):
+        """Return the most specific rule covering `path`, or None."""
+        node = self.root
+        matched = None
+        for segment in _segments(path):
+            node = node.children.get(segment)
+            if node is None:
+                break
+            if node.rule is not None:
+                matched = node.rule
+        return matched
+
+    def role_allowed(self, areas, role):
+        """True if `role` may access any of the named areas."""
+        return any(self.rules[area].allows(role) for area in areas)
+
+
+@lru_cache(maxsize=None)
+def get_route_policy():
+    policy = settings.ROUTE_ACCESS_POLICY
+    return RoutePolicy(policy['mounts'], policy['areas'])
+
+
+@receiver(setting_changed)
+def _reset_route_policy(setting, **kwargs):
+    if setting == 'ROUTE_ACCESS_POLICY':
+        get_route_policy.cache_clear()
+
+
+def _sampled(setting, default):
+    return random.random() < getattr(settings, setting, default)
+
+
+def log_decision(request, role, rule, allowed):
+    """
+    Log an access decision.
+
+    Denials are logged at WARNING for ROUTE_POLICY_DENY_LOG_SAMPLE_RATE of
+    requests (all of them by default); allowed requests are logged at DEBUG
+    for ROUTE_POLICY_LOG_SAMPLE_RATE of requests, so a busy worker does not
+    flood the log collector.
+    """
+    if not allowed:
+        if logger.isEnabledFor(logging.WARNING) and _sampled('ROUTE_POLICY_DENY_LOG_SAMPLE_RATE', 1.0):
+            logger.warning(
+                "Route access denied: user_id=%s role=%r area=%s path=%s",
+                request.user.id, role, rule.area, request.path,
+            )
+        return
+
+    if logger.isEnabledFor(logging.DEBUG) and _sampled('ROUTE_POLICY_LOG_SAMPLE_RATE', 0.01):
+        logger.debug(
+            "Route access allowed: user_id=%s role=%r area=%s path=%s",
+            request.user.id, role, rule.area if rule else None, request.path,
+        )
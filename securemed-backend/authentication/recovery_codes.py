@@ -0,0 +1,50 @@
+"""
+Storage format for MFA recovery codes.
+
+Each code is stored as `hmac:<lookup>:<password hash>`. The lookup is a
+short keyed HMAC of the code (keyed with SECRET_KEY), so the one stored
+entry that can match is found with a string comparison and verification
+costs at most one slow password hash, however many codes are left.
+
+Codes issued before this format are plain Django password hashes. They keep
+working, but can only be checked by trying each one in turn.
+"""
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+from .hashing import hash_passwords, verify_hash
+
+PREFIX = 'hmac'
+LOOKUP_LENGTH = 16
+_HMAC_SALT = 'authentication.recovery_codes.lookup'
+
+
+def _lookup(code):
+    return salted_hmac(_HMAC_SALT, code, algorithm='sha256').hexdigest()[:LOOKUP_LENGTH]
+
+
+def hash_recovery_codes(codes):
+    """Return the stored form of each plain text recovery code."""
+    hashes = hash_passwords(codes)
+    return [f"{PREFIX}:{_lookup(code)}:{encoded}" for code, encoded in zip(codes, hashes)]
+
+
+def find_recovery_code(code, stored_codes):
+    """
+    Return the index of the stored entry matching `code`, or None.
+    """
+    lookup = _lookup(code)
+    legacy = []
+    for i, stored in enumerate(stored_codes):
+        prefix, sep, rest = stored.partition(':')
+        if prefix != PREFIX or not sep:
+            legacy.append(i)
+            continue
+        stored_lookup, _, encoded = rest.partition(':')
+        if constant_time_compare(stored_lookup, lookup):
+            return i if verify_hash(code, encoded) else None
+
+    # Pre-HMAC codes: no index, so fall back to checking each hash
+    for i in legacy:
+        if verify_hash(code, stored_codes[i]):
+            return i
+    return None
@@ -0,0 +1,198 @@
+"""
+Set-based PII scrubbing for users whose deletion grace period has passed.
+
+Users are processed in primary key order, in chunks. Each chunk is one
+transaction that runs one bulk UPDATE or DELETE per table in SCRUB_STEPS
+and moves the run's checkpoint (ScrubRun) forward, so the cost per chunk is
+a fixed number of statements however many users it holds, and an
+interrupted run picks up after its last committed chunk.
+
+What is scrubbed: the account's identity and credentials, the patient
+profile's contact, address and insurance details (date of birth is reduced
+to the year), emergency contacts, free-text notes attached to the patient's
+lab orders, lab results, appointments and invoices, invitation emails,
+outstanding password reset tokens, queued and sent emails in the outbox and
+cached PDFs. Clinical data stays, tied
+to the now anonymous account.
+"""
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX
+from django.db import transaction
+from django.db.models import CharField, Q, Value
+from django.db.models.functions import Cast, Concat, TruncYear
+from django.utils import timezone
+
+from appointments.models import Appointment
+from billing.models import Invoice
+from core.models import OutboxEmail
+from labs.models import LabOrder, LabResult
+from patients.models import EmergencyContact, Patient
+
+from .models import Invitation, PasswordResetToken, ScrubRun
+from .utils import purge_user_documents
+
+User = get_user_model()
+
+GRACE_PERIOD = timedelta(days=30)
+
+
+def _delete_outbox_emails(user_ids):
+    # Through indexed columns only: the user an email is addressed to, and
+    # the dedupe key of the invitation they signed up with
+    invitation_keys = [
+        f'invitation:{token}'
+        for token in Invitation.objects.filter(used_by_id__in=user_ids).values_list('token', flat=True)
+    ]
+    deleted, _ = OutboxEmail.objects.filter(
+        Q(recipient_user_id__in=user_ids) | Q(dedupe_key__in=invitation_keys)
+    ).delete()
+    return deleted
+
+
+def _user_id_text():
+    return Cast('id', output_field=CharField())
+
+
+def _scrub_users(user_ids):
+    return User.objects.filter(pk__in=user_ids).update(
+        username=Concat(Value('deleted_'), _user_id_text()),
+        email=Concat(Value('deleted_'), _user_id_text(), Value('@scrubbed.local')),
+        first_name='Deleted',
+        last_name='User',
+        password=UNUSABLE_PASSWORD_PREFIX,
+        is_active=False,
+        mfa_secret=None,
+        mfa_enabled=False,
+        mfa_recovery_codes=[],
+        deletion_requested_at=None,
+    )
+
+
+def _scrub_patients(user_ids):
+    return Patient.objects.filter(user_id__in=user_ids).update(
+        date_of_birth=TruncYear('date_of_birth'),
+        phone='',
+        emergency_contact='',
+        address='',
+        city='',
+        state='',
+        postal_code='',
+        insurance_provider='',
+        insurance_number='',
+        is_active=False,
+    )
+
+
+def _delete_emergency_contacts(user_ids):
+    deleted, _ = EmergencyContact.objects.filter(patient__user_id__in=user_ids).delete()
+    return deleted
+
+
+def _scrub_lab_orders(user_ids):
+    return LabOrder.objects.filter(patient_id__in=user_ids).exclude(clinical_notes='').update(clinical_notes='')
+
+
+def _scrub_lab_results(user_ids):
+    return LabResult.objects.filter(order__patient_id__in=user_ids).exclude(notes='').update(notes='')
+
+
+def _scrub_appointments(user_ids):
+    return Appointment.objects.filter(patient__user_id__in=user_ids).exclude(notes='').update(notes='')
+
+
+def _scrub_invoices(user_ids):
+    return Invoice.objects.filter(patient__user_id__in=user_ids).exclude(notes='').update(notes='')
+
+
+def _scrub_invitations(user_ids):
+    return Invitation.objects.filter(used_by_id__in=user_ids).update(email='deleted@scrubbed.local')
+
+
+def _delete_reset_tokens(user_ids):
+    deleted, _ = PasswordResetToken.objects.filter(user_id__in=user_ids).delete()
+    return deleted
+
+
+def _purge_documents(user_ids):
+    for user_id in user_ids:
+        purge_user_documents(user_id)
+    return len(user_ids)
+
+
+# (label, step); each step takes a list of user IDs and returns rows touched
+SCRUB_STEPS = [
+    (OutboxEmail._meta.db_table, _delete_outbox_emails),
+    (User._meta.db_table, _scrub_users),
+    (Patient._meta.db_table, _scrub_patients),
+    (EmergencyContact._meta.db_table, _delete_emergency_contacts),
+    (LabOrder._meta.db_table, _scrub_lab_orders),
+    (LabResult._meta.db_table, _scrub_lab_results),
+    (Appointment._meta.db_table, _scrub_appointments),
+    (Invoice._meta.db_table, _scrub_invoices),
+    (Invitation._meta.db_table, _scrub_invitations),
+    (PasswordResetToken._meta.db_table, _delete_reset_tokens),
+    # Files cannot be rolled back; a failed chunk only loses cache entries
+    ('pdf_cache', _purge_documents),
+]
+
+
+def default_cutoff():
+    return timezone.now() - GRACE_PERIOD
+
+
+def pending_users(cutoff):
+    """Users whose deletion request is older than `cutoff` and not yet scrubbed."""
+    return User.objects.filter(deletion_requested_at__lte=cutoff)
+
+
+def start_or_resume(cutoff=None, restart=False):
+    """
+    Return the unfinished run to resume, or a new one.
+
+    `restart` abandons an unfinished run instead of resuming it.
+    """
+    unfinished = ScrubRun.objects.filter(status=ScrubRun.STATUS_RUNNING)
+    if restart:
+        unfinished.update(status=ScrubRun.STATUS_ABANDONED, finished_at=timezone.now())
+    else:
+        run = unfinished.order_by('-started_at').first()
+        if run is not None:
+            return run
+    return ScrubRun.objects.create(cutoff=cutoff or default_cutoff())
+
+
+def scrub_chunk(run, user_ids):
+    """Scrub one chunk of users and checkpoint it, in one transaction."""
+    with transaction.atomic():
+        for label, step in SCRUB_STEPS:
+            start = time.perf_counter()
+            rows = step(user_ids)
+            run.table_rows[label] = run.table_rows.get(label, 0) + rows
+            run.table_seconds[label] = run.table_seconds.get(label, 0.0) + time.perf_counter() - start
+        run.last_user_id = user_ids[-1]
+        run.users_scrubbed += len(user_ids)
+        run.save(update_fields=['last_user_id', 'users_scrubbed', 'table_rows', 'table_seconds'])
+
+
+def run_scrub(run, chunk_size=1000, on_chunk=None):
+    """
+    Scrub every pending user after the run's checkpoint, then complete it.
+
+    `on_chunk(run)` is called after each committed chunk.
+    """
+    pending = pending_users(run.cutoff).order_by('pk')
+    while True:
+        user_ids = list(pending.filter(pk__gt=run.last_user_id).values_list('pk', flat=True)[:chunk_size])
+        if not user_ids:
+            break
+        scrub_chunk(run, user_ids)
+        if on_chunk:
+            on_chunk(run)
+
+    run.status = ScrubRun.STATUS_COMPLETED
+    run.finished_at = timezone.now()
+    run.save(update_fields=['status', 'finished_at'])
+    return run
@@ -1,9 +1,10 @@
 import re
-import requests
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from django.conf import settings
-from django.utils import timezone
+
+from .captcha import CaptchaUnavailable, get_captcha_client
+from .hashing import verify_password
+from .models import PasswordResetToken
 
 User = get_user_model()
 
@@ -68,59 +69,45 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         
         This performs a POST request to Google's reCAPTCHA API to verify
         that the token is valid and the user passed the CAPTCHA challenge.
+        If Google cannot be reached the token is rejected (fail closed).
         """
         if not value:
             raise serializers.ValidationError(
                 "CAPTCHA verification is required."
             )
         
-        # Google reCAPTCHA verification endpoint
-        verify_url = 'https://www.google.com/recaptcha/api/siteverify'
-        
-        # Prepare payload
-        payload = {
-            'secret': settings.RECAPTCHA_SECRET_KEY,
-            'response': value
-        }
-        
         try:
-            # Make POST request to Google's API
-            response = requests.post(verify_url, data=payload, timeout=10)
-            result = response.json()
-            
-            # Check if verification was successful
-            if not result.get('success'):
-                error_codes = result.get('error-codes', [])
-                
-                # Provide user-friendly error messages
-                if 'missing-input-response' in error_codes:
-                    raise serializers.ValidationError(
-                        "CAPTCHA response is missing."
-                    )
-                elif 'invalid-input-response' in error_codes:
-                    raise serializers.ValidationError(
-                        "CAPTCHA response is invalid or has expired. Please try again."
-                    )
-                elif 'timeout-or-duplicate' in error_codes:
-                    raise serializers.ValidationError(
-                        "CAPTCHA has expired. Please complete it again."
-                    )
-                else:
-                    raise serializers.ValidationError(
-                        f"CAPTCHA verification failed: {', '.join(error_codes)}"
-                    )
-            
-            # Verification successful
-            return value
-            
-        except requests.exceptions.Timeout:
+            # Pooled, circuit-broken client (see authentication.captcha)
+            result = get_captcha_client().verify(value)
+        except CaptchaUnavailable:
             raise serializers.ValidationError(
-                "CAPTCHA verification timed out. Please try again."
-            )
-        except requests.exceptions.RequestException as e:
-            raise serializers.ValidationError(
-                f"CAPTCHA verification error: Unable to connect to verification service."
+                "CAPTCHA verification is temporarily unavailable. Please try again shortly."
             )
+        
+        # Check if verification was successful
+        if not result.get('success'):
+            error_codes = result.get('error-codes', [])
+            
+            # Provide user-friendly error messages
+            if 'missing-input-response' in error_codes:
+                raise serializers.ValidationError(
+                    "CAPTCHA response is missing."
+                )
+            elif 'invalid-input-response' in error_codes:
+                raise serializers.ValidationError(
+                    "CAPTCHA response is invalid or has expired. Please try again."
+                )
+            elif 'timeout-or-duplicate' in error_codes:
+                raise serializers.ValidationError(
+                    "CAPTCHA has expired. Please complete it again."
+                )
+            else:
+                raise serializers.ValidationError(
+                    f"CAPTCHA verification failed: {', '.join(error_codes)}"
+                )
+        
+        # Verification successful
+        return value
     
     def validate(self, data):
         """
@@ -250,7 +237,7 @@ class MFADeactivateSerializer(serializers.Serializer):
         password = data.get('password')
         
         # Verify password
-        if not user.check_password(password):
+        if not verify_password(user, password):
             raise serializers.ValidationError({
                 'password': 'Invalid password'
             })
@@ -287,7 +274,7 @@ class RegenerateRecoveryCodesSerializer(serializers.Serializer):
         password = data.get('password')
         
         # Verify password
-        if not user.check_password(password):
+        if not verify_password(user, password):
             raise serializers.ValidationError({
                 'password': 'Invalid password'
             })
@@ -409,13 +396,12 @@ class PasswordResetConfirmSerializer(serializers.Serializer):
         if data['password'] != data['password_confirm']:
             raise serializers.ValidationError({"password_confirm": "Passwords do not match."})
         
-        token = data.get('token')
-        try:
-            user = User.objects.get(password_reset_token=token, is_active=True)
-            if not user.password_reset_expires or user.password_reset_expires < timezone.now():
-                raise serializers.ValidationError({"token": "Reset token has expired."})
-            data['user'] = user
-        except User.DoesNotExist:
+        reset_token = PasswordResetToken.lookup(data.get('token'))
+        if reset_token is None or not reset_token.user.is_active:
             raise serializers.ValidationError({"token": "Invalid reset token."})
+        if reset_token.is_expired():
+            raise serializers.ValidationError({"token": "Reset token has expired."})
+        data['reset_token'] = reset_token
+        data['user'] = reset_token.user
         
         return data
@@ -1,3 +1,1076 @@
-from django.test import TestCase
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.models import OutboxEmail
+from core.outbox import enqueue_email
+
+from .audit import AsyncAuditHandler, DatabaseAuditSink, FileAuditSink
+from . import audit_reader
+from . import invitations
+from .audit_reader import AuditLogReader, _log_time
+from . import recovery_codes
+from . import scrubbing
+from . import utils as pdf_utils
+from .backends import ClaimsPrincipal
+from .blacklist import BloomFilter, get_blacklist_filter
+from .captcha import CaptchaUnavailable, CircuitBreaker, RecaptchaClient, StubRecaptchaAdapter
+from .hashing import HashingBusy, HashingExecutor
+from .models import AccessAuditLog, Invitation, PasswordResetToken, ScrubRun
+from .permissions import IsDoctor, IsDoctorOrPatient, IsPatient
+from .policy import get_route_policy
+from .tokens import PrincipalRefreshToken
+from .views import LOCKOUT_DURATION_MINUTES, MAX_FAILED_ATTEMPTS, generate_temp_token
+
+User = get_user_model()
+
+
+class SinglePassJWTAuthenticationTest(TestCase):
+    """RoleMiddleware and DRF share one JWT authentication pass per request."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.patient = User.objects.create_user(
+            username='jwt_patient',
+            email='jwt_patient@test.com',
+            password='testpass123',
+            role='patient'
+        )
+        access = PrincipalRefreshToken.for_user(self.patient).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+
+    def test_tokens_carry_principal_claims(self):
+        token = PrincipalRefreshToken.for_user(self.patient).access_token
+        self.assertEqual(token['role'], 'patient')
+        self.assertTrue(token['is_active'])
+        self.assertEqual(token['policy_version'], 0)
+
+    def test_user_loaded_once_per_request(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/v1/auth/user/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['email'], 'jwt_patient@test.com')
+
+    @override_settings(JWT_CLAIMS_PRINCIPAL=True)
+    def test_claims_mode_blocks_without_queries(self):
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/admin/test-dashboard/')
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(JWT_CLAIMS_PRINCIPAL=True)
+    def test_claims_mode_loads_user_lazily(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/v1/auth/user/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['id'], self.patient.id)
+
+    @override_settings(JWT_CLAIMS_PRINCIPAL=True)
+    def test_principal_answers_claims_without_loading(self):
+        token = PrincipalRefreshToken.for_user(self.patient).access_token
+        principal = ClaimsPrincipal(token)
+        with self.assertNumQueries(0):
+            self.assertTrue(principal)
+            self.assertTrue(principal.is_authenticated)
+            self.assertEqual(principal.id, self.patient.id)
+            self.assertEqual(principal.role, 'patient')
+        self.assertIsInstance(principal, User)
+
+    def test_invalid_token_is_rejected(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer not-a-token')
+        response = self.client.get('/api/v1/auth/user/')
+        self.assertEqual(response.status_code, 401)
+
+    @override_settings(JWT_CLAIMS_PRINCIPAL=True)
+    def test_refresh_reissues_current_claims(self):
+        refresh = PrincipalRefreshToken.for_user(self.patient)
+        User.objects.filter(pk=self.patient.pk).update(role='doctor', accepted_policy_version=1)
+
+        response = self.client.post('/api/v1/auth/token/refresh/', {'refresh': str(refresh)})
+        self.assertEqual(response.status_code, 200)
+        for token in (PrincipalRefreshToken(response.data['refresh']), AccessToken(response.data['access'])):
+            self.assertEqual((token['role'], token['policy_version']), ('doctor', 1))
+
+        User.objects.filter(pk=self.patient.pk).update(is_active=False)
+        response = self.client.post('/api/v1/auth/token/refresh/', {'refresh': response.data['refresh']})
+        self.assertEqual(response.status_code, 401)
+
+    @override_settings(JWT_CLAIMS_PRINCIPAL=True)
+    def test_policy_receipt_follows_acceptance_not_the_token(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir, ignore_errors=True)
+        with override_settings(STORAGES={
+            'default': {'BACKEND': 'django.core.files.storage.InMemoryStorage'},
+            'pdf_cache': {'BACKEND': 'core.storage.AtomicFileSystemStorage', 'OPTIONS': {'location': cache_dir}},
+        }):
+            self.assertEqual(self.client.get('/api/v1/auth/download-policy-receipt/').status_code, 404)
+            self.assertEqual(self.client.post('/api/v1/auth/accept-policy/').status_code, 200)
+            # The access token still says policy_version 0
+            self.assertEqual(self.client.get('/api/v1/auth/download-policy-receipt/').status_code, 200)
+
+
+class RoutePolicyTest(TestCase):
+    """ROUTE_ACCESS_POLICY drives RoleMiddleware and the permission classes."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.patient = User.objects.create_user(
+            username='policy_patient',
+            email='policy_patient@test.com',
+            password='testpass123',
+            role='patient'
+        )
+        self.client.force_authenticate(self.patient)
+
+    def test_trie_matches_area_under_every_mount(self):
+        policy = get_route_policy()
+        self.assertEqual(policy.match('/api/admin/staff/').area, 'admin')
+        self.assertEqual(policy.match('/api/v1/doctor/ai-suggestions/').area, 'doctor')
+        self.assertIsNone(policy.match('/api/v1/appointments/'))
+        self.assertIsNone(policy.match('/api/doctorate/'))
+
+    def test_versioned_admin_area_is_enforced(self):
+        client = APIClient()
+        access = PrincipalRefreshToken.for_user(self.patient).access_token
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        response = client.get('/api/v1/admin/test-dashboard/')
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.json()['error'], 'Forbidden: Admin Access Only')
+
+    def test_permissions_read_roles_from_policy(self):
+        request = type('Request', (), {'user': self.patient})()
+        self.assertTrue(IsPatient().has_permission(request, None))
+        self.assertTrue(IsDoctorOrPatient().has_permission(request, None))
+        self.assertFalse(IsDoctor().has_permission(request, None))
+
+        policy = {
+            'mounts': ['/api/'],
+            'areas': {
+                'doctor': {'prefix': 'doctor/', 'roles': ['provider', 'patient'], 'message': 'x'},
+                'patient': {'prefix': 'patient/', 'roles': [], 'message': 'x'},
+                'admin': {'prefix': 'admin/', 'roles': ['admin'], 'message': 'x'},
+            },
+        }
+        with override_settings(ROUTE_ACCESS_POLICY=policy):
+            self.assertTrue(IsDoctor().has_permission(request, None))
+            self.assertFalse(IsPatient().has_permission(request, None))
+
+
+class AsyncAuditHandlerTest(TestCase):
+    """The privacy audit pipeline writes off-thread, in batches, and rotates."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.filename = os.path.join(self.tmpdir, 'privacy_audit.log')
+
+    def make_record(self, user_id):
+        return logging.LogRecord(
+            'authentication.middleware_logging', logging.INFO, __file__, 0,
+            "ACCESS: User ID %s accessed %s via %s", (user_id, '/api/v1/auth/user/', 'GET'), None
+        )
+
+    def test_events_are_written_in_batches(self):
+        handler = AsyncAuditHandler(filename=self.filename, batch_size=50)
+        for user_id in range(200):
+            handler.handle(self.make_record(user_id))
+        handler.flush()
+        handler.close()
+
+        with open(self.filename) as f:
+            lines = f.read().splitlines()
+        self.assertEqual(len(lines), 200)
+        self.assertEqual(lines[0], 'ACCESS: User ID 0 accessed /api/v1/auth/user/ via GET')
+        stats = handler.stats()
+        self.assertEqual(stats['written'], 200)
+        self.assertLessEqual(stats['batches'], 200)
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        handler = AsyncAuditHandler(filename=self.filename, queue_size=2)
+        handler._ensure_worker = lambda: None  # keep the worker from draining
+        for user_id in range(5):
+            handler.handle(self.make_record(user_id))
+        stats = handler.stats()
+        self.assertEqual(stats['enqueued'], 2)
+        self.assertEqual(stats['dropped'], 3)
+        self.assertEqual(stats['queue_high_water'], 2)
+        handler.sink.close()
+
+    def test_file_sink_rotates_by_size(self):
+        sink = FileAuditSink(self.filename, max_bytes=100, backup_count=2)
+        for _ in range(5):
+            sink.write(['x' * 60, 'y' * 60])
+        sink.close()
+
+        rotated = [name for name in os.listdir(self.tmpdir) if name != 'privacy_audit.log']
+        self.assertEqual(len(rotated), 2)
+        self.assertTrue(all(name.startswith('privacy_audit.log.') for name in rotated))
+
+    def test_database_sink_bulk_inserts(self):
+        record = self.make_record(7)
+        record.user_id, record.path, record.method = 7, '/api/v1/auth/user/', 'GET'
+        with self.assertNumQueries(1):
+            DatabaseAuditSink().write_records([record] * 3)
+        self.assertEqual(AccessAuditLog.objects.filter(user_id=7).count(), 3)
+
+    def test_admin_cannot_edit_or_delete_entries(self):
+        from django.contrib import admin
+        from django.test import RequestFactory
+
+        model_admin = admin.site._registry[AccessAuditLog]
+        superuser = User.objects.create_superuser(username='audit_root', email='audit_root@test.com')
+        request = RequestFactory().get('/admin/authentication/accessauditlog/')
+        request.user = superuser
+        self.assertFalse(model_admin.has_add_permission(request))
+        self.assertFalse(model_admin.has_change_permission(request))
+        self.assertFalse(model_admin.has_delete_permission(request))
+        self.assertNotIn('delete_selected', model_admin.get_actions(request))
+
+
+class AuditLogReaderTest(TestCase):
+    """Indexed, newest-first queries over the audit file."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.filename = os.path.join(self.tmpdir, 'privacy_audit.log')
+        self.now = timezone.now().replace(microsecond=0)
+
+    def write_events(self, filename, events):
+        with open(filename, 'a') as f:
+            for minutes_ago, user_id in events:
+                ts = _log_time(self.now - timedelta(minutes=minutes_ago))
+                f.write(f"{ts} INFO ACCESS: User ID {user_id} accessed /api/v1/x/ via GET\n")
+
+    def test_newest_first_pagination(self):
+        self.write_events(self.filename, [(300 - i, i % 5) for i in range(300)])
+        reader = AuditLogReader(self.filename)
+
+        first = reader.query(page_size=100)
+        self.assertEqual(len(first.entries), 100)
+        self.assertTrue(first.has_next)
+        self.assertEqual(first.entries[0].user_id, str(299 % 5))
+
+        last = reader.query(page=3, page_size=100)
+        self.assertEqual(len(last.entries), 100)
+        self.assertFalse(last.has_next)
+        self.assertEqual(last.entries[-1].user_id, '0')
+
+    def test_user_and_time_filters(self):
+        # 2000 events, one per minute, spread over 50 users
+        self.write_events(self.filename, [(2000 - i, i % 50) for i in range(2000)])
+        reader = AuditLogReader(self.filename)
+
+        result = reader.query(user_id=42, since=self.now - timedelta(hours=24), page_size=10)
+        self.assertTrue(all(entry.user_id == '42' for entry in result.entries))
+        self.assertEqual(len(result.entries), 10)
+
+        timestamps = [entry.timestamp for entry in result.entries]
+        self.assertEqual(timestamps, sorted(timestamps, reverse=True))
+
+        window = reader.query(since=self.now - timedelta(minutes=100), page_size=500)
+        self.assertEqual(len(window.entries), 100)
+
+    def test_index_skips_blocks_without_the_user(self):
+        self.write_events(self.filename, [(5000 - i, 1) for i in range(5000)])
+        self.write_events(self.filename, [(0, 99)])
+        reader = AuditLogReader(self.filename)
+        result = reader.query(user_id=99)
+        self.assertEqual([entry.user_id for entry in result.entries], ['99'])
+
+        index = audit_reader._get_index(os.stat(self.filename))
+        candidates = [
+            block for block in index.blocks
+            if block.may_contain(audit_reader._bloom_bits(b'99'))
+        ]
+        self.assertGreater(len(index.blocks), 10)
+        self.assertEqual(len(candidates), 1)
+
+    def test_index_follows_appends_and_rotation(self):
+        self.write_events(self.filename, [(10, 1)])
+        reader = AuditLogReader(self.filename)
+        self.assertEqual(len(reader.query().entries), 1)
+
+        os.rename(self.filename, self.filename + '.2026-01-01')
+        self.write_events(self.filename, [(5, 2), (1, 3)])
+        users = [entry.user_id for entry in reader.query().entries]
+        self.assertEqual(users, ['3', '2', '1'])
+
+    def test_admin_endpoint_filters_by_user(self):
+        admin = User.objects.create_user(
+            username='audit_admin', email='audit_admin@test.com',
+            password='testpass123', role='admin'
+        )
+        self.write_events(self.filename, [(3, 1), (2, 2), (1, 1)])
+        client = APIClient()
+        client.force_authenticate(user=admin)
+        with self.settings(PRIVACY_AUDIT_LOG=self.filename):
+            response = client.get('/api/v1/admin/audit-logs/', {'user_id': 1, 'hours': 24})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([entry['user_id'] for entry in response.data['entries']], ['1', '1'])
+        self.assertEqual(len(response.data['logs']), 2)
+        self.assertIn('pipeline', response.data)
+
+        for hours in ('1e8', 'inf', 'nan', 'soon'):
+            response = client.get('/api/v1/admin/audit-logs/', {'hours': hours})
+            self.assertEqual(response.status_code, 400, hours)
+
+
+@override_settings(RATELIMIT_ENABLE=False)
+class LoginLockoutTest(TransactionTestCase):
+    """Failed-login counting is exact under concurrency and writes narrowly."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username='lockout_user',
+            email='lockout_user@test.com',
+            password='testpass123',
+            role='patient'
+        )
+
+    def login(self, password):
+        return self.client.post(
+            '/api/v1/auth/login/', {'username': 'lockout_user', 'password': password}
+        )
+
+    def test_parallel_failures_lock_at_exact_threshold(self):
+        workers = 20
+        barrier = threading.Barrier(workers)
+        results = []
+        errors = []
+
+        def attempt():
+            try:
+                user = User.objects.get(pk=self.user.pk)
+                barrier.wait()
+                while True:
+                    try:
+                        results.append(user.record_failed_login(
+                            MAX_FAILED_ATTEMPTS, timedelta(minutes=LOCKOUT_DURATION_MINUTES)
+                        ))
+                        break
+                    except OperationalError as e:
+                        # SQLite's shared-cache test database refuses
+                        # concurrent writers outright instead of queueing them
+                        if 'locked' not in str(e):
+                            raise
+            except Exception as e:  # surfaced by the assertion below
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=attempt) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        counted = sorted(attempts for attempts, _ in results if attempts is not None)
+        self.assertEqual(counted, list(range(1, MAX_FAILED_ATTEMPTS + 2)))
+        self.assertEqual(sum(newly_locked for _, newly_locked in results), 1)
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.failed_login_attempts, MAX_FAILED_ATTEMPTS + 1)
+        self.assertTrue(self.user.is_account_locked())
+
+    def test_lockout_sequence_through_login_view(self):
+        for attempt in range(1, MAX_FAILED_ATTEMPTS + 1):
+            response = self.login('wrong')
+            self.assertEqual(response.status_code, 401)
+            self.assertIn(f'{MAX_FAILED_ATTEMPTS - attempt + 1} attempts remaining', response.data['error'])
+        self.assertEqual(self.login('wrong').status_code, 403)
+        self.assertEqual(self.login('testpass123').status_code, 403)
+
+    def test_expired_lock_restarts_count(self):
+        User.objects.filter(pk=self.user.pk).update(
+            failed_login_attempts=MAX_FAILED_ATTEMPTS + 1,
+            locked_until=timezone.now() - timedelta(minutes=1),
+        )
+        response = self.login('wrong')
+        self.assertEqual(response.status_code, 401)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.failed_login_attempts, 1)
+        self.assertIsNone(self.user.locked_until)
+
+    def test_successful_login_writes_one_narrow_update(self):
+        User.objects.filter(pk=self.user.pk).update(failed_login_attempts=2)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.login('testpass123')
+        self.assertEqual(response.status_code, 200)
+        writes = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('UPDATE')]
+        self.assertEqual(len(writes), 1)
+        self.assertNotIn('"password"', writes[0])
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.failed_login_attempts, 0)
+
+
+@override_settings(
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    RATELIMIT_ENABLE=False,
+)
+class RecoveryCodeTest(TestCase):
+    """Recovery codes are found by HMAC lookup, not by trying every hash."""
+
+    def setUp(self):
+        self.codes = ['AAAA1111', 'BBBB2222', 'CCCC3333']
+        self.user = User.objects.create_user(
+            username='mfa_user', email='mfa_user@test.com',
+            password='testpass123', role='patient',
+            mfa_enabled=True, mfa_secret='JBSWY3DPEHPK3PXP',
+            mfa_recovery_codes=recovery_codes.hash_recovery_codes(self.codes),
+        )
+
+    def count_hash_checks(self, code, stored):
+        with mock.patch.object(
+            recovery_codes, 'verify_hash', wraps=recovery_codes.verify_hash
+        ) as checker:
+            index = recovery_codes.find_recovery_code(code, stored)
+        return index, checker.call_count
+
+    def test_new_format_costs_at_most_one_hash(self):
+        stored = self.user.mfa_recovery_codes
+        self.assertEqual(self.count_hash_checks('CCCC3333', stored), (2, 1))
+        self.assertEqual(self.count_hash_checks('WRONG000', stored), (None, 0))
+
+    def test_legacy_hashes_still_match(self):
+        from django.contrib.auth.hashers import make_password
+        stored = [make_password('OLD00001'), make_password('OLD00002')]
+        stored += recovery_codes.hash_recovery_codes(['NEW00001'])
+        self.assertEqual(recovery_codes.find_recovery_code('OLD00002', stored), 1)
+        self.assertEqual(recovery_codes.find_recovery_code('NEW00001', stored), 2)
+
+    def test_recovery_login_consumes_code(self):
+        response = APIClient().post('/api/v1/auth/mfa/login/', {
+            'temp_token': generate_temp_token(self.user),
+            'recovery_code': 'BBBB2222',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertEqual(len(self.user.mfa_recovery_codes), 2)
+        self.assertIsNone(recovery_codes.find_recovery_code('BBBB2222', self.user.mfa_recovery_codes))
+
+    def test_regenerated_codes_use_lookup_format(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        response = client.post('/api/v1/auth/mfa/recovery-codes/regenerate/', {'password': 'testpass123'})
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(all(code.startswith('hmac:') for code in self.user.mfa_recovery_codes))
+        self.assertIsNotNone(recovery_codes.find_recovery_code(
+            response.data['recovery_codes'][0], self.user.mfa_recovery_codes
+        ))
+
+
+class HashingExecutorTest(TestCase):
+    """The hashing pool rejects work at once when its backlog is full."""
+
+    def test_saturated_pool_rejects_immediately(self):
+        executor = HashingExecutor(max_workers=1, max_pending=2, timeout=5.0)
+        release = threading.Event()
+        holders = [threading.Thread(target=executor.run, args=(release.wait,)) for _ in range(2)]
+        for thread in holders:
+            thread.start()
+        while executor.pending < 2:
+            time.sleep(0.001)
+
+        start = time.monotonic()
+        with self.assertRaises(HashingBusy):
+            executor.run(lambda: None)
+        self.assertLess(time.monotonic() - start, 0.1)
+
+        release.set()
+        for thread in holders:
+            thread.join()
+        self.assertEqual(executor.run(lambda: 42), 42)
+        self.assertEqual(executor.stats()['rejected'], 1)
+
+    @override_settings(PASSWORD_HASHING_MAX_PENDING=0, RATELIMIT_ENABLE=False)
+    def test_login_returns_503_when_busy(self):
+        User.objects.create_user(
+            username='busy_user', email='busy_user@test.com',
+            password='testpass123', role='patient'
+        )
+        response = APIClient().post(
+            '/api/v1/auth/login/', {'username': 'busy_user', 'password': 'testpass123'}
+        )
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(User.objects.get(username='busy_user').failed_login_attempts, 0)
+
+
+class RecaptchaClientTest(TestCase):
+    """The reCAPTCHA client times out quickly and stops calling a dead service."""
+
+    def make_client(self, **adapter_options):
+        return RecaptchaClient(
+            secret='test', verify_url='https://recaptcha.test/siteverify', timeout=0.05,
+            failure_threshold=3, reset_timeout=60, adapter=StubRecaptchaAdapter(**adapter_options),
+        )
+
+    def test_stub_transport_verdicts(self):
+        client = self.make_client()
+        self.assertTrue(client.verify('token')['success'])
+        self.assertEqual(client.verify('invalid-token')['error-codes'], ['invalid-input-response'])
+        stats = client.stats()
+        self.assertEqual(stats['calls'], 2)
+        self.assertIsNotNone(stats['latency_ms']['p99'])
+
+    def test_circuit_opens_and_fails_fast(self):
+        client = self.make_client(delay=1.0)
+        for _ in range(3):
+            with self.assertRaises(CaptchaUnavailable):
+                client.verify('token')
+        self.assertEqual(client.breaker.state, CircuitBreaker.OPEN)
+
+        start = time.monotonic()
+        with self.assertRaises(CaptchaUnavailable):
+            client.verify('token')
+        self.assertLess(time.monotonic() - start, 0.01)
+        self.assertEqual(client.stats()['short_circuited'], 1)
+
+    def test_half_open_trial_closes_circuit(self):
+        client = self.make_client(fail=True)
+        client.breaker.reset_timeout = 0
+        for _ in range(3):
+            with self.assertRaises(CaptchaUnavailable):
+                client.verify('token')
+        client.session.get_adapter(client.verify_url).fail = False
+        self.assertTrue(client.verify('token')['success'])
+        self.assertEqual(client.breaker.state, CircuitBreaker.CLOSED)
+
+    @override_settings(RECAPTCHA_TRANSPORT='stub')
+    def test_registration_serializer_uses_client(self):
+        from .serializers import UserRegistrationSerializer
+        serializer = UserRegistrationSerializer()
+        self.assertEqual(serializer.validate_captcha_token('token'), 'token')
+        with self.assertRaises(ValidationError):
+            serializer.validate_captcha_token('invalid-token')
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class UserManagementListTest(TestCase):
+    """Keyset pagination, filters and cached counts for the admin user list."""
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(
+            username='list_admin', email='list_admin@test.com',
+            password='testpass123', role='admin'
+        )
+        joined = timezone.now() - timedelta(days=1)
+        for i in range(24):
+            User.objects.create_user(
+                username=f'member{i:02d}', email=f'member{i:02d}@test.com', password='testpass123',
+                role='provider' if i % 3 == 0 else 'patient',
+                mfa_enabled=i % 4 == 0,
+                # Pairs share a timestamp, so the id tie-break matters
+                date_joined=joined + timedelta(minutes=i // 2),
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+
+    def get(self, url='/api/v1/auth/users/', **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_cursor_walks_every_user_once_newest_first(self):
+        seen = []
+        data = self.get(page_size=10)
+        pages = [data]
+        while data['next']:
+            data = self.get(data['next'])
+            pages.append(data)
+        for page in pages:
+            seen += [(user['date_joined'], user['id']) for user in page['users']]
+
+        self.assertEqual(len(pages), 3)
+        self.assertEqual(len(seen), 25)
+        self.assertEqual(len(set(seen)), 25)
+        self.assertEqual(seen, sorted(seen, reverse=True))
+
+        back = self.get(pages[2]['previous'])
+        self.assertEqual([u['id'] for u in back['users']], [u['id'] for u in pages[1]['users']])
+
+    def test_filters_and_prefix_search(self):
+        self.assertEqual(self.get(role='provider')['count'], 8)
+        self.assertEqual(self.get(mfa_enabled='true')['count'], 6)
+        self.assertEqual(self.get(search='MEMBER1')['count'], 10)
+
+        response = self.client.get('/api/v1/auth/users/', {'is_active': 'maybe'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_deletion_pending_lists_users_who_requested_deletion(self):
+        member = User.objects.get(username='member05')
+        requester = APIClient()
+        requester.force_authenticate(user=member)
+        self.assertEqual(requester.post('/api/v1/auth/request-deletion/').status_code, 200)
+
+        pending = self.get(deletion_pending='true')
+        self.assertEqual([u['username'] for u in pending['users']], ['member05'])
+        others = self.get(deletion_pending='false', page_size=50)['users']
+        self.assertNotIn('member05', [u['username'] for u in others])
+        self.assertEqual(len(others), 24)
+
+    def test_count_is_cached_between_page_loads(self):
+        self.get(role='patient')
+        with CaptureQueriesContext(connection) as queries:
+            data = self.get(role='patient')
+        self.assertEqual(data['count'], 16)
+        self.assertFalse(any('COUNT(' in q['sql'].upper() for q in queries.captured_queries))
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get('/api/v1/auth/users/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    RATELIMIT_ENABLE=False,
+)
+class PasswordResetTokenTest(TestCase):
+    """Hashed reset tokens in their own table."""
+
+    NEW_PASSWORD = 'N3w-Passw0rd!!'
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='reset_me', email='reset_me@test.com',
+            password='testpass123', role='patient'
+        )
+        self.client = APIClient()
+
+    def confirm(self, token):
+        return self.client.post('/api/v1/auth/password-reset/confirm/', {
+            'token': token, 'password': self.NEW_PASSWORD, 'password_confirm': self.NEW_PASSWORD,
+        })
+
+    def test_request_stores_only_the_hash_and_leaves_user_row_alone(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/v1/auth/password-reset/', {'email': 'reset_me@test.com'})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(any(
+            q['sql'].startswith('UPDATE "users"') for q in queries.captured_queries
+        ))
+
+        from core.outbox import drain
+        drain()
+        token = mail.outbox[0].body.split('token=')[1].split()[0]
+        row = PasswordResetToken.objects.get(user=self.user)
+        self.assertEqual(row.token_hash, PasswordResetToken.hash_token(token))
+        self.assertNotIn(token, row.token_hash)
+
+    def test_confirm_resets_password_once(self):
+        token, _ = PasswordResetToken.issue(self.user)
+        PasswordResetToken.issue(self.user)
+
+        self.assertEqual(self.confirm(token).status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password(self.NEW_PASSWORD))
+        # Every outstanding token for the user is used up
+        self.assertFalse(PasswordResetToken.objects.filter(user=self.user).exists())
+        self.assertEqual(self.confirm(token).status_code, 400)
+
+    def test_expired_and_unknown_tokens_are_rejected(self):
+        token, row = PasswordResetToken.issue(self.user)
+        row.expires_at = timezone.now() - timedelta(seconds=1)
+        row.save(update_fields=['expires_at'])
+
+        response = self.confirm(token)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('expired', response.data['error'])
+        self.assertEqual(self.confirm('not-a-token').status_code, 400)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('testpass123'))
+
+    def test_confirm_lookup_is_by_indexed_hash(self):
+        token, _ = PasswordResetToken.issue(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertIsNotNone(PasswordResetToken.lookup(token))
+        self.assertEqual(len(queries.captured_queries), 1)
+        self.assertIn('"token_hash" =', queries.captured_queries[0]['sql'])
+
+    def test_prune_deletes_only_expired_tokens(self):
+        _, live = PasswordResetToken.issue(self.user)
+        for _ in range(5):
+            _, row = PasswordResetToken.issue(self.user)
+            PasswordResetToken.objects.filter(pk=row.pk).update(
+                expires_at=timezone.now() - timedelta(hours=2)
+            )
+
+        call_command('prune_password_reset_tokens', batch_size=2, stdout=open(os.devnull, 'w'))
+        self.assertEqual(list(PasswordResetToken.objects.values_list('pk', flat=True)), [live.pk])
+
+
+@override_settings(
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    JWT_BLACKLIST_FILTER_SYNC_SECONDS=60,
+)
+class BlacklistFilterTest(TestCase):
+    """Bloom filter in front of the refresh token blacklist, and token pruning."""
+
+    def setUp(self):
+        get_blacklist_filter.cache_clear()
+        self.user = User.objects.create_user(
+            username='refresher', email='refresher@test.com',
+            password='testpass123', role='patient'
+        )
+        self.client = APIClient()
+
+    def refresh(self, token):
+        return self.client.post('/api/v1/auth/token/refresh/', {'refresh': str(token)})
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        bloom = BloomFilter(1000, error_rate=0.01)
+        keys = [f'jti-{i}' for i in range(1000)]
+        for key in keys:
+            bloom.add(key)
+        self.assertTrue(all(key in bloom for key in keys))
+        false_positives = sum(f'other-{i}' in bloom for i in range(10000))
+        self.assertLess(false_positives, 300)
+
+    def test_rotation_blacklists_old_token_and_skips_db_for_new_one(self):
+        token = PrincipalRefreshToken.for_user(self.user)
+        response = self.refresh(token)
+        self.assertEqual(response.status_code, 200)
+
+        # The rotated-out token is refused, from this process's filter
+        self.assertEqual(self.refresh(token).status_code, 401)
+
+        rotated = PrincipalRefreshToken(response.data['refresh'])
+        self.assertEqual(rotated['role'], 'patient')
+        with CaptureQueriesContext(connection) as queries:
+            get_blacklist_filter().is_blacklisted(rotated['jti'])
+        self.assertEqual(len(queries.captured_queries), 0)
+
+    def test_tokens_blacklisted_elsewhere_are_picked_up_on_sync(self):
+        token = PrincipalRefreshToken.for_user(self.user)
+        get_blacklist_filter().rebuild()
+
+        # Written without signals, as another worker process would look
+        outstanding = OutstandingToken.objects.get(jti=token['jti'])
+        BlacklistedToken.objects.bulk_create([BlacklistedToken(token=outstanding)])
+        self.assertFalse(get_blacklist_filter().is_blacklisted(token['jti']))
+
+        get_blacklist_filter().sync()
+        self.assertEqual(self.refresh(token).status_code, 401)
+
+    def test_sync_rereads_rows_committed_after_the_last_sync(self):
+        early = PrincipalRefreshToken.for_user(self.user)
+        late = PrincipalRefreshToken.for_user(self.user)
+        get_blacklist_filter().rebuild()
+        outstanding = {row.jti: row for row in OutstandingToken.objects.all()}
+        BlacklistedToken.objects.bulk_create([BlacklistedToken(pk=10, token=outstanding[early['jti']])])
+        get_blacklist_filter().sync()
+
+        # Stamped (and given its key) before the sync above, committed after it
+        BlacklistedToken.objects.bulk_create([BlacklistedToken(pk=5, token=outstanding[late['jti']])])
+        with CaptureQueriesContext(connection) as queries:
+            get_blacklist_filter().sync()
+        self.assertTrue(get_blacklist_filter().is_blacklisted(late['jti']))
+        # Only the new row and the skipped keys are read, by key
+        self.assertIn('"id" > 10', queries.captured_queries[0]['sql'])
+        self.assertEqual(get_blacklist_filter().stats()['rows_per_sync'], 1)
+
+        # A skipped key is given up once no transaction could still hold it
+        with mock.patch('authentication.blacklist.time.monotonic', return_value=time.monotonic() + 60):
+            get_blacklist_filter().sync()
+        self.assertEqual(get_blacklist_filter()._skipped, {})
+
+    @override_settings(JWT_BLACKLIST_FILTER_REBUILD_SECONDS=0)
+    def test_rebuild_runs_in_the_background(self):
+        token = PrincipalRefreshToken.for_user(self.user)
+        blacklist = get_blacklist_filter()
+        blacklist.rebuild()
+
+        with mock.patch('authentication.blacklist.threading.Thread') as thread:
+            self.assertFalse(blacklist.is_blacklisted(token['jti']))
+            self.assertFalse(blacklist.is_blacklisted(token['jti']))
+        # One rebuild is started, and checks meanwhile use the old filter
+        thread.assert_called_once()
+        self.assertEqual(thread.call_args.kwargs['target'], blacklist._rebuild_in_background)
+        self.assertEqual(blacklist.rebuilds, 1)
+
+        # The worker thread closes its own connection; not this test's
+        with mock.patch('authentication.blacklist.connection'):
+            blacklist._rebuild_in_background()
+        self.assertEqual(blacklist.rebuilds, 2)
+        self.assertFalse(blacklist._rebuilding)
+
+    def test_prune_deletes_expired_tokens_and_their_blacklist_entries(self):
+        live = PrincipalRefreshToken.for_user(self.user)
+        for _ in range(5):
+            PrincipalRefreshToken.for_user(self.user).blacklist()
+        OutstandingToken.objects.exclude(jti=live['jti']).update(
+            expires_at=timezone.now() - timedelta(minutes=1)
+        )
+
+        call_command('prune_jwt_tokens', batch_size=2, stdout=open(os.devnull, 'w'))
+        self.assertEqual(list(OutstandingToken.objects.values_list('jti', flat=True)), [live['jti']])
+        self.assertFalse(BlacklistedToken.objects.exists())
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class CachedPDFTest(TestCase):
+    """Generated PDFs are rendered once, cached by content hash and served with ETags."""
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        storages_setting = {
+            'default': {'BACKEND': 'django.core.files.storage.InMemoryStorage'},
+            'pdf_cache': {
+                'BACKEND': 'core.storage.AtomicFileSystemStorage',
+                'OPTIONS': {'location': self.cache_dir},
+            },
+        }
+        override = override_settings(STORAGES=storages_setting)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.addCleanup(shutil.rmtree, self.cache_dir, ignore_errors=True)
+
+        self.user = User.objects.create_user(
+            username='pdf_user', email='pdf_user@test.com',
+            password='testpass123', role='patient',
+            accepted_policy_version=1, policy_accepted_at=timezone.now(),
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.render = mock.patch.object(pdf_utils, 'render_pdf', wraps=pdf_utils.render_pdf)
+        self.render_mock = self.render.start()
+        self.addCleanup(self.render.stop)
+
+    def download(self, **headers):
+        return self.client.get('/api/v1/auth/download-policy-receipt/', **headers)
+
+    def test_styles_are_built_once(self):
+        self.assertIs(pdf_utils.get_styles(), pdf_utils.get_styles())
+
+    def test_repeat_downloads_read_the_cached_file(self):
+        first = self.download()
+        self.assertEqual(first.status_code, 200)
+        body = b''.join(first.streaming_content)
+        self.assertTrue(body.startswith(b'%PDF'))
+
+        second = self.download()
+        self.assertEqual(b''.join(second.streaming_content), body)
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertEqual(self.render_mock.call_count, 1)
+
+    def test_matching_etag_gets_not_modified(self):
+        etag = self.download()['ETag']
+        response = self.download(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_new_acceptance_renders_a_new_receipt_and_drops_the_old_one(self):
+        etag = self.download()['ETag']
+        self.user.accepted_policy_version = 2
+        self.user.policy_accepted_at = timezone.now()
+        self.user.save()
+
+        response = self.download(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(os.listdir(os.path.join(self.cache_dir, str(self.user.id)))), 1)
+
+    def test_rendering_is_deterministic_and_purgeable(self):
+        context = pdf_utils.policy_receipt_context(self.user, 1)
+        self.assertEqual(
+            pdf_utils.render_pdf('policy_receipt', context),
+            pdf_utils.render_pdf('policy_receipt', context),
+        )
+        self.download()
+        pdf_utils.purge_user_documents(self.user.id)
+        self.assertEqual(os.listdir(os.path.join(self.cache_dir, str(self.user.id))), [])
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ScrubDeletedUsersTest(TestCase):
+    """Chunked, set-based, resumable scrubbing of deleted accounts."""
+
+    def setUp(self):
+        from labs.models import LabOrder
+        from patients.models import EmergencyContact, Patient
+
+        requested = timezone.now() - timedelta(days=31)
+        self.deleted = []
+        for i in range(5):
+            user = User.objects.create_user(
+                username=f'gone{i}', email=f'gone{i}@test.com', password='testpass123',
+                role='patient', first_name='Gone', last_name=f'Patient{i}',
+                deletion_requested_at=requested, is_active=False,
+            )
+            patient = Patient.objects.create(
+                user=user, patient_id=f'P-GONE-{i}', date_of_birth='1980-06-15', gender='F',
+                phone='+919876543210', emergency_contact='+919876543211',
+                address='12 Lake Road', city='Pune', state='MH', postal_code='411001',
+            )
+            EmergencyContact.objects.create(
+                patient=patient, name='Next Of Kin', relationship='spouse', phone='+919876543212'
+            )
+            LabOrder.objects.create(patient=user, clinical_notes='Lives alone at 12 Lake Road')
+            enqueue_email(
+                subject='Password Reset', message=f'Hello Gone Patient{i}', recipient_list=[user.email],
+                recipient_user=user, dedupe_key=f'password-reset:gone{i}',
+            )
+            self.deleted.append(user)
+        self.recent = User.objects.create_user(
+            username='recent', email='recent@test.com', password='testpass123', role='patient',
+            deletion_requested_at=timezone.now() - timedelta(days=2),
+        )
+        enqueue_email(subject='Password Reset', message='Hello', recipient_list=[self.recent.email],
+                      recipient_user=self.recent)
+
+    def test_scrubs_every_pii_table(self):
+        from labs.models import LabOrder
+        from patients.models import EmergencyContact, Patient
+
+        invitation = Invitation.objects.create(email='gone0@test.com', sent_by=self.recent, used_by=self.deleted[0])
+        enqueue_email(**invitations.invitation_email(invitation, self.recent))
+
+        call_command('scrub_deleted_users', chunk_size=2, stdout=open(os.devnull, 'w'))
+
+        user = User.objects.get(pk=self.deleted[0].pk)
+        self.assertEqual(user.email, f'deleted_{user.pk}@scrubbed.local')
+        self.assertEqual((user.first_name, user.last_name), ('Deleted', 'User'))
+        self.assertFalse(user.has_usable_password())
+        self.assertIsNone(user.deletion_requested_at)
+
+        patient = Patient.objects.get(user=user)
+        self.assertEqual((patient.address, patient.phone, patient.postal_code), ('', '', ''))
+        self.assertEqual(str(patient.date_of_birth), '1980-01-01')
+        self.assertFalse(EmergencyContact.objects.filter(patient__user__in=self.deleted).exists())
+        self.assertFalse(LabOrder.objects.filter(patient__in=self.deleted).exclude(clinical_notes='').exists())
+        self.assertEqual(list(OutboxEmail.objects.values_list('recipients', flat=True)), [['recent@test.com']])
+
+        self.assertEqual(User.objects.get(pk=self.recent.pk).email, 'recent@test.com')
+        run = ScrubRun.objects.get()
+        self.assertEqual((run.status, run.users_scrubbed), (ScrubRun.STATUS_COMPLETED, 5))
+        self.assertEqual(run.table_rows['emergency_contacts'], 5)
+        self.assertEqual(run.table_rows['email_outbox'], 6)
+
+    def test_statements_per_chunk_do_not_grow_with_users(self):
+        run = scrubbing.start_or_resume()
+        with CaptureQueriesContext(connection) as two_users:
+            scrubbing.scrub_chunk(run, [u.pk for u in self.deleted[:2]])
+        with CaptureQueriesContext(connection) as three_users:
+            scrubbing.scrub_chunk(run, [u.pk for u in self.deleted[2:]])
+        self.assertEqual(len(two_users.captured_queries), len(three_users.captured_queries))
+
+    def test_interrupted_run_resumes_from_checkpoint(self):
+        calls = []
+
+        def fail_second_chunk(user_ids):
+            calls.append(user_ids)
+            if len(calls) == 2:
+                raise RuntimeError('killed')
+            return 0
+
+        steps = scrubbing.SCRUB_STEPS + [('interrupt', fail_second_chunk)]
+        with mock.patch.object(scrubbing, 'SCRUB_STEPS', steps):
+            with self.assertRaises(RuntimeError):
+                scrubbing.run_scrub(scrubbing.start_or_resume(), chunk_size=2)
+
+        run = ScrubRun.objects.get()
+        self.assertEqual((run.status, run.users_scrubbed), (ScrubRun.STATUS_RUNNING, 2))
+        # The failed chunk was rolled back
+        self.assertEqual(User.objects.filter(pk=self.deleted[2].pk).values_list('email', flat=True).get(),
+                         'gone2@test.com')
+
+        resumed = scrubbing.start_or_resume()
+        self.assertEqual(resumed.pk, run.pk)
+        scrubbing.run_scrub(resumed, chunk_size=2)
+        self.assertEqual(resumed.users_scrubbed, 5)
+        self.assertFalse(scrubbing.pending_users(resumed.cutoff).exists())
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class BulkInviteTest(TestCase):
+    """Set-based bulk invitations with a per-row report."""
+
+    def setUp(self):
+        from django.contrib.auth.models import Group
+
+        self.admin = User.objects.create_user(
+            username='invite_admin', email='invite_admin@test.com', password='testpass123', role='admin'
+        )
+        self.admin.groups.add(Group.objects.get_or_create(name='Admin')[0])
+        User.objects.create_user(
+            username='staff_existing', email='Existing@Clinic.test', password='testpass123', role='doctor'
+        )
+        self.pending = Invitation.objects.create(email='pending@clinic.test', sent_by=self.admin)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_report_has_a_status_for_every_row(self):
+        emails = ['new1@clinic.test', 'NEW1@clinic.test', 'existing@clinic.test',
+                  'Pending@Clinic.test', 'not-an-email', 'new2@clinic.test']
+        with self.assertLogs('authentication.views', 'INFO') as logs:
+            response = self.client.post('/api/v1/auth/invite/bulk/', {'emails': emails}, format='json')
+        self.assertIn('Bulk invitation by invite_admin', logs.output[0])
+
+        self.assertEqual(response.status_code, 200)
+        statuses = [entry['status'] for entry in response.data['results']]
+        self.assertEqual(statuses, ['invited', 'duplicate', 'user_exists',
+                                    'already_invited', 'invalid_email', 'invited'])
+        self.assertEqual(response.data['results'][3]['token'], str(self.pending.token))
+        self.assertEqual(response.data['summary']['invited'], 2)
+
+        invitation = Invitation.objects.get(email='new1@clinic.test')
+        self.assertTrue(invitation.is_valid())
+        self.assertEqual(response.data['results'][0]['token'], str(invitation.token))
+
+        from core.outbox import drain
+        drain()
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), ['new1@clinic.test', 'new2@clinic.test'])
+        self.assertIn(f'token={invitation.token}', mail.outbox[0].body + mail.outbox[1].body)
+
+    def test_queries_do_not_grow_with_the_list(self):
+        def invite(count, prefix):
+            emails = [f'{prefix}{i}@clinic.test' for i in range(count)]
+            with CaptureQueriesContext(connection) as queries:
+                invitations.bulk_invite(emails, self.admin)
+            return len(queries.captured_queries)
+
+        # Both lists fit in one INSERT batch even with SQLite's parameter limit
+        self.assertEqual(invite(3, 'small'), invite(60, 'large'))
+        self.assertEqual(Invitation.objects.filter(email__startswith='large').count(), 60)
+
+    def test_csv_upload_and_command(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        upload = SimpleUploadedFile('staff.csv', b'name,email\nAsha,asha@clinic.test\nRavi,ravi@clinic.test\n')
+        response = self.client.post('/api/v1/auth/invite/bulk/', {'file': upload}, format='multipart')
+        self.assertEqual(response.data['summary'], {'invited': 2})
+
+        path = os.path.join(tempfile.mkdtemp(), 'staff.json')
+        with open(path, 'w') as f:
+            f.write('[{"email": "asha@clinic.test"}, "meera@clinic.test"]')
+        call_command('bulk_invite', path, sent_by='invite_admin@test.com', stdout=open(os.devnull, 'w'))
+        self.assertEqual(
+            set(Invitation.objects.values_list('email', flat=True)),
+            {'pending@clinic.test', 'asha@clinic.test', 'ravi@clinic.test', 'meera@clinic.test'},
+        )
+
+    def test_non_admin_is_rejected(self):
+        self.client.force_authenticate(User.objects.get(username='staff_existing'))
+        response = self.client.post('/api/v1/auth/invite/bulk/', {'emails': ['x@clinic.test']}, format='json')
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Invitation.objects.filter(email='x@clinic.test').exists())
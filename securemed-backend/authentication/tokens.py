@@ -0,0 +1,86 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, TokenError
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .blacklist import get_blacklist_filter
+
+
+# Claims copied from the User row into every token we issue.
+# RoleMiddleware and the permission classes read these instead of
+# loading the user when settings.JWT_CLAIMS_PRINCIPAL is enabled.
+PRINCIPAL_CLAIMS = {
+    'role': 'role',
+    'is_active': 'is_active',
+    'policy_version': 'accepted_policy_version',
+}
+
+
+def set_principal_claims(token, user):
+    """Copy the user's current PRINCIPAL_CLAIMS values into `token`."""
+    for claim, field in PRINCIPAL_CLAIMS.items():
+        token[claim] = getattr(user, field)
+
+
+class PrincipalRefreshToken(RefreshToken):
+    """
+    Refresh token that signs the user's role, active flag and accepted
+    policy version into its payload.
+
+    simplejwt copies refresh-token claims into every access token derived
+    from it and into the rotated refresh token, so left alone they would be
+    frozen at login; PrincipalTokenRefreshSerializer re-reads them from the
+    user on every refresh.
+
+    The blacklist check goes through the per-process Bloom filter in
+    `authentication.blacklist` unless settings.JWT_BLACKLIST_FILTER is off.
+    """
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        set_principal_claims(token, user)
+        return token
+
+    def check_blacklist(self):
+        if not settings.JWT_BLACKLIST_FILTER:
+            return super().check_blacklist()
+        if get_blacklist_filter().is_blacklisted(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_("Token is blacklisted"))
+
+
+class PrincipalTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    TokenRefreshView serializer that rotates PrincipalRefreshTokens.
+
+    The claims are set again from the user row before the access token and
+    the rotated refresh token are issued, so a role change, deactivation or
+    policy acceptance reaches the tokens at the next refresh.
+    """
+    token_class = PrincipalRefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+
+        user = get_user_model().objects.filter(
+            **{api_settings.USER_ID_FIELD: refresh.payload.get(api_settings.USER_ID_CLAIM)}
+        ).first()
+        if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+        set_principal_claims(refresh, user)
+
+        data = {'access': str(refresh.access_token)}
+
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                refresh.blacklist()
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            refresh.outstand()
+            data['refresh'] = str(refresh)
+
+        return data
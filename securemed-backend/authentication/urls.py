@@ -47,6 +47,7 @@ urlpatterns = [
     
     # Invitation System
     path('invite/send/', views.SendInviteView.as_view(), name='send_invite'),
+    path('invite/bulk/', views.BulkInviteView.as_view(), name='bulk_invite'),
     path('invite/verify/', views.verify_invite_view, name='verify_invite'),
     
     # User Management (Admin only) - Story 1.2
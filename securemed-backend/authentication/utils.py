@@ -1,5 +1,21 @@
-from django.utils import timezone
+"""
+PDF documents issued to users (deletion certificates, policy receipts).
+
+Styles are built once per process and each document type is a template in
+PDF_TEMPLATES that turns a plain context dict into a reportlab story.
+Rendering is deterministic, so a document is identified by a hash of its
+template and context: get_cached_pdf() renders it once into the 'pdf_cache'
+storage (see settings.STORAGES) and later downloads read the stored file.
+The hash doubles as the HTTP ETag.
+
+Cached documents contain PII and are stored under the user's ID so they can
+be purged with the rest of the user's data (purge_user_documents()).
+"""
+from collections import namedtuple
+from django.core.files.base import ContentFile
+from django.core.files.storage import storages
 from datetime import timedelta
+from functools import lru_cache
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
@@ -7,93 +23,99 @@ from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
 from reportlab.lib.enums import TA_CENTER, TA_LEFT
 import io
 import hashlib
+import json
 
+# Bump when a template's layout or wording changes, so cached PDFs are re-rendered
+TEMPLATE_VERSION = 1
 
-def generate_deletion_certificate(user):
+CachedPDF = namedtuple('CachedPDF', ['name', 'etag'])
+
+
+@lru_cache(maxsize=None)
+def get_styles():
     """
-    Generate a PDF certificate for account deletion request.
-    
-    Args:
-        user: User instance who requested deletion
-        
-    Returns:
-        BytesIO buffer containing the PDF
+    Paragraph styles shared by every document, built once per process.
     """
-    # Create a buffer to hold the PDF
-    buffer = io.BytesIO()
-    
-    # Create the PDF document
-    doc = SimpleDocTemplate(buffer, pagesize=letter)
-    story = []
-    
-    # Get styles
     styles = getSampleStyleSheet()
-    
-    # Custom styles
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor='#1a1a1a',
-        spaceAfter=30,
-        alignment=TA_CENTER,
-        fontName='Helvetica-Bold'
-    )
-    
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        fontSize=16,
-        textColor='#333333',
-        spaceAfter=12,
-        alignment=TA_LEFT,
-        fontName='Helvetica-Bold'
-    )
-    
-    body_style = ParagraphStyle(
-        'CustomBody',
-        parent=styles['BodyText'],
-        fontSize=12,
-        textColor='#555555',
-        spaceAfter=12,
-        alignment=TA_LEFT,
-        leading=16
-    )
-    
-    # Calculate deletion date (30 days from request)
+    return {
+        'title': ParagraphStyle(
+            'CustomTitle',
+            parent=styles['Heading1'],
+            fontSize=24,
+            textColor='#1a1a1a',
+            spaceAfter=30,
+            alignment=TA_CENTER,
+            fontName='Helvetica-Bold'
+        ),
+        'heading': ParagraphStyle(
+            'CustomHeading',
+            parent=styles['Heading2'],
+            fontSize=16,
+            textColor='#333333',
+            spaceAfter=12,
+            alignment=TA_LEFT,
+            fontName='Helvetica-Bold'
+        ),
+        'body': ParagraphStyle(
+            'CustomBody',
+            parent=styles['BodyText'],
+            fontSize=12,
+            textColor='#555555',
+            spaceAfter=12,
+            alignment=TA_LEFT,
+            leading=16
+        ),
+        'footer': ParagraphStyle(
+            'Footer',
+            parent=styles['BodyText'],
+            fontSize=10,
+            textColor='#888888',
+            alignment=TA_CENTER
+        ),
+    }
+
+
+def _format_time(value):
+    return value.strftime('%B %d, %Y at %H:%M UTC') if value else "N/A"
+
+
+def deletion_certificate_context(user):
+    """Everything the deletion certificate shows, as plain values."""
+    # Deletion happens 30 days after the request
     deletion_date = user.deletion_requested_at + timedelta(days=30)
-    
-    # Build the document content
+    return {
+        'email': user.email,
+        'user_id': user.id,
+        'requested_at': _format_time(user.deletion_requested_at),
+        'deletion_date': _format_time(deletion_date),
+    }
+
+
+def _deletion_certificate_story(context, styles):
+    story = []
     story.append(Spacer(1, 0.5 * inch))
-    
+
     # Title
-    title = Paragraph("Account Deletion Certificate", title_style)
-    story.append(title)
+    story.append(Paragraph("Account Deletion Certificate", styles['title']))
     story.append(Spacer(1, 0.3 * inch))
-    
+
     # Certificate body
-    story.append(Paragraph("Certificate of Account Deletion Request", heading_style))
+    story.append(Paragraph("Certificate of Account Deletion Request", styles['heading']))
     story.append(Spacer(1, 0.2 * inch))
-    
+
     # User information
-    story.append(Paragraph(f"<b>User Email:</b> {user.email}", body_style))
-    story.append(Paragraph(f"<b>User ID:</b> {user.id}", body_style))
+    story.append(Paragraph(f"<b>User Email:</b> {context['email']}", styles['body']))
+    story.append(Paragraph(f"<b>User ID:</b> {context['user_id']}", styles['body']))
     story.append(Spacer(1, 0.2 * inch))
-    
+
     # Deletion details
-    story.append(Paragraph("<b>Deletion Request Details:</b>", heading_style))
-    story.append(Paragraph(
-        f"Request Date: {user.deletion_requested_at.strftime('%B %d, %Y at %H:%M UTC')}",
-        body_style
-    ))
-    story.append(Paragraph(
-        f"Scheduled Deletion Date: {deletion_date.strftime('%B %d, %Y at %H:%M UTC')}",
-        body_style
-    ))
+    story.append(Paragraph("<b>Deletion Request Details:</b>", styles['heading']))
+    story.append(Paragraph(f"Request Date: {context['requested_at']}", styles['body']))
+    story.append(Paragraph(f"Scheduled Deletion Date: {context['deletion_date']}", styles['body']))
     story.append(Spacer(1, 0.3 * inch))
-    
+
     # Notice
-    story.append(Paragraph("<b>Important Notice:</b>", heading_style))
+    story.append(Paragraph("<b>Important Notice:</b>", styles['heading']))
     notice_text = """
     This certificate confirms that your account deletion request has been received and processed.
     Your account has been immediately deactivated. All personally identifiable information (PII)
@@ -102,104 +124,139 @@ def generate_deletion_certificate(user):
     You have a 30-day grace period during which you may contact support to cancel this deletion
     request and restore your account. After the scheduled deletion date, this action cannot be reversed.
     """
-    story.append(Paragraph(notice_text, body_style))
+    story.append(Paragraph(notice_text, styles['body']))
     story.append(Spacer(1, 0.5 * inch))
-    
-    # Footer
-    footer_style = ParagraphStyle(
-        'Footer',
-        parent=styles['BodyText'],
-        fontSize=10,
-        textColor='#888888',
-        alignment=TA_CENTER
-    )
+
+    # Footer (the certificate is issued when the request is made)
+    story.append(Paragraph(f"Issued on {context['requested_at']}", styles['footer']))
+    story.append(Paragraph("SecureMed - Privacy & Data Protection", styles['footer']))
+    return story
+
+
+def policy_receipt_context(user, version):
+    """Everything the policy receipt shows, as plain values."""
+    # Generate Consent ID
+    consent_data = f"{user.id}:{user.policy_accepted_at}:{version}".encode('utf-8')
+    return {
+        # User model might not have full name, using username
+        'username': user.username,
+        'email': user.email,
+        'version': version,
+        'accepted_at': _format_time(user.policy_accepted_at),
+        'consent_id': hashlib.sha256(consent_data).hexdigest()[:16].upper(),
+    }
+
+
+def _policy_receipt_story(context, styles):
+    story = []
+    story.append(Spacer(1, 0.5 * inch))
+    story.append(Paragraph("Policy Acceptance Receipt", styles['title']))
+    story.append(Spacer(1, 0.3 * inch))
+
+    story.append(Paragraph("<b>User Information:</b>", styles['heading']))
+    story.append(Paragraph(f"Full Name: {context['username']}", styles['body']))
+    story.append(Paragraph(f"Email: {context['email']}", styles['body']))
+
+    story.append(Paragraph("<b>Acceptance Details:</b>", styles['heading']))
+    story.append(Paragraph(f"Policy Version: v{context['version']}", styles['body']))
+    story.append(Paragraph(f"Timestamp: {context['accepted_at']}", styles['body']))
+    story.append(Paragraph(f"Consent ID: {context['consent_id']}", styles['body']))
+
+    story.append(Spacer(1, 1 * inch))
+    story.append(Paragraph("<b>Legal Acknowledgement:</b>", styles['heading']))
     story.append(Paragraph(
-        f"Generated on {timezone.now().strftime('%B %d, %Y at %H:%M UTC')}",
-        footer_style
+        "By accepting these terms, you have agreed to SecureMed's data processing agreement, "
+        "privacy policy, and terms of service. This document serves as a digital proof of consent.",
+        styles['body']
     ))
-    story.append(Paragraph("SecureMed - Privacy & Data Protection", footer_style))
-    
-    # Build the PDF
-    doc.build(story)
-    
-    # Get the PDF data
-    buffer.seek(0)
-    return buffer
+    return story
+
+
+PDF_TEMPLATES = {
+    'deletion_certificate': _deletion_certificate_story,
+    'policy_receipt': _policy_receipt_story,
+}
+
+
+def render_pdf(template, context):
+    """
+    Render a document to PDF bytes.
+
+    `invariant` leaves out reportlab's timestamp and random document ID, so
+    the same template and context always produce the same bytes.
+    """
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter, invariant=True)
+    doc.build(PDF_TEMPLATES[template](context, get_styles()))
+    return buffer.getvalue()
+
+
+def pdf_cache_key(template, context):
+    payload = json.dumps(
+        {'template': template, 'version': TEMPLATE_VERSION, 'context': context},
+        sort_keys=True, default=str,
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def get_cached_pdf(template, user_id, context):
+    """
+    Return the stored copy of a document, rendering and storing it first if
+    this exact document has not been generated before.
+
+    Returns:
+        CachedPDF: storage name and ETag of the document
+    """
+    storage = storages['pdf_cache']
+    key = pdf_cache_key(template, context)
+    name = f"{user_id}/{template}-{key}.pdf"
+    if not storage.exists(name):
+        storage.save(name, ContentFile(render_pdf(template, context)))
+        # Older versions of this document (e.g. an earlier policy) are stale
+        _, files = storage.listdir(str(user_id))
+        for filename in files:
+            if filename.startswith(f"{template}-") and filename != f"{template}-{key}.pdf":
+                storage.delete(f"{user_id}/{filename}")
+    return CachedPDF(name=name, etag=f'"{key}"')
+
+
+def open_cached_pdf(cached):
+    return storages['pdf_cache'].open(cached.name, 'rb')
+
+
+def purge_user_documents(user_id):
+    """Delete every cached document generated for a user."""
+    storage = storages['pdf_cache']
+    try:
+        _, files = storage.listdir(str(user_id))
+    except FileNotFoundError:
+        return
+    for filename in files:
+        storage.delete(f"{user_id}/{filename}")
+
+
+def generate_deletion_certificate(user):
+    """
+    Generate a PDF certificate for account deletion request.
+
+    Args:
+        user: User instance who requested deletion
+
+    Returns:
+        BytesIO buffer containing the PDF
+    """
+    return io.BytesIO(render_pdf('deletion_certificate', deletion_certificate_context(user)))
 
 
 def generate_policy_receipt(user, version):
     """
     Generate a PDF receipt for policy acceptance.
-    
+
     Args:
         user: User instance who accepted policy
         version: Policy version accepted
-        
+
     Returns:
         BytesIO buffer containing the PDF
     """
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter)
-    story = []
-    
-    styles = getSampleStyleSheet()
-    
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor='#1a1a1a',
-        spaceAfter=30,
-        alignment=TA_CENTER,
-        fontName='Helvetica-Bold'
-    )
-    
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        fontSize=16,
-        textColor='#333333',
-        spaceAfter=12,
-        alignment=TA_LEFT,
-        fontName='Helvetica-Bold'
-    )
-    
-    body_style = ParagraphStyle(
-        'CustomBody',
-        parent=styles['BodyText'],
-        fontSize=12,
-        textColor='#555555',
-        spaceAfter=12,
-        alignment=TA_LEFT,
-        leading=16
-    )
-    
-    # Generate Consent ID
-    consent_data = f"{user.id}:{user.policy_accepted_at}:{version}".encode('utf-8')
-    consent_id = hashlib.sha256(consent_data).hexdigest()[:16].upper()
-    
-    story.append(Spacer(1, 0.5 * inch))
-    story.append(Paragraph("Policy Acceptance Receipt", title_style))
-    story.append(Spacer(1, 0.3 * inch))
-    
-    story.append(Paragraph("<b>User Information:</b>", heading_style))
-    story.append(Paragraph(f"Full Name: {user.username}", body_style)) # User model might not have full name, using username
-    story.append(Paragraph(f"Email: {user.email}", body_style))
-    
-    story.append(Paragraph("<b>Acceptance Details:</b>", heading_style))
-    story.append(Paragraph(f"Policy Version: v{version}", body_style))
-    timestamp = user.policy_accepted_at.strftime('%B %d, %Y at %H:%M UTC') if user.policy_accepted_at else "N/A"
-    story.append(Paragraph(f"Timestamp: {timestamp}", body_style))
-    story.append(Paragraph(f"Consent ID: {consent_id}", body_style))
-    
-    story.append(Spacer(1, 1 * inch))
-    story.append(Paragraph("<b>Legal Acknowledgement:</b>", heading_style))
-    story.append(Paragraph(
-        "By accepting these terms, you have agreed to SecureMed's data processing agreement, "
-        "privacy policy, and terms of service. This document serves as a digital proof of consent.",
-        body_style
-    ))
-    
-    doc.build(story)
-    buffer.seek(0)
-    return buffer
+    return io.BytesIO(render_pdf('policy_receipt', policy_receipt_context(user, version)))
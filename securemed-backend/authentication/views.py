@@ -1,20 +1,28 @@
+import logging
 from datetime import timedelta
 from django.utils import timezone
 from django.contrib.auth import get_user_model
-from django.contrib.auth.hashers import make_password, check_password
-from django.core.mail import send_mail
-from ratelimit.decorators import ratelimit
+from django.db import transaction
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
 import pyotp
 import jwt
 import secrets
 import string
 from django.conf import settings
 
+from core.outbox import enqueue_email
+from core.ratelimit import rate_limit
+from .tokens import PrincipalRefreshToken
+from .recovery_codes import find_recovery_code, hash_recovery_codes
+from .hashing import hash_password, verify_password
+from .models import PasswordResetToken
+from .invitations import (
+    bulk_invite, emails_from_data, invitation_email, parse_invite_list, registration_link, summarize,
+)
 from .serializers import (
     UserRegistrationSerializer,
     UserLoginSerializer,
@@ -31,6 +39,7 @@ from .serializers import (
 )
 
 User = get_user_model()
+logger = logging.getLogger(__name__)
 
 # Constants
 MAX_FAILED_ATTEMPTS = 5
@@ -55,7 +64,7 @@ def get_tokens_for_user(user):
     """
     Generate JWT tokens for a user.
     """
-    refresh = RefreshToken.for_user(user)
+    refresh = PrincipalRefreshToken.for_user(user)
     return {
         'refresh': str(refresh),
         'access': str(refresh.access_token),
@@ -142,7 +151,7 @@ def user_profile_view(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
-@ratelimit(key='ip', rate='3/m', block=True)
+@rate_limit('auth.register', rate='3/m')
 def register_view(request):
     """
     User registration endpoint with invite-only access.
@@ -275,7 +284,7 @@ def register_view(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
-@ratelimit(key='ip', rate='5/m', block=True)
+@rate_limit('auth.login', rate='5/m')
 def login_view(request):
     """
     User login endpoint with lockout and MFA support.
@@ -331,35 +340,33 @@ def login_view(request):
             'error': f'Account is locked. Try again in {remaining_time} minutes.'
         }, status=status.HTTP_403_FORBIDDEN)
     
-    # Reset lockout if time has passed
-    if user.locked_until and user.locked_until <= timezone.now():
-        user.locked_until = None
-        user.failed_login_attempts = 0
-        user.save()
-    
     # Verify password
-    if not user.check_password(password):
-        # Increment failed attempts
-        user.failed_login_attempts += 1
+    if not verify_password(user, password):
+        # Count the failure atomically; an expired lock restarts the count
+        attempts, newly_locked = user.record_failed_login(
+            MAX_FAILED_ATTEMPTS, timedelta(minutes=LOCKOUT_DURATION_MINUTES)
+        )
         
         # Lock account if max attempts exceeded
-        if user.failed_login_attempts > MAX_FAILED_ATTEMPTS:
-            user.locked_until = timezone.now() + timedelta(minutes=LOCKOUT_DURATION_MINUTES)
-            user.save()
+        if newly_locked:
             return Response({
                 'error': f'Too many failed attempts. Account locked for {LOCKOUT_DURATION_MINUTES} minutes.'
             }, status=status.HTTP_403_FORBIDDEN)
         
-        user.save()
-        remaining_attempts = MAX_FAILED_ATTEMPTS - user.failed_login_attempts + 1
+        if attempts is None:
+            # Another request locked the account while this one was checking
+            remaining_time = (user.locked_until - timezone.now()).seconds // 60
+            return Response({
+                'error': f'Account is locked. Try again in {remaining_time} minutes.'
+            }, status=status.HTTP_403_FORBIDDEN)
+        
+        remaining_attempts = MAX_FAILED_ATTEMPTS - attempts + 1
         return Response({
             'error': f'Invalid credentials. {remaining_attempts} attempts remaining.'
         }, status=status.HTTP_401_UNAUTHORIZED)
     
-    # Password is correct - reset failed attempts
-    user.failed_login_attempts = 0
-    user.locked_until = None
-    user.save()
+    # Password is correct - reset failed attempts (one narrow UPDATE)
+    user.reset_failed_logins()
     
     # Check if MFA is enabled
     if user.mfa_enabled:
@@ -453,10 +460,9 @@ def mfa_verify_view(request):
         
         # Generate recovery codes
         plain_codes = generate_recovery_codes(count=10, length=8)
-        hashed_codes = [make_password(code) for code in plain_codes]
-        user.mfa_recovery_codes = hashed_codes
+        user.mfa_recovery_codes = hash_recovery_codes(plain_codes)
         
-        user.save()
+        user.save(update_fields=['mfa_enabled', 'mfa_recovery_codes'])
         
         print(f"[MFA VERIFY] MFA enabled for user {user.username}")
         print(f"[MFA VERIFY] Generated {len(plain_codes)} recovery codes")
@@ -589,9 +595,8 @@ def regenerate_recovery_codes_view(request):
     
     # Generate new recovery codes
     plain_codes = generate_recovery_codes(count=10, length=8)
-    hashed_codes = [make_password(code) for code in plain_codes]
-    user.mfa_recovery_codes = hashed_codes
-    user.save()
+    user.mfa_recovery_codes = hash_recovery_codes(plain_codes)
+    user.save(update_fields=['mfa_recovery_codes'])
     
     # Audit log
     print(f"[RECOVERY CODES] ✅ SUCCESS")
@@ -608,7 +613,7 @@ def regenerate_recovery_codes_view(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
-@ratelimit(key='ip', rate='5/m', block=True)
+@rate_limit('auth.mfa_login', rate='5/m')
 def mfa_login_view(request):
     """
     MFA login finalization endpoint - verifies OTP and returns JWT tokens.
@@ -691,17 +696,15 @@ def mfa_login_view(request):
                 'error': 'No recovery codes available'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Check recovery code against hashed codes
-        code_found = False
-        for i, hashed_code in enumerate(user.mfa_recovery_codes):
-            if check_password(recovery_code, hashed_code):
-                print(f"[MFA LOGIN] ✅ Recovery code matched (index {i})")
-                # Remove used recovery code
-                user.mfa_recovery_codes.pop(i)
-                user.save()
-                code_found = True
-                print(f"[MFA LOGIN] Recovery code deleted. Remaining codes: {len(user.mfa_recovery_codes)}")
-                break
+        # Check recovery code against hashed codes (HMAC lookup, one hash check)
+        i = find_recovery_code(recovery_code, user.mfa_recovery_codes)
+        code_found = i is not None
+        if code_found:
+            print(f"[MFA LOGIN] ✅ Recovery code matched (index {i})")
+            # Remove used recovery code
+            user.mfa_recovery_codes.pop(i)
+            user.save(update_fields=['mfa_recovery_codes'])
+            print(f"[MFA LOGIN] Recovery code deleted. Remaining codes: {len(user.mfa_recovery_codes)}")
         
         if not code_found:
             print(f"[MFA LOGIN] FAILED - Invalid recovery code")
@@ -881,7 +884,7 @@ class LogoutView(APIView):
     def post(self, request):
         try:
             refresh_token = request.data["refresh"]
-            token = RefreshToken(refresh_token)
+            token = PrincipalRefreshToken(refresh_token)
             token.blacklist()
             return Response({"message": "Successfully logged out"}, status=status.HTTP_205_RESET_CONTENT)
         except Exception as e:
@@ -905,7 +908,8 @@ class PasswordResetRequestView(APIView):
     """
     permission_classes = (AllowAny,)
 
-    @ratelimit(key='ip', rate='3/m', block=True)
+    @rate_limit('auth.password_reset', rate='3/m')
+    @rate_limit('auth.password_reset', rate='5/h', key='data:email')
     def post(self, request):
         serializer = PasswordResetRequestSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -915,16 +919,15 @@ class PasswordResetRequestView(APIView):
         try:
             user = User.objects.get(email__iexact=email, is_active=True)
             
-            # Generate reset token (valid for 1 hour)
-            reset_token = secrets.token_urlsafe(32)
-            user.password_reset_token = reset_token
-            user.password_reset_expires = timezone.now() + timedelta(hours=1)
-            user.save(update_fields=['password_reset_token', 'password_reset_expires'])
-            
-            # Send password reset email
-            reset_url = f"{settings.FRONTEND_URL}/reset-password?token={reset_token}"
-            subject = "Password Reset Request - SecureMed"
-            message = f"""
+            # Token row and email are committed together, or not at all.
+            # The user row itself is not written.
+            with transaction.atomic():
+                reset_token, token_row = PasswordResetToken.issue(user, lifetime=timedelta(hours=1))
+                
+                # Queue password reset email (sent by the outbox dispatcher)
+                reset_url = f"{settings.FRONTEND_URL}/reset-password?token={reset_token}"
+                subject = "Password Reset Request - SecureMed"
+                message = f"""
 Dear {user.get_full_name() or user.username},
 
 You requested a password reset for your SecureMed account.
@@ -938,15 +941,14 @@ If you did not request this reset, please ignore this email and your password wi
 
 Best regards,
 SecureMed Team
-            """
-            
-            send_mail(
-                subject=subject,
-                message=message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[user.email],
-                fail_silently=True,
-            )
+                """
+                enqueue_email(
+                    subject=subject,
+                    message=message,
+                    recipient_list=[user.email],
+                    recipient_user=user,
+                    dedupe_key=f"password-reset:{token_row.pk}",
+                )
             
         except User.DoesNotExist:
             pass  # Don't reveal if email exists
@@ -980,13 +982,16 @@ class PasswordResetConfirmView(APIView):
         serializer.is_valid(raise_exception=True)
         
         user = serializer.validated_data['user']
-        new_password = serializer.validated_data['password']
+        reset_token = serializer.validated_data['reset_token']
+        encoded = hash_password(serializer.validated_data['password'])
         
-        # Set new password
-        user.set_password(new_password)
-        user.password_reset_token = None
-        user.password_reset_expires = None
-        user.save(update_fields=['password', 'password_reset_token', 'password_reset_expires'])
+        # Consuming the token (and the user's other tokens) and setting the
+        # password happen together; a token raced by another request fails.
+        with transaction.atomic():
+            if not reset_token.consume():
+                raise ValidationError({'token': 'Invalid reset token.'})
+            user.password = encoded
+            user.save(update_fields=['password'])
         
         return Response({
             'message': 'Password has been reset successfully.'
@@ -1100,30 +1105,15 @@ class SendInviteView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Create new invitation
-        invitation = Invitation.objects.create(
-            email=email,
-            sent_by=request.user
-        )
-        
-        # Generate registration link
-        registration_link = f"http://localhost:3000/register?token={invitation.token}"
-        
-        # Mock email sending - print to console
-        print("\n" + "="*70)
-        print("INVITATION EMAIL (Mock)")
-        print("="*70)
-        print(f"To: {email}")
-        print(f"From: {request.user.email}")
-        print(f"Subject: You're invited to join SecureMed")
-        print("\nMessage:")
-        print(f"Hello,")
-        print(f"\nYou have been invited to join SecureMed by {request.user.get_full_name()}.")
-        print(f"\nPlease click the link below to complete your registration:")
-        print(f"{registration_link}")
-        print(f"\nThis invitation will expire in 48 hours.")
-        print(f"Expires at: {invitation.expires_at.strftime('%Y-%m-%d %H:%M:%S UTC')}")
-        print("="*70 + "\n")
+        with transaction.atomic():
+            # Create new invitation
+            invitation = Invitation.objects.create(
+                email=email,
+                sent_by=request.user
+            )
+            
+            # Queue the invitation email with the invitation itself
+            enqueue_email(**invitation_email(invitation, request.user))
         
         return Response({
             "message": "Invitation sent successfully",
@@ -1131,15 +1121,65 @@ class SendInviteView(APIView):
                 "email": invitation.email,
                 "token": str(invitation.token),
                 "expires_at": invitation.expires_at,
-                "registration_link": registration_link
+                "registration_link": registration_link(invitation)
             }
         }, status=status.HTTP_201_CREATED)
 
 
+class BulkInviteView(APIView):
+    """
+    Admin-only endpoint to invite many people at once.
+    
+    POST /api/auth/invite/bulk/
+    
+    Request body, either JSON:
+    {
+        "emails": ["a@example.com", "b@example.com"]
+    }
+    or a multipart upload of a CSV file in the "file" field (an "email"
+    column, or addresses in the first column).
+    
+    Response:
+    {
+        "summary": {"invited": 1, "user_exists": 1},
+        "results": [
+            {"row": 1, "email": "a@example.com", "status": "invited",
+             "token": "uuid-string", "expires_at": "2024-02-02T10:00:00Z"},
+            {"row": 2, "email": "b@example.com", "status": "user_exists"}
+        ]
+    }
+    
+    Row statuses: invited, invalid_email, duplicate, user_exists,
+    already_invited.
+    """
+    permission_classes = (IsAuthenticated,)
+    
+    def post(self, request):
+        if not request.user.groups.filter(name='Admin').exists():
+            return Response(
+                {"error": "Access denied. Admin role required."},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        upload = request.FILES.get('file')
+        try:
+            if upload is not None:
+                emails = parse_invite_list(upload.read().decode('utf-8-sig'), 'csv')
+            else:
+                emails = emails_from_data(request.data)
+            report = bulk_invite(emails, request.user)
+        except (ValueError, UnicodeDecodeError) as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        summary = summarize(report)
+        logger.info("Bulk invitation by %s: %s", request.user.username, summary)
+        return Response({"summary": summary, "results": report}, status=status.HTTP_200_OK)
+
+
 @api_view(['POST'])
 @permission_classes([AllowAny])
-@ratelimit(key='ip', rate='10/m', block=True)
-def mfa_verify_view(request):
+@rate_limit('auth.verify_invite', rate='10/m')
+def verify_invite_view(request):
     """
     Verify if an invitation token is valid.
     
@@ -1210,6 +1250,55 @@ def mfa_verify_view(request):
 from rest_framework import viewsets
 from rest_framework.decorators import action
 from django.shortcuts import get_object_or_404
+from django.db.models import Q
+from core.pagination import KeysetPagination, approximate_count
+
+
+_BOOLEAN_PARAMS = {'true': True, '1': True, 'false': False, '0': False}
+
+
+def _boolean_param(params, name):
+    value = params.get(name)
+    if value is None or value == '':
+        return None
+    try:
+        return _BOOLEAN_PARAMS[value.lower()]
+    except KeyError:
+        raise ValueError(f"{name} must be true or false")
+
+
+def filter_users(queryset, params):
+    """
+    Apply the user management list filters.
+    
+    `search` is a case-insensitive prefix match on email or username, which
+    the users_email_upper_prefix / users_username_upper_prefix indexes serve
+    on PostgreSQL.
+    """
+    if params.get('role'):
+        queryset = queryset.filter(role=params['role'])
+    
+    is_active = _boolean_param(params, 'is_active')
+    if is_active is not None:
+        queryset = queryset.filter(is_active=is_active)
+    
+    mfa_enabled = _boolean_param(params, 'mfa_enabled')
+    if mfa_enabled is not None:
+        queryset = queryset.filter(mfa_enabled=mfa_enabled)
+    
+    # Deletion requested but not yet scrubbed (scrub_deleted_users clears
+    # deletion_requested_at). Requesting deletion also deactivates the
+    # account, so is_active doesn't come into it.
+    deletion_pending = _boolean_param(params, 'deletion_pending')
+    if deletion_pending is not None:
+        queryset = queryset.filter(deletion_requested_at__isnull=not deletion_pending)
+    
+    search = params.get('search', '').strip()
+    if search:
+        queryset = queryset.filter(
+            Q(email__istartswith=search) | Q(username__istartswith=search)
+        )
+    return queryset
 
 
 class UserManagementViewSet(viewsets.ReadOnlyModelViewSet):
@@ -1232,7 +1321,12 @@ class UserManagementViewSet(viewsets.ReadOnlyModelViewSet):
         return super().get_queryset()
     
     def list(self, request, *args, **kwargs):
-        """List all users (Admin only)."""
+        """
+        List users, newest first (Admin only).
+        
+        Query params: role, is_active, mfa_enabled, deletion_pending
+        (true/false), search (email or username prefix), page_size, cursor.
+        """
         # Check admin permission
         if request.user.role != 'admin':
             return Response(
@@ -1240,11 +1334,22 @@ class UserManagementViewSet(viewsets.ReadOnlyModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
+        try:
+            queryset = filter_users(self.get_queryset(), request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Keyset pagination on (date_joined, id): no OFFSET, no full serialization
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        count, count_is_estimate = approximate_count(queryset)
         
         return Response({
-            'count': queryset.count(),
+            'count': count,
+            'count_is_estimate': count_is_estimate,
+            'next': paginator.get_next_link(),
+            'previous': paginator.get_previous_link(),
             'users': serializer.data
         })
     
@@ -1404,6 +1509,32 @@ class RequestAccountDeletionView(APIView):
         )
 
 
+def _pdf_download(request, template, user_id, context, filename):
+    """
+    Stream a cached PDF document as an attachment.
+
+    The ETag is the document's content hash, so a client that already has
+    the current version gets a 304 without the file being read.
+    """
+    from django.http import FileResponse
+    from django.utils.cache import get_conditional_response
+    from .utils import get_cached_pdf, open_cached_pdf
+
+    cached = get_cached_pdf(template, user_id, context)
+    response = get_conditional_response(request, etag=cached.etag)
+    if response is None:
+        response = FileResponse(
+            open_cached_pdf(cached),
+            as_attachment=True,
+            filename=filename,
+            content_type='application/pdf'
+        )
+    response['ETag'] = cached.etag
+    # Personal document: browsers may keep it but must revalidate
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
 class DownloadDeletionCertificateView(APIView):
     """
     Download deletion certificate PDF.
@@ -1421,8 +1552,7 @@ class DownloadDeletionCertificateView(APIView):
         Response:
             PDF file download
         """
-        from django.http import FileResponse
-        from .utils import generate_deletion_certificate
+        from .utils import deletion_certificate_context
         
         user = request.user
         
@@ -1446,16 +1576,11 @@ class DownloadDeletionCertificateView(APIView):
             print(f"Email: {user.email}")
             print(f"{'='*70}\n")
         
-        # Generate the PDF certificate
-        pdf_buffer = generate_deletion_certificate(user)
-        
-        # Return as file download
+        # Serve the certificate (rendered on first download only)
         filename = f"deletion_certificate_{user.id}.pdf"
-        response = FileResponse(
-            pdf_buffer,
-            as_attachment=True,
-            filename=filename,
-            content_type='application/pdf'
+        response = _pdf_download(
+            request, 'deletion_certificate', user.id,
+            deletion_certificate_context(user), filename
         )
         
         # Audit log
@@ -1515,10 +1640,11 @@ class DownloadPolicyReceiptView(APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
-        from .utils import generate_policy_receipt
-        from django.http import FileResponse
+        from .utils import policy_receipt_context
         
-        user = request.user
+        # The row, not the token claims: a policy accepted since the token
+        # was issued must show up here
+        user = User.objects.get(pk=request.user.pk)
         
         # Check if user has accepted policy
         if user.accepted_policy_version == 0:
@@ -1526,16 +1652,9 @@ class DownloadPolicyReceiptView(APIView):
                 'error': 'No policy acceptance record found.'
             }, status=status.HTTP_404_NOT_FOUND)
             
-        # Generate the PDF
-        pdf_buffer = generate_policy_receipt(user, user.accepted_policy_version)
-        
-        # Return as file download
+        # Serve the receipt (rendered on first download only)
         filename = f"policy_receipt_v{user.accepted_policy_version}_{user.id}.pdf"
-        response = FileResponse(
-            pdf_buffer,
-            as_attachment=True,
-            filename=filename,
-            content_type='application/pdf'
+        return _pdf_download(
+            request, 'policy_receipt', user.id,
+            policy_receipt_context(user, user.accepted_policy_version), filename
         )
-        
-        return response
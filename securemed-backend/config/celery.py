@@ -0,0 +1,15 @@
+"""
+Celery application for SecureMed.
+
+Celery is optional: it is only imported when installed, and every task it
+runs (see core.tasks) also has a polling management command equivalent.
+"""
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+app = Celery('securemed')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
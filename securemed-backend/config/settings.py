@@ -52,10 +52,12 @@ INSTALLED_APPS = [
     'telemedicine',
     'analytics',
     'labs',
+    'core',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.QueryShapeMiddleware',  # N+1 query warnings (QUERY_SHAPE_DETECTION)
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -135,6 +137,49 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# File storage. 'pdf_cache' holds generated PDFs (policy receipts, deletion
+# certificates), named by a hash of their content; point it at an object
+# storage backend to share the cache between hosts. It contains PII and must
+# not be publicly served.
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+    'pdf_cache': {
+        'BACKEND': 'core.storage.AtomicFileSystemStorage',
+        'OPTIONS': {
+            'location': config('PDF_CACHE_DIR', default=str(BASE_DIR / 'pdf_cache')),
+        },
+    },
+}
+
+# Caches. 'consents' holds consent decisions (consents.cache) and needs a
+# backend every worker shares, or a revocation would only invalidate the
+# worker that handled it. Point CONSENT_CACHE_URL at Redis
+# (redis://host:6379/2) to turn it on; without it decisions aren't cached
+# and every check reads the database.
+CONSENT_CACHE_URL = config('CONSENT_CACHE_URL', default='')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'consents': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': CONSENT_CACHE_URL,
+    } if CONSENT_CACHE_URL else {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    },
+}
+# Longest a decision is cached; entries never outlive the consent's expires_at
+CONSENT_CACHE_SECONDS = config('CONSENT_CACHE_SECONDS', default=60, cast=int)
+
+# How long a slot hold (appointments.holds) reserves a slot for the patient
+# to confirm the booking before anyone else can take it
+SLOT_HOLD_SECONDS = config('SLOT_HOLD_SECONDS', default=120, cast=int)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/6.0/ref/settings/#default-auto-field
 
@@ -150,7 +195,7 @@ CORS_ALLOW_CREDENTIALS = True
 # REST Framework Settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'authentication.backends.RequestJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -192,8 +237,25 @@ SIMPLE_JWT = {
     'TOKEN_TYPE_CLAIM': 'token_type',
     'TOKEN_USER_CLASS': 'rest_framework_simplejwt.models.TokenUser',
     'JTI_CLAIM': 'jti',
+    'TOKEN_REFRESH_SERIALIZER': 'authentication.tokens.PrincipalTokenRefreshSerializer',
 }
 
+# Trust the role / is_active / policy-version claims signed into access tokens
+# instead of loading the user on every request. Claims are only as fresh as the
+# token; each refresh re-reads them from the user, so role changes and
+# deactivation apply once the access token expires.
+JWT_CLAIMS_PRINCIPAL = config('JWT_CLAIMS_PRINCIPAL', default=False, cast=bool)
+
+# Refresh token blacklist checks go through a per-process Bloom filter of
+# blacklisted JTIs (authentication/blacklist.py), so only filter hits query
+# the token tables. Tokens blacklisted by another worker are picked up within
+# SYNC_SECONDS (0 = check for new rows on every refresh); the filter is rebuilt
+# in a background thread every REBUILD_SECONDS to drop expired tokens.
+JWT_BLACKLIST_FILTER = config('JWT_BLACKLIST_FILTER', default=True, cast=bool)
+JWT_BLACKLIST_FILTER_SYNC_SECONDS = config('JWT_BLACKLIST_FILTER_SYNC_SECONDS', default=2.0, cast=float)
+JWT_BLACKLIST_FILTER_REBUILD_SECONDS = config('JWT_BLACKLIST_FILTER_REBUILD_SECONDS', default=900.0, cast=float)
+JWT_BLACKLIST_FILTER_ERROR_RATE = config('JWT_BLACKLIST_FILTER_ERROR_RATE', default=0.001, cast=float)
+
 # Security & Cookies
 # Determine if we're in a secure (HTTPS) environment
 # Set DJANGO_SECURE_SSL=True in production environment variables
@@ -216,7 +278,21 @@ RECAPTCHA_SECRET_KEY = os.environ.get(
     '6LeIxAcTAAAAAGG-vFI1TnRWxMZNFuojJ4WifJWe'  # Google's test secret key
 )
 
+# Verification client (authentication.captcha): pooled keep-alive session,
+# short timeout and a circuit breaker that fails fast while Google is down.
+# RECAPTCHA_TRANSPORT='stub' answers locally, for tests and offline setups.
+RECAPTCHA_VERIFY_URL = config('RECAPTCHA_VERIFY_URL', default='https://www.google.com/recaptcha/api/siteverify')
+RECAPTCHA_TRANSPORT = config('RECAPTCHA_TRANSPORT', default='https')
+RECAPTCHA_TIMEOUT = config('RECAPTCHA_TIMEOUT', default=3.0, cast=float)
+RECAPTCHA_BREAKER_THRESHOLD = config('RECAPTCHA_BREAKER_THRESHOLD', default=5, cast=int)
+RECAPTCHA_BREAKER_RESET_SECONDS = config('RECAPTCHA_BREAKER_RESET_SECONDS', default=30.0, cast=float)
+
 # Privacy Logging Configuration
+# Access events go through authentication.audit.AsyncAuditHandler: the request
+# thread only enqueues them, a background thread writes them in batches to the
+# rotating audit file (or the access_audit_logs table with PRIVACY_AUDIT_SINK=db).
+PRIVACY_AUDIT_LOG = BASE_DIR / 'privacy_audit.log'
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -229,8 +305,14 @@ LOGGING = {
     'handlers': {
         'privacy_file': {
             'level': 'INFO',
-            'class': 'logging.FileHandler',
-            'filename': 'privacy_audit.log',
+            'class': 'authentication.audit.AsyncAuditHandler',
+            'filename': PRIVACY_AUDIT_LOG,
+            'sink': config('PRIVACY_AUDIT_SINK', default='file'),
+            'max_bytes': config('PRIVACY_AUDIT_MAX_BYTES', default=50 * 1024 * 1024, cast=int),
+            'backup_count': 30,
+            'queue_size': config('PRIVACY_AUDIT_QUEUE_SIZE', default=10000, cast=int),
+            'batch_size': 500,
+            'flush_interval': 1.0,
             'formatter': 'verbose',
         },
     },
@@ -246,6 +328,55 @@ LOGGING = {
 # Policy Versioning
 LATEST_POLICY_VERSION = 1
 
+# Password hashing executor (authentication.hashing)
+# Login, re-authentication and recovery-code hashing run on a small thread
+# pool per process. Once MAX_PENDING jobs are queued or running, further
+# requests get an immediate 503 instead of tying up every worker thread.
+PASSWORD_HASHING_WORKERS = config('PASSWORD_HASHING_WORKERS', default=2, cast=int)
+PASSWORD_HASHING_MAX_PENDING = config('PASSWORD_HASHING_MAX_PENDING', default=8, cast=int)
+PASSWORD_HASHING_TIMEOUT = config('PASSWORD_HASHING_TIMEOUT', default=10.0, cast=float)
+
+# Rate limiting (core.ratelimit). Sliding-window counters live in a backend
+# shared by every worker: Redis (redis://host:6379/1) when several hosts serve
+# the API, or a SQLite file for a single host. The load benchmarks in
+# verification_tests/ need RATELIMIT_ENABLE off.
+RATELIMIT_ENABLE = config('RATELIMIT_ENABLE', default=True, cast=bool)
+RATELIMIT_URL = config('RATELIMIT_URL', default=f"sqlite:///{BASE_DIR / 'ratelimit.sqlite3'}")
+
+# Role-based route access, enforced by RoleMiddleware and reused by the
+# authentication.permissions classes. Each area prefix applies under every
+# API mount; authentication.policy compiles the table into a prefix trie.
+ROUTE_ACCESS_POLICY = {
+    'mounts': ['/api/', '/api/v1/'],
+    'areas': {
+        'doctor': {
+            'prefix': 'doctor/',
+            'roles': ['provider'],
+            'message': 'Forbidden: Doctor Access Only',
+        },
+        'patient': {
+            'prefix': 'patient/',
+            'roles': ['patient'],
+            'message': 'Forbidden: Patient Access Only',
+        },
+        'admin': {
+            'prefix': 'admin/',
+            'roles': ['admin'],
+            'message': 'Forbidden: Admin Access Only',
+        },
+    },
+}
+
+# Fraction of allowed (DEBUG) and denied (WARNING) decisions RoleMiddleware logs
+ROUTE_POLICY_LOG_SAMPLE_RATE = config('ROUTE_POLICY_LOG_SAMPLE_RATE', default=0.01, cast=float)
+ROUTE_POLICY_DENY_LOG_SAMPLE_RATE = config('ROUTE_POLICY_DENY_LOG_SAMPLE_RATE', default=1.0, cast=float)
+
+# N+1 detection (core.middleware.QueryShapeMiddleware): warn when one request
+# runs the same query shape REPEAT_LIMIT times or more. The per-endpoint
+# query budgets are enforced by the test suite (core.testing).
+QUERY_SHAPE_DETECTION = config('QUERY_SHAPE_DETECTION', default=DEBUG, cast=bool)
+QUERY_SHAPE_REPEAT_LIMIT = config('QUERY_SHAPE_REPEAT_LIMIT', default=5, cast=int)
+
 # Email Configuration
 EMAIL_BACKEND = config('EMAIL_BACKEND', default='django.core.mail.backends.console.EmailBackend')
 EMAIL_HOST = config('EMAIL_HOST', default='smtp.gmail.com')
@@ -255,5 +386,18 @@ EMAIL_HOST_USER = config('EMAIL_HOST_USER', default='')
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
 DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='noreply@securemed.com')
 
+# Email outbox (core.outbox)
+# Emails are queued in the email_outbox table with the change that triggers
+# them and sent by `manage.py dispatch_outbox` (polls the table), or by a
+# Celery task when EMAIL_OUTBOX_USE_CELERY is on and a broker is available.
+EMAIL_OUTBOX_USE_CELERY = config('EMAIL_OUTBOX_USE_CELERY', default=False, cast=bool)
+EMAIL_OUTBOX_BATCH_SIZE = config('EMAIL_OUTBOX_BATCH_SIZE', default=100, cast=int)
+EMAIL_OUTBOX_MAX_ATTEMPTS = config('EMAIL_OUTBOX_MAX_ATTEMPTS', default=8, cast=int)
+EMAIL_OUTBOX_BACKOFF_SECONDS = 30
+EMAIL_OUTBOX_MAX_BACKOFF_SECONDS = 60 * 60
+EMAIL_OUTBOX_LEASE_SECONDS = 5 * 60
+
+CELERY_BROKER_URL = config('CELERY_BROKER_URL', default='redis://localhost:6379/0')
+
 # Frontend URL for password reset links
 FRONTEND_URL = config('FRONTEND_URL', default='http://localhost:3000')
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class ConsentsConfig(AppConfig):
     name = 'consents'
+
+    def ready(self):
+        # Connects the cache invalidation receivers
+        from . import cache  # noqa: F401
@@ -0,0 +1,143 @@
+"""
+Per-(patient, department) consent cache.
+
+Privacy decisions read a patient's consent for a department far more often
+than consents change, so the consent state (is_granted, expires_at, or
+"no consent") is kept in the 'consents' cache (settings.CACHES):
+
+- An entry lives at most CONSENT_CACHE_SECONDS and never past the consent's
+  expires_at, so expired access is not served from the cache. Callers still
+  compare expires_at with the current time on every decision.
+- Saving or deleting a Consent drops its entries (for the old and new
+  patient/department) once the transaction commits, through the model
+  signals below; this covers the consent API, the admin and scripts. Bulk
+  queryset.update() sends no signals: callers use invalidate().
+
+stats() reports this process's hits, misses and invalidations.
+"""
+import threading
+from collections import Counter
+from functools import lru_cache
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Consent
+
+# Cached for patients without a consent record (None means a cache miss)
+_MISSING = 'missing'
+
+
+def _key(patient_id, department):
+    # Departments contain spaces, which cache keys must not
+    return f"consent:{patient_id}:{quote(department, safe='')}"
+
+
+class ConsentCache:
+    def __init__(self, cache, max_seconds):
+        self.cache = cache
+        self.max_seconds = max_seconds
+        self._lock = threading.Lock()
+        self._counts = Counter()
+
+    def _count(self, **amounts):
+        with self._lock:
+            self._counts.update(amounts)
+
+    def _timeout(self, state, now):
+        if state == _MISSING or state[1] is None:
+            return self.max_seconds
+        return min(self.max_seconds, (state[1] - now).total_seconds())
+
+    def lookup(self, pairs):
+        """
+        Consent state for each (patient_id, department) pair: an
+        (is_granted, expires_at) tuple, or None when there is no consent.
+
+        Cache misses are read with one query, so pass the pairs of one
+        decision (one patient's departments, or a page of patients for one
+        department) together.
+        """
+        pairs = list(dict.fromkeys(pairs))
+        keys = {pair: _key(*pair) for pair in pairs}
+        cached = self.cache.get_many(keys.values())
+        states = {}
+        missing = []
+        for pair, key in keys.items():
+            if key in cached:
+                states[pair] = cached[key]
+            else:
+                missing.append(pair)
+        self._count(hits=len(states), misses=len(missing))
+
+        if missing:
+            found = {
+                (patient_id, department): (is_granted, expires_at)
+                for patient_id, department, is_granted, expires_at in Consent.objects.filter(
+                    patient_id__in={patient_id for patient_id, _ in missing},
+                    department__in={department for _, department in missing},
+                ).values_list('patient_id', 'department', 'is_granted', 'expires_at')
+            }
+            now = timezone.now()
+            for pair in missing:
+                state = found.get(pair, _MISSING)
+                states[pair] = state
+                timeout = self._timeout(state, now)
+                if timeout > 0:
+                    self.cache.set(keys[pair], state, timeout)
+
+        return {pair: None if state == _MISSING else tuple(state) for pair, state in states.items()}
+
+    def invalidate(self, pairs):
+        """Drop the entries for these (patient_id, department) pairs."""
+        keys = [_key(*pair) for pair in pairs]
+        self.cache.delete_many(keys)
+        self._count(invalidations=len(keys))
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._counts)
+        hits, misses = counts.get('hits', 0), counts.get('misses', 0)
+        return {
+            'backend': type(self.cache).__name__,
+            'max_seconds': self.max_seconds,
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / (hits + misses), 4) if hits + misses else None,
+            'invalidations': counts.get('invalidations', 0),
+        }
+
+
+@lru_cache(maxsize=None)
+def get_consent_cache():
+    return ConsentCache(caches['consents'], settings.CONSENT_CACHE_SECONDS)
+
+
+@receiver(setting_changed)
+def _reset_consent_cache(setting, **kwargs):
+    if setting in ('CACHES', 'CONSENT_CACHE_SECONDS'):
+        get_consent_cache.cache_clear()
+
+
+@receiver(pre_save, sender=Consent)
+def _remember_consent_key(sender, instance, **kwargs):
+    # An edit may move the consent to another patient or department
+    instance._cached_pairs = {(instance.patient_id, instance.department)}
+    if instance.pk:
+        instance._cached_pairs.update(
+            Consent.objects.filter(pk=instance.pk).values_list('patient_id', 'department')
+        )
+
+
+@receiver(post_save, sender=Consent)
+@receiver(post_delete, sender=Consent)
+def _invalidate_consent(sender, instance, **kwargs):
+    pairs = getattr(instance, '_cached_pairs', {(instance.patient_id, instance.department)})
+    # After commit, or a concurrent read could cache the old row again
+    transaction.on_commit(lambda: get_consent_cache().invalidate(pairs))
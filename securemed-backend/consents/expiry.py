@@ -0,0 +1,51 @@
+"""
+Consent expiry sweeper.
+
+Consents granted with an expires_at stay is_granted until something records
+their expiry. sweep_expired() finds granted consents whose expires_at has
+passed (through the partial consent_granted_expiry_idx index, which holds
+only granted consents with an expiry), revokes them and writes an EXPIRED
+ConsentHistory entry for each, in chunks of `batch_size`: one UPDATE and one
+multi-row INSERT per chunk, in one transaction.
+
+Access checks already treat a passed expires_at as no access; the sweep
+makes the consent state and its history say so too.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import get_consent_cache
+from .models import Consent, ConsentHistory
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def newly_expired(now=None):
+    """Granted consents whose expires_at has passed."""
+    return Consent.objects.filter(is_granted=True, expires_at__lte=now or timezone.now())
+
+
+def sweep_expired(now=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Revoke every consent that expired by `now`; returns how many."""
+    now = now or timezone.now()
+    total = 0
+    while True:
+        with transaction.atomic():
+            # Rows a user is editing right now are left for the next chunk or sweep
+            expired = list(
+                newly_expired(now)
+                .select_for_update(skip_locked=True)
+                .order_by('expires_at')
+                .values_list('pk', 'patient_id', 'department')[:batch_size]
+            )
+            if not expired:
+                return total
+            ids = [pk for pk, _, _ in expired]
+            Consent.objects.filter(pk__in=ids).update(is_granted=False, updated_at=now)
+            ConsentHistory.objects.bulk_create(
+                [ConsentHistory(consent_id=pk, action='EXPIRED', actor=None) for pk in ids]
+            )
+            # queryset.update() sends no signals, so the cache is told directly
+            pairs = [(patient_id, department) for _, patient_id, department in expired]
+            transaction.on_commit(lambda pairs=pairs: get_consent_cache().invalidate(pairs))
+        total += len(expired)
@@ -0,0 +1,57 @@
+"""
+Management command that records consent expiry.
+
+Revokes granted consents whose expires_at has passed and writes their
+EXPIRED history entries (consents.expiry). Polls by default; use --once from
+cron or another scheduler.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from consents.expiry import DEFAULT_BATCH_SIZE, newly_expired, sweep_expired
+
+
+class Command(BaseCommand):
+    help = 'Revoke expired consents and record EXPIRED history entries'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Sweep once and exit instead of polling',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=f'Consents revoked per transaction (default: {DEFAULT_BATCH_SIZE})',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=60.0,
+            help='Seconds to sleep between sweeps',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only count the expired consents',
+        )
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            self.stdout.write(
+                self.style.WARNING(f'DRY RUN: Would expire {newly_expired().count()} consent(s)')
+            )
+            return
+
+        while True:
+            close_old_connections()
+            expired = sweep_expired(batch_size=options['batch_size'])
+            if expired or options['once']:
+                self.stdout.write(f'Expired {expired} consent(s)')
+            if options['once']:
+                break
+            time.sleep(options['interval'])
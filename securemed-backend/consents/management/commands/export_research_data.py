@@ -1,79 +1,95 @@
-import csv
+import os
 from datetime import datetime
-from django.core.management.base import BaseCommand
-from authentication.models import User
-from consents.utils import PrivacyEngine
+from django.core.management.base import BaseCommand, CommandError
+from consents.research_export import DEFAULT_CHUNK_SIZE, run_export
 
 
 class Command(BaseCommand):
     """
     Django management command to export research data with privacy protection.
-    
+
     This command demonstrates the PrivacyEngine in action by exporting patient data
     with consent-based anonymization for the 'Research Sharing' department.
-    
+
+    Patients are streamed in chunks, optionally into several shard files
+    written in parallel, and every chunk is checkpointed: running the command
+    again with the same --output-dir resumes an interrupted export.
+    See consents.research_export for the output layout.
+
     Usage:
         python manage.py export_research_data
+        python manage.py export_research_data --shards 8 --workers 4 --gzip
+        python manage.py export_research_data --output-dir research_export_20240101_120000
     """
-    
+
     help = 'Export patient data for research with consent-based anonymization'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output-dir',
+            help='Directory to write to; an unfinished export there is resumed '
+                 '(default: a new research_export_<timestamp> directory)',
+        )
+        parser.add_argument(
+            '--shards',
+            type=int,
+            default=1,
+            help='Number of files, each covering a patient ID range (default: 1)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Processes writing shards in parallel (default: 1)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help=f'Patients read and checkpointed at a time (default: {DEFAULT_CHUNK_SIZE})',
+        )
+        parser.add_argument(
+            '--gzip',
+            action='store_true',
+            help='Write gzip-compressed shards',
+        )
+
     def handle(self, *args, **options):
         """Execute the export command."""
-        
-        # Generate timestamp for unique filename
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f'research_export_{timestamp}.csv'
-        
-        # Query all patients
-        patients = User.objects.filter(role='patient').order_by('id')
-        
-        if not patients.exists():
+
+        # Generate timestamp for unique directory name
+        output_dir = options['output_dir'] or f"research_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        if options['shards'] < 1 or options['workers'] < 1 or options['chunk_size'] < 1:
+            raise CommandError('--shards, --workers and --chunk-size must be positive')
+
+        self.stdout.write(f'Exporting to {output_dir} (rerun with --output-dir {output_dir} to resume)')
+        try:
+            manifest, results = run_export(
+                output_dir,
+                shards=options['shards'],
+                workers=options['workers'],
+                compress=options['gzip'],
+                chunk_size=options['chunk_size'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if not manifest['shards']:
             self.stdout.write(
                 self.style.WARNING('No patients found in the database.')
             )
             return
-        
-        # Open CSV file for writing
-        with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.writer(csvfile)
-            
-            # Write header row
-            writer.writerow(['Patient_ID', 'Display_Name', 'Consent_Status'])
-            
-            # Process each patient
-            protected_count = 0
-            open_count = 0
-            
-            for patient in patients:
-                # Use PrivacyEngine to get display name based on 'Research Sharing' consent
-                display_name = PrivacyEngine.get_patient_display_name(
-                    patient=patient,
-                    requesting_department='Research Sharing'
-                )
-                
-                # Determine consent status based on anonymization
-                # If name contains asterisks, it was anonymized (protected)
-                if '*' in display_name:
-                    consent_status = 'PROTECTED'
-                    protected_count += 1
-                else:
-                    consent_status = 'OPEN'
-                    open_count += 1
-                
-                # Write row to CSV
-                writer.writerow([
-                    patient.id,
-                    display_name,
-                    consent_status
-                ])
-        
+
+        total = sum(result['rows'] for result in results)
+        open_count = sum(result['open'] for result in results)
+        protected_count = sum(result['protected'] for result in results)
+
         # Print success message with statistics
         self.stdout.write(
             self.style.SUCCESS(f'\n✓ Research data export completed successfully!')
         )
-        self.stdout.write(f'  Filename: {filename}')
-        self.stdout.write(f'  Total patients: {patients.count()}')
+        self.stdout.write(f'  Directory: {os.path.abspath(output_dir)} ({len(results)} shard(s))')
+        self.stdout.write(f'  Total patients: {total}')
         self.stdout.write(f'  OPEN (consent granted): {open_count}')
         self.stdout.write(f'  PROTECTED (anonymized): {protected_count}')
         self.stdout.write(
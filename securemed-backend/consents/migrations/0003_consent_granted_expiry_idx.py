@@ -0,0 +1,19 @@
+# Generated by Django 6.0.2 on 2026-10-17 05:01
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consents', '0002_consent_consents_co_patient_5a8c4a_idx_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='consent',
+            index=models.Index(condition=models.Q(('expires_at__isnull', False), ('is_granted', True)), fields=['expires_at'], name='consent_granted_expiry_idx'),
+        ),
+    ]
@@ -25,6 +25,12 @@ class Consent(models.Model):
         indexes = [
             models.Index(fields=['patient', 'is_granted']),
             models.Index(fields=['department', 'is_granted']),
+            # Granted consents with an expiry, for the expiry sweeper
+            models.Index(
+                fields=['expires_at'],
+                condition=models.Q(is_granted=True, expires_at__isnull=False),
+                name='consent_granted_expiry_idx',
+            ),
         ]
 
     def __str__(self):
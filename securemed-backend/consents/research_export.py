@@ -0,0 +1,212 @@
+"""
+Research data export with consent-based anonymization.
+
+Patients are read in ID order with .iterator(), their 'Research Sharing'
+consent is resolved a chunk at a time (PrivacyEngine.resolve_display_names)
+and rows are written as they are produced, so memory use depends on the
+chunk size, not on the number of patients.
+
+run_export() writes to a directory:
+
+    manifest.json          shard ID ranges and options of the run
+    part-0000.csv[.gz]     one file per shard, each with the CSV header
+    part-0000.checkpoint   last patient ID written, row counts, file size
+
+Shards cover disjoint patient ID ranges and can be written by a process
+pool. Each chunk is appended to its shard file (as a gzip member of its own
+when compressing; concatenated members are a valid gzip file) and then
+checkpointed, so running an interrupted export again in the same directory
+cuts each unfinished shard back to its last checkpoint and carries on.
+
+stream_csv() yields the same CSV as one stream, for an HTTP response.
+"""
+import csv
+import gzip
+import io
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import django
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.db.models import Max, Min
+
+from .utils import CONSENT_GRANTED, PrivacyEngine
+
+User = get_user_model()
+
+DEPARTMENT = 'Research Sharing'
+HEADER = ['Patient_ID', 'Display_Name', 'Consent_Status']
+DEFAULT_CHUNK_SIZE = 2000
+MANIFEST = 'manifest.json'
+
+
+def _patients(id_from=None, id_to=None):
+    """Patients with id_from <= id < id_to, in ID order."""
+    patients = User.objects.filter(role='patient').order_by('id').only('id', 'username', 'first_name', 'last_name')
+    if id_from is not None:
+        patients = patients.filter(id__gte=id_from)
+    if id_to is not None:
+        patients = patients.filter(id__lt=id_to)
+    return patients
+
+
+def export_rows(id_from=None, id_to=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield lists of up to `chunk_size` (patient ID, display name, status) rows."""
+    decisions = PrivacyEngine.resolve_display_names(
+        _patients(id_from, id_to).iterator(chunk_size=chunk_size),
+        requesting_department=DEPARTMENT,
+        chunk_size=chunk_size,
+        use_cache=False,
+    )
+    while True:
+        rows = [
+            (patient.id, decision.display_name, 'OPEN' if decision.status == CONSENT_GRANTED else 'PROTECTED')
+            for patient, decision in islice(decisions, chunk_size)
+        ]
+        if not rows:
+            return
+        yield rows
+
+
+def _encode(rows, header=False):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(HEADER)
+    writer.writerows(rows)
+    return buffer.getvalue().encode('utf-8')
+
+
+def stream_csv(chunk_size=DEFAULT_CHUNK_SIZE):
+    """The whole export as CSV bytes, one chunk of patients at a time."""
+    yield _encode([], header=True)
+    for rows in export_rows(chunk_size=chunk_size):
+        yield _encode(rows)
+
+
+def plan_shards(count):
+    """Split the current patient ID range into `count` contiguous ranges."""
+    bounds = _patients().aggregate(low=Min('id'), high=Max('id'))
+    low, high = bounds['low'], bounds['high']
+    if low is None:
+        return []
+    step = math.ceil((high - low + 1) / count)
+    return [
+        {'index': i, 'id_from': start, 'id_to': min(start + step, high + 1)}
+        for i, start in enumerate(range(low, high + 1, step))
+    ]
+
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _write_json(path, data):
+    # Replace in one step so a crash never leaves a half-written checkpoint
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def shard_paths(output_dir, index, compress):
+    base = os.path.join(output_dir, f'part-{index:04d}')
+    return f"{base}.csv{'.gz' if compress else ''}", f'{base}.checkpoint'
+
+
+def write_shard(output_dir, shard, compress=False, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Write (or finish writing) one shard file. Returns its final checkpoint:
+    {'last_id', 'rows', 'open', 'protected', 'bytes', 'done'}.
+    """
+    data_path, checkpoint_path = shard_paths(output_dir, shard['index'], compress)
+    checkpoint = _read_json(checkpoint_path) or {
+        'last_id': None, 'rows': 0, 'open': 0, 'protected': 0, 'bytes': 0, 'done': False,
+    }
+    if checkpoint['done']:
+        return checkpoint
+
+    def encode(rows, header):
+        data = _encode(rows, header)
+        return gzip.compress(data, mtime=0) if compress else data
+
+    with open(data_path, 'a+b') as f:
+        # Anything after the last checkpoint is from a chunk that never finished
+        f.truncate(checkpoint['bytes'])
+        id_from = shard['id_from'] if checkpoint['last_id'] is None else checkpoint['last_id'] + 1
+        for rows in export_rows(id_from, shard['id_to'], chunk_size):
+            f.write(encode(rows, header=checkpoint['bytes'] == 0))
+            f.flush()
+            os.fsync(f.fileno())
+            opened = sum(1 for row in rows if row[2] == 'OPEN')
+            checkpoint.update(
+                last_id=rows[-1][0],
+                rows=checkpoint['rows'] + len(rows),
+                open=checkpoint['open'] + opened,
+                protected=checkpoint['protected'] + len(rows) - opened,
+                bytes=f.tell(),
+            )
+            _write_json(checkpoint_path, checkpoint)
+        if checkpoint['bytes'] == 0:
+            f.write(encode([], header=True))
+            checkpoint['bytes'] = f.tell()
+
+    checkpoint['done'] = True
+    _write_json(checkpoint_path, checkpoint)
+    return checkpoint
+
+
+def _init_worker():
+    # Spawned workers start without Django; forked ones must not share the parent's connections
+    django.setup()
+    connections.close_all()
+
+
+def _write_shard_job(args):
+    return write_shard(*args)
+
+
+def run_export(output_dir, shards=1, workers=1, compress=False, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Export into `output_dir`, resuming the run already there if any.
+
+    A new run splits the patient ID range into `shards` files; a resumed run
+    keeps the shards in its manifest, and must use the same compression.
+    Shards are written by up to `workers` processes.
+
+    Returns:
+        (manifest, list of per-shard checkpoints)
+
+    Raises:
+        ValueError: the directory holds a run with different options
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, MANIFEST)
+    manifest = _read_json(manifest_path)
+    if manifest is None:
+        manifest = {'department': DEPARTMENT, 'compress': compress, 'shards': plan_shards(shards)}
+        _write_json(manifest_path, manifest)
+    elif manifest['compress'] != compress:
+        raise ValueError(
+            f"{output_dir} holds a {'compressed' if manifest['compress'] else 'plain'} export; "
+            "resume it with the same compression or use a new directory"
+        )
+
+    jobs = [(output_dir, shard, compress, chunk_size) for shard in manifest['shards']]
+    if workers > 1 and len(jobs) > 1:
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            results = list(pool.map(_write_shard_job, jobs))
+    else:
+        results = [_write_shard_job(job) for job in jobs]
+    return manifest, results
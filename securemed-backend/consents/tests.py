@@ -1,3 +1,307 @@
-from django.test import TestCase
+import csv
+import glob
+import gzip
+import json
+import os
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from rest_framework.test import APIClient
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import expiry, research_export
+from .cache import get_consent_cache
+from .models import Consent, ConsentHistory
+from .utils import (
+    CONSENT_EXPIRED, CONSENT_GRANTED, CONSENT_MISSING, CONSENT_REVOKED, PrivacyEngine,
+)
+
+User = get_user_model()
+
+# Stands in for the Redis cache CONSENT_CACHE_URL configures; without one the
+# 'consents' cache is a DummyCache and nothing is cached
+SHARED_CONSENT_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'consents': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'consents'},
+}
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class BulkConsentResolutionTest(TestCase):
+    """resolve_display_names() matches get_patient_display_name() with one query per chunk."""
+
+    DEPARTMENT = 'Research Sharing'
+
+    def setUp(self):
+        caches['consents'].clear()
+        now = timezone.now()
+        self.patients = {}
+        cases = {
+            'granted': dict(is_granted=True),
+            'temporary': dict(is_granted=True, expires_at=now + timedelta(days=1)),
+            'revoked': dict(is_granted=False),
+            'expired': dict(is_granted=True, expires_at=now - timedelta(minutes=1)),
+            'missing': None,
+        }
+        for name, consent in cases.items():
+            patient = User.objects.create_user(
+                username=f'consent_{name}', email=f'consent_{name}@test.com', password='testpass123',
+                role='patient', first_name=name.title(), last_name='Patient',
+            )
+            if consent is not None:
+                Consent.objects.create(patient=patient, department=self.DEPARTMENT, description='', **consent)
+            # Consent for another department never counts
+            Consent.objects.create(patient=patient, department='Cardiology', description='', is_granted=True)
+            self.patients[name] = patient
+
+    def test_same_answers_as_single_lookup(self):
+        patients = list(self.patients.values())
+        resolved = list(PrivacyEngine.resolve_display_names(patients, self.DEPARTMENT))
+
+        self.assertEqual([patient for patient, _ in resolved], patients)
+        for patient, decision in resolved:
+            self.assertEqual(
+                decision.display_name,
+                PrivacyEngine.get_patient_display_name(patient, self.DEPARTMENT),
+            )
+        statuses = {patient.username: decision.status for patient, decision in resolved}
+        self.assertEqual(statuses, {
+            'consent_granted': CONSENT_GRANTED,
+            'consent_temporary': CONSENT_GRANTED,
+            'consent_revoked': CONSENT_REVOKED,
+            'consent_expired': CONSENT_EXPIRED,
+            'consent_missing': CONSENT_MISSING,
+        })
+        self.assertEqual(dict(resolved)[self.patients['revoked']].display_name, 'R****** P******')
+
+    def test_one_query_per_chunk(self):
+        patients = list(self.patients.values())
+        with CaptureQueriesContext(connection) as queries:
+            list(PrivacyEngine.resolve_display_names(patients, self.DEPARTMENT, chunk_size=2))
+        self.assertEqual(len(queries.captured_queries), 3)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ResearchExportTest(TestCase):
+    """Streaming, sharded and resumable research export."""
+
+    def setUp(self):
+        caches['consents'].clear()
+        self.patients = []
+        for i in range(7):
+            patient = User.objects.create_user(
+                username=f'research{i}', email=f'research{i}@test.com', password='testpass123',
+                role='patient', first_name=f'Name{i}', last_name='Patient',
+            )
+            Consent.objects.create(
+                patient=patient, department='Research Sharing', description='', is_granted=i % 2 == 0
+            )
+            self.patients.append(patient)
+        User.objects.create_user(username='research_doc', email='research_doc@test.com',
+                                 password='testpass123', role='provider')
+        self.output_dir = tempfile.mkdtemp()
+
+    def read_export(self, compress=False):
+        rows = []
+        for path in sorted(glob.glob(os.path.join(self.output_dir, 'part-*.csv*'))):
+            with (gzip.open(path, 'rt', newline='') if compress else open(path, newline='')) as f:
+                rows += list(csv.DictReader(f))
+        return rows
+
+    def test_shards_cover_every_patient_once(self):
+        call_command('export_research_data', output_dir=self.output_dir, shards=3, chunk_size=2,
+                     stdout=open(os.devnull, 'w'))
+
+        rows = self.read_export()
+        self.assertEqual([int(row['Patient_ID']) for row in rows], [p.id for p in self.patients])
+        self.assertEqual(len(glob.glob(os.path.join(self.output_dir, 'part-*.csv'))), 3)
+        self.assertEqual(rows[0]['Display_Name'], 'Name0 Patient')
+        self.assertEqual((rows[1]['Display_Name'], rows[1]['Consent_Status']), ('N**** P******', 'PROTECTED'))
+
+    def test_interrupted_export_resumes_from_checkpoint(self):
+        calls = []
+        original = research_export._encode
+
+        def fail_on_third_chunk(rows, header=False):
+            calls.append(rows)
+            if len(calls) == 3:
+                raise RuntimeError('killed')
+            return original(rows, header)
+
+        with mock.patch.object(research_export, '_encode', fail_on_third_chunk):
+            with self.assertRaises(RuntimeError):
+                research_export.run_export(self.output_dir, compress=True, chunk_size=2)
+        checkpoint = json.load(open(os.path.join(self.output_dir, 'part-0000.checkpoint')))
+        self.assertEqual((checkpoint['rows'], checkpoint['done']), (4, False))
+
+        with CaptureQueriesContext(connection) as queries:
+            _, results = research_export.run_export(self.output_dir, compress=True, chunk_size=2)
+        # Only the patients after the checkpoint were read again
+        self.assertIn(f'"id" >= {self.patients[4].id}', queries.captured_queries[0]['sql'])
+        self.assertEqual(results[0]['rows'], 7)
+        self.assertEqual([int(row['Patient_ID']) for row in self.read_export(compress=True)],
+                         [p.id for p in self.patients])
+
+        with self.assertRaises(ValueError):
+            research_export.run_export(self.output_dir, compress=False)
+
+    def test_http_export_streams_csv(self):
+        admin = User.objects.create_user(username='research_admin', email='research_admin@test.com',
+                                         password='testpass123', role='admin')
+        client = APIClient()
+        client.force_authenticate(admin)
+        with self.assertLogs('authentication.middleware_logging', 'INFO') as logs:
+            response = client.get('/api/v1/consents/research-export/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(f'EXPORT: User ID {admin.id} downloaded the research export', logs.output[0])
+        self.assertEqual(logs.records[0].method, 'EXPORT')
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'Patient_ID,Display_Name,Consent_Status')
+        self.assertEqual(len(lines), 8)
+
+        client.force_authenticate(self.patients[0])
+        self.assertEqual(client.get('/api/v1/consents/research-export/').status_code, 403)
+
+
+@override_settings(
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    CACHES=SHARED_CONSENT_CACHE,
+)
+class ConsentCacheTest(TestCase):
+    """Cached access checks, capped by expiry and invalidated on write."""
+
+    def setUp(self):
+        caches['consents'].clear()
+        get_consent_cache.cache_clear()
+        self.patient = User.objects.create_user(
+            username='cache_patient', email='cache_patient@test.com', password='testpass123', role='patient'
+        )
+        self.cardiology = Consent.objects.create(
+            patient=self.patient, department='Cardiology', description='', is_granted=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.patient)
+
+    def check(self, department):
+        return self.client.get(f'/api/v1/consents/check-access/{department}/')
+
+    def test_repeat_checks_are_served_from_cache(self):
+        self.assertTrue(self.check('Cardiology').data['has_access'])
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(self.check('Cardiology').data['has_access'])
+            self.assertEqual(self.check('Oncology').status_code, 404)
+            self.assertEqual(self.check('Oncology').status_code, 404)
+        # Only the first Oncology check reached the database
+        self.assertEqual(len(queries.captured_queries), 1)
+        stats = get_consent_cache().stats()
+        self.assertEqual((stats['hits'], stats['misses']), (2, 2))
+
+    def test_entry_ttl_is_capped_by_expiry(self):
+        Consent.objects.create(
+            patient=self.patient, department='Neurology', description='', is_granted=True,
+            expires_at=timezone.now() + timedelta(seconds=5),
+        )
+        consent_cache = get_consent_cache()
+        with mock.patch.object(consent_cache.cache, 'set', wraps=consent_cache.cache.set) as cache_set:
+            consent_cache.lookup([(self.patient.pk, 'Neurology'), (self.patient.pk, 'Cardiology')])
+        timeouts = {call.args[0].rsplit(':', 1)[1]: call.args[2] for call in cache_set.call_args_list}
+        self.assertLessEqual(timeouts['Neurology'], 5)
+        self.assertEqual(timeouts['Cardiology'], consent_cache.max_seconds)
+
+        # Already expired: the decision is made against the current time anyway
+        Consent.objects.filter(department='Neurology').update(expires_at=timezone.now() - timedelta(seconds=1))
+        consent_cache.invalidate([(self.patient.pk, 'Neurology')])
+        self.assertFalse(self.check('Neurology').data['has_access'])
+
+    def test_update_invalidates_entry(self):
+        self.assertTrue(self.check('Cardiology').data['has_access'])
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                f'/api/v1/consents/{self.cardiology.pk}/', {'is_granted': False}, format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(self.check('Cardiology').data['has_access'])
+
+        # Creating a consent replaces a cached "no consent" answer too
+        self.assertEqual(self.check('Oncology').status_code, 404)
+        with self.captureOnCommitCallbacks(execute=True):
+            Consent.objects.create(patient=self.patient, department='Oncology', description='')
+        self.assertTrue(self.check('Oncology').data['has_access'])
+
+    def test_batch_check_access(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/consents/check-access/?departments=Cardiology,Oncology')
+        self.assertEqual(len(queries.captured_queries), 1)
+        self.assertEqual(
+            [(r['department'], r['has_access']) for r in response.data['results']],
+            [('Cardiology', True), ('Oncology', False)],
+        )
+        self.assertIn('error', response.data['results'][1])
+        self.assertEqual(self.client.get('/api/v1/consents/check-access/').status_code, 400)
+
+
+@override_settings(
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    CACHES=SHARED_CONSENT_CACHE,
+)
+class ConsentExpiryTest(TestCase):
+    """Expiry sweeper and the single-query summary."""
+
+    def setUp(self):
+        caches['consents'].clear()
+        self.patient = User.objects.create_user(
+            username='expiry_patient', email='expiry_patient@test.com', password='testpass123', role='patient'
+        )
+        now = timezone.now()
+        past, future = now - timedelta(hours=1), now + timedelta(days=1)
+        for department, is_granted, expires_at in [
+            ('Cardiology', True, None),
+            ('Neurology', True, future),
+            ('Radiology', True, past),
+            ('Oncology', True, past),
+            ('Dermatology', False, None),
+        ]:
+            Consent.objects.create(patient=self.patient, department=department, description='',
+                                   is_granted=is_granted, expires_at=expires_at)
+        self.client = APIClient()
+        self.client.force_authenticate(self.patient)
+
+    def test_summary_is_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/consents/summary/')
+        self.assertEqual(len(queries.captured_queries), 1)
+        self.assertEqual(response.data, {'total': 5, 'granted': 4, 'revoked': 1, 'expired': 2, 'active': 2})
+
+    def test_sweeper_revokes_in_chunks_and_records_history(self):
+        self.assertTrue(self.client.get('/api/v1/consents/check-access/Radiology/').data['is_granted'])
+
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(expiry.sweep_expired(batch_size=1), 2)
+        # Per chunk: select, update, insert; then the select that finds nothing
+        statements = [q['sql'] for q in queries.captured_queries
+                      if not q['sql'].startswith(('SAVEPOINT', 'RELEASE'))]
+        self.assertEqual(len(statements), 2 * 3 + 1)
+
+        self.assertEqual(
+            set(Consent.objects.filter(is_granted=False).values_list('department', flat=True)),
+            {'Radiology', 'Oncology', 'Dermatology'},
+        )
+        self.assertEqual(
+            sorted(ConsentHistory.objects.filter(action='EXPIRED').values_list('consent__department', flat=True)),
+            ['Oncology', 'Radiology'],
+        )
+        # The cached consent was invalidated
+        self.assertFalse(self.client.get('/api/v1/consents/check-access/Radiology/').data['is_granted'])
+
+        call_command('expire_consents', once=True, stdout=open(os.devnull, 'w'))
+        self.assertEqual(ConsentHistory.objects.filter(action='EXPIRED').count(), 2)
+        self.assertEqual(self.client.get('/api/v1/consents/summary/').data['expired'], 2)
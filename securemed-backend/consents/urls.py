@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ConsentViewSet
+from .views import ConsentViewSet, research_export_view
 
 # Create a router and register our viewset
 router = DefaultRouter()
@@ -8,5 +8,7 @@ router.register(r'', ConsentViewSet, basename='consent')
 
 # The API URLs are determined automatically by the router
 urlpatterns = [
+    # Before the router, whose detail route would otherwise match it
+    path('research-export/', research_export_view, name='research_export'),
     path('', include(router.urls)),
 ]
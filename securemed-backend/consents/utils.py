@@ -1,7 +1,23 @@
+from collections import namedtuple
+from itertools import islice
 from django.utils import timezone
+from .cache import get_consent_cache
 from .models import Consent
 
 
+# display_name: full or anonymized name; status: one of the CONSENT_* values
+ConsentDecision = namedtuple('ConsentDecision', ['display_name', 'status'])
+
+CONSENT_GRANTED = 'GRANTED'
+CONSENT_REVOKED = 'REVOKED'
+CONSENT_EXPIRED = 'EXPIRED'
+CONSENT_MISSING = 'MISSING'
+# The consent lookup itself failed; treated like missing consent
+CONSENT_ERROR = 'ERROR'
+
+DEFAULT_CHUNK_SIZE = 2000
+
+
 class PrivacyEngine:
     """
     Utility class for handling data anonymization and privacy-aware data access.
@@ -80,33 +96,93 @@ class PrivacyEngine:
         if not patient:
             return "Anonymous"
         
-        # Get full name for potential anonymization
+        _, decision = next(PrivacyEngine.resolve_display_names([patient], requesting_department))
+        return decision.display_name
+    
+    @staticmethod
+    def _full_name(patient):
         full_name = f"{patient.first_name} {patient.last_name}".strip()
-        if not full_name:
-            full_name = patient.username
-        
-        try:
-            # Query for consent record
-            consent = Consent.objects.get(
-                patient=patient,
-                department=requesting_department
-            )
-            
-            # Check if consent is granted
-            if not consent.is_granted:
-                return PrivacyEngine.anonymize_name(full_name)
-            
-            # Check if consent has expired
-            if consent.expires_at and consent.expires_at <= timezone.now():
-                return PrivacyEngine.anonymize_name(full_name)
+        return full_name or patient.username
+    
+    @staticmethod
+    def _decide(full_name, consent, now):
+        """
+        Decision for one patient given their consent as an
+        (is_granted, expires_at) pair, or None if they have none.
+        """
+        if consent is None:
+            # No consent record found - anonymize by default
+            return ConsentDecision(PrivacyEngine.anonymize_name(full_name), CONSENT_MISSING)
+        
+        is_granted, expires_at = consent
+        if not is_granted:
+            return ConsentDecision(PrivacyEngine.anonymize_name(full_name), CONSENT_REVOKED)
+        if expires_at and expires_at <= now:
+            return ConsentDecision(PrivacyEngine.anonymize_name(full_name), CONSENT_EXPIRED)
+        
+        # Consent is valid - return full name
+        return ConsentDecision(full_name, CONSENT_GRANTED)
+    
+    @staticmethod
+    def resolve_display_names(patients, requesting_department, chunk_size=DEFAULT_CHUNK_SIZE, use_cache=True):
+        """
+        Resolve display names for many patients, one consent query per chunk.
+        
+        Same rules as get_patient_display_name(), which is this method for a
+        single patient. `patients` may be any iterable of User objects (e.g. a
+        queryset's .iterator()); it is consumed lazily, `chunk_size` at a time,
+        so memory stays flat however many patients there are.
+        
+        Consents come from the consent cache (consents.cache), which reads
+        a chunk's misses with one query. One-off scans of every patient pass
+        use_cache=False so they do not push hot entries out of it.
+        
+        Args:
+            patients: Iterable of User objects representing patients
+            requesting_department (str): Department requesting access
+            chunk_size (int): Patients resolved per consent query
+            use_cache (bool): Read and fill the consent cache
+        
+        Yields:
+            (patient, ConsentDecision) pairs, in input order
+        
+        Examples:
+            >>> for patient, decision in PrivacyEngine.resolve_display_names(patients, "Research Sharing"):
+            ...     print(patient.id, decision.display_name, decision.status)
+            7 Varun Raj GRANTED
+            8 J*** D** EXPIRED
+        """
+        patients = iter(patients)
+        while True:
+            chunk = list(islice(patients, chunk_size))
+            if not chunk:
+                return
             
-            # Consent is valid - return full name
-            return full_name
+            try:
+                if use_cache:
+                    states = get_consent_cache().lookup(
+                        (patient.pk, requesting_department) for patient in chunk
+                    )
+                    consents = {patient_id: state for (patient_id, _), state in states.items()}
+                else:
+                    consents = {
+                        patient_id: (is_granted, expires_at)
+                        for patient_id, is_granted, expires_at in Consent.objects.filter(
+                            patient_id__in={patient.pk for patient in chunk},
+                            department=requesting_department,
+                        ).values_list('patient_id', 'is_granted', 'expires_at')
+                    }
+            except Exception as e:
+                # Lookup failed - fail safe by anonymizing the whole chunk
+                print(f"Error checking consent: {e}")
+                for patient in chunk:
+                    yield patient, ConsentDecision(
+                        PrivacyEngine.anonymize_name(PrivacyEngine._full_name(patient)), CONSENT_ERROR
+                    )
+                continue
             
-        except Consent.DoesNotExist:
-            # No consent record found - anonymize by default
-            return PrivacyEngine.anonymize_name(full_name)
-        except Exception as e:
-            # Any other error - fail safe by anonymizing
-            print(f"Error checking consent: {e}")
-            return PrivacyEngine.anonymize_name(full_name)
+            now = timezone.now()
+            for patient in chunk:
+                yield patient, PrivacyEngine._decide(
+                    PrivacyEngine._full_name(patient), consents.get(patient.pk), now
+                )
@@ -1,11 +1,19 @@
 from rest_framework import viewsets, status
-from rest_framework.decorators import action
+from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from django.db.models import Count, Prefetch, Q
+from django.http import StreamingHttpResponse
 from django.utils import timezone
+from authentication.audit import record_export
+from authentication.permissions import IsAdminUser
+from .cache import get_consent_cache
 from .models import Consent, ConsentHistory
+from .research_export import stream_csv
 from .serializers import ConsentSerializer
 
+MAX_BATCH_DEPARTMENTS = 50
+
 
 class ConsentViewSet(viewsets.ModelViewSet):
     """
@@ -15,6 +23,10 @@ class ConsentViewSet(viewsets.ModelViewSet):
     - retrieve: Get a specific consent by ID
     - update/partial_update: Modify consent settings (auto-creates history)
     - check_department_access: Custom action to check if access is granted
+    - check_access_batch: The same check for several departments at once
+    
+    Access checks read consents through the consent cache; saving a consent
+    invalidates its entry (see consents.cache).
     """
     serializer_class = ConsentSerializer
     permission_classes = [IsAuthenticated]
@@ -23,7 +35,9 @@ class ConsentViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         """Return only the current user's consents."""
-        return Consent.objects.filter(patient=self.request.user).select_related('patient')
+        return Consent.objects.filter(patient=self.request.user).select_related('patient').prefetch_related(
+            Prefetch('history', queryset=ConsentHistory.objects.select_related('actor'))
+        )
     
     def perform_update(self, serializer):
         """
@@ -59,42 +73,101 @@ class ConsentViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        try:
-            consent = Consent.objects.get(patient=request.user, department=department)
-            has_access = consent.check_access()
-            
-            return Response({
-                'department': department,
-                'has_access': has_access,
-                'is_granted': consent.is_granted,
-                'expires_at': consent.expires_at,
-                'is_expired': consent.is_expired() if consent.expires_at else False
-            })
-        except Consent.DoesNotExist:
+        result = self._access_result(department, self._consent_states(request.user, [department])[department])
+        if 'error' in result:
+            return Response(result, status=status.HTTP_404_NOT_FOUND)
+        return Response(result)
+    
+    @action(detail=False, methods=['get'], url_path='check-access')
+    def check_access_batch(self, request):
+        """
+        Check access to several departments in one call.
+        Usage: GET /api/consents/check-access/?departments=Cardiology,Neurology
+        (or repeated ?department=Cardiology&department=Neurology)
+        
+        Returns one entry per department, in request order, shaped like the
+        single-department check; departments without a consent record have
+        has_access False and an error message.
+        """
+        departments = request.query_params.getlist('department')
+        for value in request.query_params.getlist('departments'):
+            departments += [name.strip() for name in value.split(',')]
+        departments = [name for name in dict.fromkeys(departments) if name]
+        
+        if not departments:
             return Response(
-                {
-                    'department': department,
-                    'has_access': False,
-                    'error': 'No consent record found for this department'
-                },
-                status=status.HTTP_404_NOT_FOUND
+                {'error': 'At least one department is required'},
+                status=status.HTTP_400_BAD_REQUEST
             )
+        if len(departments) > MAX_BATCH_DEPARTMENTS:
+            return Response(
+                {'error': f'At most {MAX_BATCH_DEPARTMENTS} departments per request'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        states = self._consent_states(request.user, departments)
+        return Response({
+            'results': [self._access_result(department, states[department]) for department in departments]
+        })
+    
+    @staticmethod
+    def _consent_states(user, departments):
+        """department -> (is_granted, expires_at) or None, through the consent cache."""
+        states = get_consent_cache().lookup((user.pk, department) for department in departments)
+        return {department: state for (_, department), state in states.items()}
+    
+    @staticmethod
+    def _access_result(department, state):
+        if state is None:
+            return {
+                'department': department,
+                'has_access': False,
+                'error': 'No consent record found for this department'
+            }
+        # Unsaved instance, so the model's own rules decide
+        consent = Consent(department=department, is_granted=state[0], expires_at=state[1])
+        return {
+            'department': department,
+            'has_access': consent.check_access(),
+            'is_granted': consent.is_granted,
+            'expires_at': consent.expires_at,
+            'is_expired': consent.is_expired() if consent.expires_at else False
+        }
     
     @action(detail=False, methods=['get'])
     def summary(self, request):
         """
         Get a summary of consent status.
         Usage: GET /api/consents/summary/
-        """
-        consents = self.get_queryset()
-        granted = consents.filter(is_granted=True).count()
-        revoked = consents.filter(is_granted=False).count()
-        expired = sum(1 for c in consents if c.expires_at and c.is_expired())
         
-        return Response({
-            'total': consents.count(),
-            'granted': granted,
-            'revoked': revoked,
-            'expired': expired,
-            'active': granted - expired
-        })
+        Counted in one conditional-aggregate query. `expired` counts every
+        consent past its expires_at (the sweeper also revokes them);
+        `active` counts granted consents that have not expired.
+        """
+        now = timezone.now()
+        expired = Q(expires_at__lt=now)
+        counts = Consent.objects.filter(patient=request.user).aggregate(
+            total=Count('id'),
+            granted=Count('id', filter=Q(is_granted=True)),
+            revoked=Count('id', filter=Q(is_granted=False)),
+            expired=Count('id', filter=expired),
+            active=Count('id', filter=Q(is_granted=True) & ~expired),
+        )
+        return Response(counts)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def research_export_view(request):
+    """
+    Admin-only download of the research export as CSV.
+    Usage: GET /api/consents/research-export/
+    
+    The CSV is streamed as patients are read, a chunk at a time, so it is
+    never built in memory. Same rows as `manage.py export_research_data`.
+    """
+    record_export(request, 'the research export')
+    response = StreamingHttpResponse(stream_csv(), content_type='text/csv')
+    filename = f"research_export_{timezone.now().strftime('%Y%m%d_%H%M%S')}.csv"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
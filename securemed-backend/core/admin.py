@@ -0,0 +1,35 @@
+from django.contrib import admin
+
+from .models import OutboxEmail
+
+
+@admin.register(OutboxEmail)
+class OutboxEmailAdmin(admin.ModelAdmin):
+    """
+    Delivery state of queued emails. Failed rows can be re-queued.
+    """
+
+    list_display = ('subject', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('subject', 'dedupe_key')
+    date_hierarchy = 'created_at'
+    readonly_fields = (
+        'dedupe_key', 'subject', 'body', 'from_email', 'recipients', 'attempts',
+        'claimed_until', 'last_error', 'created_at', 'sent_at',
+    )
+    actions = ['requeue']
+
+    def has_add_permission(self, request):
+        # Emails are only queued by application code
+        return False
+
+    @admin.action(description='Re-queue selected emails')
+    def requeue(self, request, queryset):
+        from django.utils import timezone
+        count = queryset.exclude(status=OutboxEmail.STATUS_SENT).update(
+            status=OutboxEmail.STATUS_PENDING,
+            attempts=0,
+            next_attempt_at=timezone.now(),
+            claimed_until=None,
+        )
+        self.message_user(request, f'{count} email(s) re-queued.')
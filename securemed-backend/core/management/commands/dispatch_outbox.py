@@ -0,0 +1,45 @@
+"""
+Management command that delivers queued outbox emails.
+
+Polls the email_outbox table, so it works without Celery or Redis. Several
+copies can run at once; each claims its own batch.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.outbox import drain
+
+
+class Command(BaseCommand):
+    help = 'Send queued outbox emails in batches, retrying failures with backoff'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Drain what is due now and exit instead of polling',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=None,
+            help='Emails sent per SMTP connection (default: EMAIL_OUTBOX_BATCH_SIZE)',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5.0,
+            help='Seconds to sleep between polls when the outbox is empty',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            sent, failed = drain(options['batch_size'])
+            if sent or failed:
+                self.stdout.write(f'Sent {sent} email(s), {failed} failed')
+            if options['once']:
+                break
+            time.sleep(options['interval'])
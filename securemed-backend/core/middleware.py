@@ -0,0 +1,87 @@
+"""
+N+1 query detection.
+
+QueryShapeRecorder counts the queries run on the default connection by
+their shape: the SQL with literals and IN lists collapsed, so the per-row
+lookups of an N+1 loop all share one shape however many rows there are.
+QueryShapeMiddleware records every request and logs a warning when any
+shape repeats QUERY_SHAPE_REPEAT_LIMIT times or more; the query-budget
+tests (core.testing) use the same recorder and fail on it instead.
+"""
+import logging
+import re
+from collections import Counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+_IN_LIST = re.compile(r'\bIN \((?:\s*%s\s*,?)+\)', re.IGNORECASE)
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+def query_shape(sql):
+    """`sql` with its literals and IN lists replaced by placeholders."""
+    sql = _LITERAL.sub('?', sql)
+    return _IN_LIST.sub('IN (...)', sql)
+
+
+class QueryShapeRecorder:
+    """
+    Context manager counting the queries run inside it, by shape.
+
+        with QueryShapeRecorder() as recorder:
+            ...
+        recorder.total, recorder.repeated(5)
+    """
+
+    def __init__(self, using=connection):
+        self.connection = using
+        self.shapes = Counter()
+
+    def __enter__(self):
+        self._wrapper = self.connection.execute_wrapper(self)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._wrapper.__exit__(*exc_info)
+
+    def __call__(self, execute, sql, params, many, context):
+        self.shapes[query_shape(sql)] += 1
+        return execute(sql, params, many, context)
+
+    @property
+    def total(self):
+        return sum(self.shapes.values())
+
+    def repeated(self, limit):
+        """{shape: count} for the shapes run `limit` times or more."""
+        return {shape: count for shape, count in self.shapes.items() if count >= limit}
+
+
+class QueryShapeMiddleware:
+    """
+    Log requests that run one query shape QUERY_SHAPE_REPEAT_LIMIT times or
+    more, the signature of a missing select_related / prefetch_related.
+    Installed only when QUERY_SHAPE_DETECTION is on (DEBUG by default).
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'QUERY_SHAPE_DETECTION', False):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.limit = settings.QUERY_SHAPE_REPEAT_LIMIT
+
+    def __call__(self, request):
+        with QueryShapeRecorder() as recorder:
+            response = self.get_response(request)
+
+        for shape, count in recorder.repeated(self.limit).items():
+            logger.warning(
+                "Possible N+1: %s %s ran one query %d times (%d queries in total): %s",
+                request.method, request.path, count, recorder.total, shape,
+            )
+        return response
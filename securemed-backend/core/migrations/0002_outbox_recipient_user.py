@@ -0,0 +1,48 @@
+# Generated by Django 6.0.2 on 2026-10-17 10:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+BATCH = 2000
+
+
+def _link(User, OutboxEmail, rows):
+    addressed = {row.pk: row.recipients[0] for row in rows if len(row.recipients) == 1}
+    users = dict(User.objects.filter(email__in=set(addressed.values())).values_list('email', 'pk'))
+    linked = []
+    for row in rows:
+        if addressed.get(row.pk) in users:
+            row.recipient_user_id = users[addressed[row.pk]]
+            linked.append(row)
+    OutboxEmail.objects.bulk_update(linked, ['recipient_user'], batch_size=500)
+
+
+def link_recipient_users(apps, schema_editor):
+    # Existing emails all have one recipient; link the ones sent to a user
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    OutboxEmail = apps.get_model('core', 'OutboxEmail')
+    rows = []
+    for row in OutboxEmail.objects.only('pk', 'recipients').iterator(chunk_size=BATCH):
+        rows.append(row)
+        if len(rows) == BATCH:
+            _link(User, OutboxEmail, rows)
+            rows = []
+    _link(User, OutboxEmail, rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboxemail',
+            name='recipient_user',
+            field=models.ForeignKey(blank=True, help_text='User the email is addressed to, if any; their emails are deleted when they are scrubbed', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(link_recipient_users, migrations.RunPython.noop),
+    ]
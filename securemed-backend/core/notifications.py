@@ -2,13 +2,20 @@
 Notification service for sending emails and SMS.
 Supports appointment reminders, lab results, and other notifications.
 """
-from django.core.mail import send_mail
-from django.conf import settings
 import logging
+from datetime import datetime, timedelta
+
+from django.utils import timezone
+
+from .outbox import enqueue_email
 
 logger = logging.getLogger(__name__)
 
 
+def _starts_at(appointment):
+    return datetime.combine(appointment.appointment_date, appointment.appointment_time)
+
+
 class NotificationService:
     """Service for sending notifications via email and SMS."""
     
@@ -21,15 +28,16 @@ class NotificationService:
             appointment: Appointment instance
         """
         try:
-            subject = f"Appointment Confirmation - {appointment.start_time.strftime('%B %d, %Y')}"
+            starts_at = _starts_at(appointment)
+            subject = f"Appointment Confirmation - {starts_at.strftime('%B %d, %Y')}"
             message = f"""
 Dear {appointment.patient.user.get_full_name()},
 
 Your appointment has been confirmed:
 
 Doctor: Dr. {appointment.doctor.user.get_full_name()}
-Date: {appointment.start_time.strftime('%B %d, %Y')}
-Time: {appointment.start_time.strftime('%I:%M %p')}
+Date: {starts_at.strftime('%B %d, %Y')}
+Time: {starts_at.strftime('%I:%M %p')}
 Status: {appointment.get_status_display()}
 
 Please arrive 15 minutes early.
@@ -38,15 +46,15 @@ Best regards,
 SecureMed Team
             """
             
-            send_mail(
+            enqueue_email(
                 subject=subject,
                 message=message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
                 recipient_list=[appointment.patient.user.email],
-                fail_silently=False,
+                recipient_user=appointment.patient.user,
+                dedupe_key=f"appointment-confirmation:{appointment.pk}",
             )
             
-            logger.info(f"Appointment confirmation sent to {appointment.patient.user.email}")
+            logger.info(f"Appointment confirmation queued for {appointment.patient.user.email}")
             return True
             
         except Exception as e:
@@ -54,39 +62,55 @@ SecureMed Team
             return False
     
     @staticmethod
-    def send_appointment_reminder(appointment):
+    def appointment_reminder_email(appointment, kind='24h', now=None):
         """
-        Send appointment reminder email (24 hours before).
-        
-        Args:
-            appointment: Appointment instance
+        The reminder email for an appointment, as enqueue_emails() message
+        fields. `kind` names the reminder ('24h', '2h'); each kind is queued
+        at most once per appointment and start time.
         """
-        try:
-            subject = f"Appointment Reminder - Tomorrow at {appointment.start_time.strftime('%I:%M %p')}"
-            message = f"""
+        starts_at = _starts_at(appointment)
+        today = timezone.localdate(now)
+        if starts_at.date() == today:
+            day = 'Today'
+        elif starts_at.date() == today + timedelta(days=1):
+            day = 'Tomorrow'
+        else:
+            day = starts_at.strftime('%B %d, %Y')
+        message = f"""
 Dear {appointment.patient.user.get_full_name()},
 
 This is a reminder of your upcoming appointment:
 
 Doctor: Dr. {appointment.doctor.user.get_full_name()}
-Date: {appointment.start_time.strftime('%B %d, %Y')}
-Time: {appointment.start_time.strftime('%I:%M %p')}
+Date: {starts_at.strftime('%B %d, %Y')}
+Time: {starts_at.strftime('%I:%M %p')}
 
 Please arrive 15 minutes early. If you need to cancel or reschedule, please contact us as soon as possible.
 
 Best regards,
 SecureMed Team
             """
+        return {
+            'subject': f"Appointment Reminder - {day} at {starts_at.strftime('%I:%M %p')}",
+            'message': message,
+            'recipient_list': [appointment.patient.user.email],
+            'recipient_user': appointment.patient.user,
+            'dedupe_key': f"appointment-reminder:{appointment.pk}:{kind}:{starts_at:%Y-%m-%dT%H:%M}",
+        }
+
+    @staticmethod
+    def send_appointment_reminder(appointment, kind='24h'):
+        """
+        Send an appointment reminder email.
+        
+        Args:
+            appointment: Appointment instance
+            kind: which reminder this is ('24h' or '2h')
+        """
+        try:
+            enqueue_email(**NotificationService.appointment_reminder_email(appointment, kind))
             
-            send_mail(
-                subject=subject,
-                message=message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[appointment.patient.user.email],
-                fail_silently=False,
-            )
-            
-            logger.info(f"Appointment reminder sent to {appointment.patient.user.email}")
+            logger.info(f"Appointment reminder queued for {appointment.patient.user.email}")
             return True
             
         except Exception as e:
@@ -119,15 +143,15 @@ Best regards,
 SecureMed Team
             """
             
-            send_mail(
+            enqueue_email(
                 subject=subject,
                 message=message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
                 recipient_list=[patient.email],
-                fail_silently=False,
+                recipient_user=patient,
+                dedupe_key=f"lab-result:{lab_result.pk}",
             )
             
-            logger.info(f"Lab result notification sent to {patient.email}")
+            logger.info(f"Lab result notification queued for {patient.email}")
             
             # If result is critical, also send an alert
             if lab_result.flag == 'Critical':
@@ -163,12 +187,12 @@ Please log in to the portal and contact your doctor's office as soon as possible
 
 SecureMed Urgent Alerts
             """
-            send_mail(
+            enqueue_email(
                 subject=subject_patient,
                 message=message_patient,
-                from_email=settings.DEFAULT_FROM_EMAIL,
                 recipient_list=[patient.email],
-                fail_silently=False,
+                recipient_user=patient,
+                dedupe_key=f"critical-lab:{lab_result.pk}:patient",
             )
 
             # 2. Alert the Doctor
@@ -184,12 +208,12 @@ Flag: CRITICAL
 
 Please review this result and contact the patient immediately.
                 """
-                send_mail(
+                enqueue_email(
                     subject=subject_doctor,
                     message=message_doctor,
-                    from_email=settings.DEFAULT_FROM_EMAIL,
                     recipient_list=[doctor.email],
-                    fail_silently=False,
+                    recipient_user=doctor,
+                    dedupe_key=f"critical-lab:{lab_result.pk}:doctor",
                 )
                 
             # 3. SMS Alert (Placeholder)
@@ -197,7 +221,7 @@ Please review this result and contact the patient immediately.
             if phone:
                 NotificationService.send_sms(phone, f"URGENT: Critical lab result for {lab_result.test.name}. Please check your portal.")
 
-            logger.info(f"Critical alerts sent for LabResult #{lab_result.id}")
+            logger.info(f"Critical alerts queued for LabResult #{lab_result.id}")
             return True
         except Exception as e:
             logger.error(f"Failed to send critical alerts: {str(e)}")
@@ -224,9 +248,9 @@ Please review this result and contact the patient immediately.
         """
         Send SMS reminder for an appointment.
         """
-        phone = getattr(appointment.patient, 'phone_number', None)
+        phone = appointment.patient.phone
         if not phone:
             return False
             
-        msg = f"Reminder: Your appointment with Dr. {appointment.doctor.user.last_name} is on {appointment.start_time.strftime('%b %d at %I:%M %p')}."
+        msg = f"Reminder: Your appointment with Dr. {appointment.doctor.user.last_name} is on {_starts_at(appointment).strftime('%b %d at %I:%M %p')}."
         return NotificationService.send_sms(phone, msg)
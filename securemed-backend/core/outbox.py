@@ -0,0 +1,195 @@
+"""
+Transactional email outbox.
+
+enqueue_email() replaces send_mail() on the request path: it stores the
+message in the email_outbox table (enqueue_emails() stores many at once),
+inside whatever transaction the caller is in, and returns immediately.
+dispatch_pending() drains the table in batches over one SMTP connection,
+retrying failures with exponential backoff.
+
+Delivery is driven either by the `dispatch_outbox` management command, which
+polls the table (no broker needed), or, with EMAIL_OUTBOX_USE_CELERY, by a
+Celery task kicked off when the enqueuing transaction commits.
+"""
+import logging
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OutboxEmail
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_email(subject, message, recipient_list, from_email=None, dedupe_key=None, recipient_user=None):
+    """
+    Queue an email for delivery once the current transaction commits.
+
+    `dedupe_key` names the business event (e.g. 'invitation:<token>'); if
+    an email with the same key was already queued, nothing new is stored.
+    `recipient_user` is the user it is addressed to, if any, so their emails
+    can be found when their account is scrubbed. Returns the OutboxEmail row.
+    """
+    fields = {
+        'subject': subject[:255],
+        'body': message,
+        'from_email': from_email or settings.DEFAULT_FROM_EMAIL,
+        'recipients': list(recipient_list),
+        'recipient_user': recipient_user,
+        'next_attempt_at': timezone.now(),
+    }
+    if dedupe_key:
+        email, created = OutboxEmail.objects.get_or_create(dedupe_key=dedupe_key, defaults=fields)
+    else:
+        email, created = OutboxEmail.objects.create(**fields), True
+
+    if created and getattr(settings, 'EMAIL_OUTBOX_USE_CELERY', False):
+        transaction.on_commit(_kick_worker)
+    return email
+
+
+def enqueue_emails(messages, from_email=None):
+    """
+    Queue many emails at once; the bulk form of enqueue_email().
+
+    `messages` are dicts with 'subject', 'message', 'recipient_list' and
+    optional 'dedupe_key' and 'recipient_user'. Rows are inserted with a few multi-row INSERTs,
+    and keys that are already queued are skipped. Returns the number of
+    messages handed to the database.
+    """
+    now = timezone.now()
+    rows = [
+        OutboxEmail(
+            subject=m['subject'][:255],
+            body=m['message'],
+            from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+            recipients=list(m['recipient_list']),
+            recipient_user=m.get('recipient_user'),
+            next_attempt_at=now,
+            dedupe_key=m.get('dedupe_key'),
+        )
+        for m in messages
+    ]
+    if not rows:
+        return 0
+    OutboxEmail.objects.bulk_create(rows, batch_size=500, ignore_conflicts=True)
+
+    if getattr(settings, 'EMAIL_OUTBOX_USE_CELERY', False):
+        transaction.on_commit(_kick_worker)
+    return len(rows)
+
+
+def _kick_worker():
+    try:
+        from .tasks import dispatch_outbox
+        dispatch_outbox.delay()
+    except Exception:
+        # The polling dispatcher (or the next kick) will pick the email up
+        logger.warning("Could not schedule the outbox dispatcher task", exc_info=True)
+
+
+def _backoff(attempts):
+    """Exponential backoff with jitter, capped at EMAIL_OUTBOX_MAX_BACKOFF_SECONDS."""
+    base = settings.EMAIL_OUTBOX_BACKOFF_SECONDS
+    delay = min(base * 2 ** (attempts - 1), settings.EMAIL_OUTBOX_MAX_BACKOFF_SECONDS)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def _claim(batch_size):
+    """
+    Lease up to `batch_size` due emails to this dispatcher.
+
+    On PostgreSQL concurrent dispatchers skip each other's locked rows; the
+    lease keeps a crashed dispatcher's batch from being sent twice before it
+    expires.
+    """
+    now = timezone.now()
+    lease = now + timedelta(seconds=settings.EMAIL_OUTBOX_LEASE_SECONDS)
+    with transaction.atomic():
+        due = (
+            OutboxEmail.objects
+            .select_for_update(skip_locked=True)
+            .filter(status=OutboxEmail.STATUS_PENDING, next_attempt_at__lte=now)
+            .exclude(claimed_until__gt=now)
+            .order_by('next_attempt_at')[:batch_size]
+        )
+        batch = list(due)
+        OutboxEmail.objects.filter(pk__in=[email.pk for email in batch]).update(claimed_until=lease)
+    return batch
+
+
+def dispatch_pending(batch_size=None, connection=None):
+    """
+    Send one batch of due emails over a single SMTP connection.
+
+    Returns (sent, failed) counts for the batch.
+    """
+    batch = _claim(batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE)
+    if not batch:
+        return 0, 0
+
+    connection = connection or get_connection()
+    sent_ids, failures = [], []
+    try:
+        connection.open()
+        for email in batch:
+            message = EmailMessage(
+                subject=email.subject,
+                body=email.body,
+                from_email=email.from_email,
+                to=email.recipients,
+                connection=connection,
+            )
+            try:
+                connection.send_messages([message])
+            except Exception as e:
+                failures.append((email, e))
+            else:
+                sent_ids.append(email.pk)
+    except Exception as e:
+        # Could not even connect: everything not yet sent is retried
+        done = set(sent_ids) | {email.pk for email, _ in failures}
+        failures += [(email, e) for email in batch if email.pk not in done]
+    finally:
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    now = timezone.now()
+    if sent_ids:
+        OutboxEmail.objects.filter(pk__in=sent_ids).update(
+            status=OutboxEmail.STATUS_SENT, sent_at=now, claimed_until=None,
+            attempts=F('attempts') + 1, last_error='',
+        )
+    max_attempts = settings.EMAIL_OUTBOX_MAX_ATTEMPTS
+    for email, error in failures:
+        attempts = email.attempts + 1
+        gave_up = attempts >= max_attempts
+        OutboxEmail.objects.filter(pk=email.pk).update(
+            attempts=attempts,
+            status=OutboxEmail.STATUS_FAILED if gave_up else OutboxEmail.STATUS_PENDING,
+            next_attempt_at=now + _backoff(attempts),
+            claimed_until=None,
+            last_error=str(error)[:2000],
+        )
+        log = logger.error if gave_up else logger.warning
+        log("Outbox email %s failed (attempt %d/%d): %s", email.pk, attempts, max_attempts, error)
+
+    return len(sent_ids), len(failures)
+
+
+def drain(batch_size=None, connection=None):
+    """Dispatch batches until nothing is due. Returns total (sent, failed)."""
+    total_sent = total_failed = 0
+    while True:
+        sent, failed = dispatch_pending(batch_size, connection)
+        total_sent += sent
+        total_failed += failed
+        if not sent and not failed:
+            return total_sent, total_failed
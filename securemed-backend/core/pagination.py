@@ -1,5 +1,15 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 class StandardResultsSetPagination(PageNumberPagination):
     page_size = 10
@@ -13,3 +23,130 @@ class StandardResultsSetPagination(PageNumberPagination):
             'previous': self.get_previous_link(),
             'results': data
         })
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor (keyset) pagination on a unique compound key, newest first.
+
+    Pages are found with a range condition on `ordering` instead of an
+    OFFSET, so page 1000 costs the same as page 1 given an index on the key.
+    Cursors are opaque and encode the key of the row at the page edge.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    cursor_query_param = 'cursor'
+    # Unique together, both descending
+    ordering = ('date_joined', 'id')
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            size = self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def _encode(self, obj, direction):
+        fields = [obj._meta.get_field(name) for name in self.ordering]
+        payload = {'d': direction, 'v': [field.value_to_string(obj) for field in fields]}
+        return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+    def _decode(self, model, raw):
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(raw.encode()))
+            values = [
+                model._meta.get_field(name).to_python(value)
+                for name, value in zip(self.ordering, payload['v'], strict=True)
+            ]
+            direction = payload['d']
+        except (ValueError, KeyError, TypeError, ValidationError):
+            raise NotFound('Invalid cursor')
+        if direction not in ('n', 'p'):
+            raise NotFound('Invalid cursor')
+        return direction, values
+
+    def _after(self, values, lookup):
+        """Rows strictly after `values` in (first, second) order using `lookup` ('lt'/'gt')."""
+        first, second = self.ordering
+        return (
+            Q(**{f'{first}__{lookup}': values[0]}) |
+            Q(**{first: values[0], f'{second}__{lookup}': values[1]})
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        size = self.get_page_size(request)
+        first, second = self.ordering
+        raw = request.query_params.get(self.cursor_query_param)
+
+        if not raw:
+            rows = list(queryset.order_by(f'-{first}', f'-{second}')[:size + 1])
+            has_next, has_previous = len(rows) > size, False
+            rows = rows[:size]
+        else:
+            direction, values = self._decode(queryset.model, raw)
+            if direction == 'n':
+                rows = list(queryset.filter(self._after(values, 'lt'))
+                            .order_by(f'-{first}', f'-{second}')[:size + 1])
+                has_next, has_previous = len(rows) > size, True
+                rows = rows[:size]
+            else:
+                rows = list(queryset.filter(self._after(values, 'gt'))
+                            .order_by(first, second)[:size + 1])
+                has_next, has_previous = True, len(rows) > size
+                rows = rows[:size][::-1]
+
+        self.next_cursor = self._encode(rows[-1], 'n') if has_next and rows else None
+        self.previous_cursor = self._encode(rows[0], 'p') if has_previous and rows else None
+        return rows
+
+    def _link(self, cursor):
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_next_link(self):
+        return self._link(self.next_cursor)
+
+    def get_previous_link(self):
+        return self._link(self.previous_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data
+        })
+
+
+def approximate_count(queryset, timeout=60):
+    """
+    Row count to show next to a keyset-paginated list without scanning the
+    table on every page load.
+
+    An unfiltered PostgreSQL table uses the planner's estimate from
+    pg_class; anything else is counted once and cached for `timeout`
+    seconds. Returns (count, is_estimate).
+    """
+    connection = connections[queryset.db]
+    if not queryset.query.where and connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        # reltuples is -1 until the table has been vacuumed or analyzed
+        if row and row[0] >= 0:
+            return row[0], True
+
+    sql, params = queryset.query.sql_with_params()
+    key = 'approximate_count:' + hashlib.md5(f'{sql}{params}'.encode()).hexdigest()
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, timeout)
+        return count, False
+    return count, True
@@ -0,0 +1,271 @@
+"""
+Sliding-window rate limiting shared by every worker process.
+
+    @rate_limit('auth.login', rate='5/m')
+    def login_view(request): ...
+
+Each (route, key) pair keeps a log of the timestamps of its allowed requests
+over the last window; a request is allowed while the log holds fewer than
+`limit` entries. The log lives in a shared backend chosen by RATELIMIT_URL:
+
+- redis://host:port/db   Redis. The check is one Lua script (one round
+                         trip, atomic) using the Redis clock, so hosts with
+                         skewed clocks agree.
+- sqlite:///path/to/file A SQLite file, for a single host or tests. The
+                         check is one IMMEDIATE transaction, so it is atomic
+                         across the processes sharing the file.
+
+Keys expire with their window, so memory does not grow with the number of
+distinct clients. Blocked requests get HTTP 429 with Retry-After. If the
+backend cannot be reached the request is let through and the error is
+logged and counted (account lockout still protects the login).
+
+Per-route allowed/blocked counters are kept in the backend too, so
+stats() reports totals across all workers.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import Counter, namedtuple
+from functools import lru_cache, wraps
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.crypto import salted_hmac
+from rest_framework.exceptions import Throttled
+
+logger = logging.getLogger(__name__)
+
+Decision = namedtuple('Decision', ['allowed', 'count', 'limit', 'retry_after'])
+
+_PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+_KEY_SALT = 'core.ratelimit.key'
+
+
+def parse_rate(rate):
+    """'5/m' -> (5, 60); '100/10s' -> (100, 10)."""
+    count, _, period = rate.partition('/')
+    multiplier = int(period[:-1]) if len(period) > 1 else 1
+    return int(count), multiplier * _PERIODS[period[-1]]
+
+
+class SQLiteBackend:
+    """Sliding-window log in a SQLite file shared by the local processes."""
+
+    SWEEP_EVERY = 1000
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = None
+        self._pid = None
+        self._calls = 0
+
+    def _connect(self):
+        # One connection per process; SQLite's file lock orders the processes
+        if self._connection is None or self._pid != os.getpid():
+            if self.path != ':memory:':
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.executescript("""
+                CREATE TABLE IF NOT EXISTS ratelimit_hits (
+                    key TEXT NOT NULL, ts REAL NOT NULL, expires_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS ratelimit_hits_key_ts ON ratelimit_hits (key, ts);
+                CREATE INDEX IF NOT EXISTS ratelimit_hits_expires ON ratelimit_hits (expires_at);
+                CREATE TABLE IF NOT EXISTS ratelimit_counters (
+                    name TEXT PRIMARY KEY, value INTEGER NOT NULL
+                );
+            """)
+            self._connection, self._pid = connection, os.getpid()
+        return self._connection
+
+    def hit(self, key, route, limit, window):
+        with self._lock:
+            connection = self._connect()
+            now = time.time()
+            self._calls += 1
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                if self._calls % self.SWEEP_EVERY == 0:
+                    # Keys of clients that went away
+                    connection.execute('DELETE FROM ratelimit_hits WHERE expires_at <= ?', (now,))
+                connection.execute('DELETE FROM ratelimit_hits WHERE key = ? AND ts <= ?', (key, now - window))
+                count, oldest = connection.execute(
+                    'SELECT COUNT(*), MIN(ts) FROM ratelimit_hits WHERE key = ?', (key,)
+                ).fetchone()
+                allowed = count < limit
+                if allowed:
+                    connection.execute(
+                        'INSERT INTO ratelimit_hits (key, ts, expires_at) VALUES (?, ?, ?)',
+                        (key, now, now + window),
+                    )
+                    count += 1
+                    oldest = oldest or now
+                connection.execute(
+                    'INSERT INTO ratelimit_counters (name, value) VALUES (?, 1) '
+                    'ON CONFLICT(name) DO UPDATE SET value = value + 1',
+                    (f"{route}:{'allowed' if allowed else 'blocked'}",),
+                )
+                connection.execute('COMMIT')
+            except BaseException:
+                connection.execute('ROLLBACK')
+                raise
+        return allowed, count, max(0.0, oldest + window - now)
+
+    def counters(self):
+        with self._lock:
+            rows = self._connect().execute('SELECT name, value FROM ratelimit_counters').fetchall()
+        return dict(rows)
+
+
+# KEYS[1] = window log (sorted set), KEYS[2] = counters hash
+# ARGV = limit, window in ms, unique member suffix, route
+_REDIS_HIT = """
+local t = redis.call('TIME')
+local now = t[1] * 1000 + math.floor(t[2] / 1000)
+local window = tonumber(ARGV[2])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - window)
+local count = redis.call('ZCARD', KEYS[1])
+local allowed = 0
+if count < tonumber(ARGV[1]) then
+    redis.call('ZADD', KEYS[1], now, now .. ':' .. ARGV[3])
+    count = count + 1
+    allowed = 1
+end
+redis.call('PEXPIRE', KEYS[1], window)
+local oldest = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')[2] or now
+redis.call('HINCRBY', KEYS[2], ARGV[4] .. (allowed == 1 and ':allowed' or ':blocked'), 1)
+return {allowed, count, oldest + window - now}
+"""
+
+
+class RedisBackend:
+    """Sliding-window log in Redis sorted sets."""
+
+    COUNTERS_KEY = 'ratelimit:counters'
+
+    def __init__(self, url):
+        import redis
+        self.client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        # Sent with EVALSHA; redis-py loads the script again if Redis lost it
+        self.script = self.client.register_script(_REDIS_HIT)
+
+    def hit(self, key, route, limit, window):
+        allowed, count, retry_ms = self.script(
+            keys=[f'ratelimit:{key}', self.COUNTERS_KEY],
+            args=[limit, int(window * 1000), uuid.uuid4().hex, route],
+        )
+        return bool(allowed), int(count), max(0.0, int(retry_ms) / 1000)
+
+    def counters(self):
+        return {
+            name.decode(): int(value)
+            for name, value in self.client.hgetall(self.COUNTERS_KEY).items()
+        }
+
+
+class RateLimiter:
+    def __init__(self, backend):
+        self.backend = backend
+        self._lock = threading.Lock()
+        self.errors = Counter()
+
+    def hit(self, route, key, limit, window):
+        """Record a request for `key` on `route`; returns a Decision."""
+        try:
+            allowed, count, retry_after = self.backend.hit(f'{route}:{key}', route, limit, window)
+        except Exception:
+            with self._lock:
+                self.errors[route] += 1
+            logger.warning("Rate limit backend unavailable; letting %s through", route, exc_info=True)
+            return Decision(True, 0, limit, 0.0)
+        return Decision(allowed, count, limit, retry_after)
+
+    def stats(self):
+        routes = {}
+        try:
+            for name, value in self.backend.counters().items():
+                route, _, outcome = name.rpartition(':')
+                routes.setdefault(route, {'allowed': 0, 'blocked': 0})[outcome] = value
+            available = True
+        except Exception:
+            available = False
+        with self._lock:
+            errors = dict(self.errors)
+        return {
+            'backend': type(self.backend).__name__,
+            'available': available,
+            'routes': routes,
+            # Per process: checks let through because the backend failed
+            'backend_errors': errors,
+        }
+
+
+def _backend_for(url):
+    parsed = urlparse(url)
+    if parsed.scheme in ('redis', 'rediss', 'unix'):
+        return RedisBackend(url)
+    if parsed.scheme == 'sqlite':
+        # sqlite:///relative/path, sqlite:////absolute/path, sqlite:///:memory:
+        return SQLiteBackend(parsed.path[1:] or ':memory:')
+    raise ValueError(f"Unsupported RATELIMIT_URL scheme: {parsed.scheme!r}")
+
+
+@lru_cache(maxsize=None)
+def get_rate_limiter():
+    return RateLimiter(_backend_for(settings.RATELIMIT_URL))
+
+
+@receiver(setting_changed)
+def _reset_rate_limiter(setting, **kwargs):
+    if setting == 'RATELIMIT_URL':
+        get_rate_limiter.cache_clear()
+
+
+def _key_value(request, key):
+    if key == 'ip':
+        return request.META.get('REMOTE_ADDR')
+    if key == 'user':
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            return f'user:{user.pk}'
+        return request.META.get('REMOTE_ADDR')
+    if key.startswith('data:'):
+        value = request.data.get(key[5:]) if hasattr(request, 'data') else None
+        return str(value).strip().lower() if value else None
+    raise ValueError(f"Unknown rate limit key: {key!r}")
+
+
+def rate_limit(route, rate, key='ip'):
+    """
+    Limit a view to `rate` requests per window for each `key` value.
+
+    `key` is 'ip', 'user' (authenticated user, else IP) or 'data:<field>'
+    (a request body field, e.g. 'data:username'). Works on function views
+    and on view methods; blocked requests raise Throttled (HTTP 429).
+    Nothing is enforced while settings.RATELIMIT_ENABLE is False.
+    """
+    limit, window = parse_rate(rate)
+
+    def decorator(view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            request = args[0] if hasattr(args[0], 'META') else args[1]
+            if settings.RATELIMIT_ENABLE:
+                value = _key_value(request, key)
+                if value is not None:
+                    # The backend never sees raw IPs or usernames
+                    hashed = salted_hmac(_KEY_SALT, value, algorithm='sha256').hexdigest()[:32]
+                    decision = get_rate_limiter().hit(route, f'{key}:{hashed}', limit, window)
+                    if not decision.allowed:
+                        raise Throttled(wait=decision.retry_after)
+            return view(*args, **kwargs)
+        return wrapped
+    return decorator
@@ -0,0 +1,40 @@
+"""
+Storage backends.
+"""
+import os
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+
+
+class AtomicFileSystemStorage(FileSystemStorage):
+    """
+    FileSystemStorage for content-addressed files.
+
+    A file is written to a temporary name and renamed into place, so a
+    concurrent reader sees either no file or the complete one, never a
+    partial write. Saving to an existing name replaces the file instead of
+    picking a new name: the same name always means the same content.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    def _save(self, name, content):
+        full_path = self.path(name)
+        directory = os.path.dirname(full_path)
+        os.makedirs(directory, exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in content.chunks():
+                    f.write(chunk)
+            if self.file_permissions_mode is not None:
+                os.chmod(tmp_path, self.file_permissions_mode)
+            os.replace(tmp_path, full_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return str(name).replace('\\', '/')
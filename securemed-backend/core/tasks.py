@@ -0,0 +1,14 @@
+"""
+Celery task for the email outbox (used when EMAIL_OUTBOX_USE_CELERY is on).
+
+Without a broker, run `python manage.py dispatch_outbox` instead; it polls
+the outbox table.
+"""
+from celery import shared_task
+
+from .outbox import drain
+
+
+@shared_task(ignore_result=True)
+def dispatch_outbox():
+    drain()
@@ -0,0 +1,241 @@
+"""
+Per-endpoint query budgets.
+
+ClinicFixture seeds a small clinic: a patient, a doctor, a specialist (with
+the 'provider' role) and an admin, and add_rows(n) gives the patient n more of everything the API lists
+(appointments, referrals, records with prescriptions, vitals, lab orders
+with results, video rooms with participants, invoices, consents).
+api_get_routes() walks config.urls for every GET endpoint under /api/v1/,
+and measure_routes() calls each one as each user, recording its queries
+with core.middleware.QueryShapeRecorder.
+
+core.tests.QueryBudgetTest measures every route twice, before and after
+add_rows(), so an endpoint whose query count grows with its result size (an
+N+1) fails, as does one that goes over its budget in QUERY_BUDGETS.
+"""
+import re
+from datetime import time, timedelta
+from decimal import Decimal
+
+from django.core.cache import caches
+from django.urls import URLResolver, get_resolver
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from appointments.models import Appointment, Referral, SlotHold
+from authentication.models import User
+from billing.models import Invoice, InvoiceItem
+from consents.models import Consent, ConsentHistory
+from departments.models import Department, Doctor, DoctorSchedule
+from labs.models import LabOrder, LabResult, LabTest
+from medical_records.models import MedicalRecord, Prescription, VitalSign
+from patients.models import Patient
+from telemedicine.models import RoomParticipant, VideoRoom
+
+from .middleware import QueryShapeRecorder
+
+API_PREFIX = 'api/v1/'
+
+# Most queries any one request may run, whatever the fixture size. Routes not
+# listed get DEFAULT_QUERY_BUDGET; the busiest list endpoints are pinned to
+# what they run today.
+DEFAULT_QUERY_BUDGET = 8
+QUERY_BUDGETS = {
+    'appointments/appointments/': 5,
+    'appointments/doctors/': 3,
+    'appointments/referrals/': 6,
+    # Builds the missing slot bitmaps on the first search
+    'appointments/slots/search/': 10,
+    'consents/': 3,
+    'labs/orders/': 7,
+    'labs/worklist/': 4,
+    'medical-records/prescriptions/': 5,
+    'telemedicine/rooms/': 4,
+}
+
+# Query strings for routes that need them to do any work, filled from
+# ClinicFixture.params
+QUERY_PARAMS = {
+    'appointments/doctors/<doctor_id>/availability/': 'date={date}',
+    'appointments/doctors/<pk>/available_slots/': 'date={date}',
+    'consents/check-access/': 'departments={department}',
+    'medical-records/records/timeline/': 'patient_id={patient_id}',
+}
+
+# GET routes with side effects the rest of the run can't survive
+SKIPPED_ROUTES = {
+    'auth/deletion-certificate/': 'marks the account for deletion and deactivates it',
+}
+
+_GROUP = re.compile(r'\(\?P<(\w+)>[^)]*\)|<(?:\w+:)?(\w+)>')
+
+
+def api_get_routes(prefix=API_PREFIX):
+    """
+    Every GET endpoint under `prefix`, as route strings like
+    'appointments/appointments/<pk>/' relative to it.
+    Format-suffix variants and SKIPPED_ROUTES are left out.
+    """
+    routes = []
+
+    def walk(patterns, path):
+        for pattern in patterns:
+            route = path + str(pattern.pattern).lstrip('^').rstrip('$')
+            if isinstance(pattern, URLResolver):
+                walk(pattern.url_patterns, route)
+            elif route.startswith(prefix) and 'format' not in pattern.pattern.regex.groupindex \
+                    and _handles_get(pattern.callback):
+                routes.append(_GROUP.sub(lambda m: f'<{m.group(1) or m.group(2)}>', route[len(prefix):]))
+
+    walk(get_resolver().url_patterns, '')
+    return sorted(set(routes) - set(SKIPPED_ROUTES))
+
+
+def _handles_get(view):
+    if getattr(view, 'actions', None) is not None:
+        return 'get' in view.actions
+    view_class = getattr(view, 'cls', None) or getattr(view, 'view_class', None)
+    return view_class is not None and hasattr(view_class, 'get')
+
+
+class ClinicFixture:
+    """Users and rows for the query-budget tests; see the module docstring."""
+
+    def __init__(self):
+        self.department = Department.objects.create(
+            name='Cardiology', code='CARD', floor=1, building='A', phone='1234567890', email='card@test.com'
+        )
+        self.doctor = self._doctor('budget_doctor', 'DOC-QB-001')
+        # The doctor/ area and IsDoctor admit the 'provider' role
+        self.specialist = self._doctor('budget_specialist', 'DOC-QB-002', role='provider')
+        self.patient_user = User.objects.create_user(
+            username='budget_patient', email='budget_patient@test.com', first_name='Jane', last_name='Smith',
+            role='patient', accepted_policy_version=1, policy_accepted_at=timezone.now(),
+        )
+        self.patient = Patient.objects.create(
+            user=self.patient_user, patient_id='P-QB-001', date_of_birth='1990-01-01', gender='F',
+            phone='+15550001111',
+        )
+        self.admin = User.objects.create_user(
+            username='budget_admin', email='budget_admin@test.com', role='admin', is_staff=True,
+            accepted_policy_version=1, policy_accepted_at=timezone.now(),
+        )
+        self.users = {
+            'patient': self.patient_user, 'doctor': self.doctor.user, 'provider': self.specialist.user,
+            'admin': self.admin,
+        }
+        self.lab_tests = [
+            LabTest.objects.create(name=f'Test {code}', code=code, category='blood', turnaround_time='24 hours')
+            for code in ('CBC', 'LIPID')
+        ]
+        self.rows = 0
+        self.objects = {}
+        self.params = {
+            'date': timezone.localdate() + timedelta(days=1), 'patient_id': self.patient.pk,
+            'department': self.department.name,
+        }
+
+    def _doctor(self, username, doctor_id, role='doctor'):
+        user = User.objects.create_user(
+            username=username, email=f'{username}@test.com', first_name='John', last_name=username.title(),
+            role=role, accepted_policy_version=1, policy_accepted_at=timezone.now(),
+        )
+        doctor = Doctor.objects.create(
+            user=user, doctor_id=doctor_id, specialization='cardiology', license_number=f'LIC-{doctor_id}',
+            qualification='MD', experience_years=10, department=self.department,
+            consultation_fee=500, phone='1234567890',
+        )
+        for weekday in range(7):
+            DoctorSchedule.objects.create(doctor=doctor, weekday=weekday, start_time='09:00', end_time='17:00')
+        return doctor
+
+    def add_rows(self, n):
+        """Give the patient `n` more of each row the API lists, and add `n` doctors."""
+        today = timezone.localdate()
+        for i in range(self.rows, self.rows + n):
+            self._doctor(f'budget_doctor{i}', f'DOC-QB-1{i:02d}')
+            appointment = Appointment.objects.create(
+                appointment_id=f'APT-QB-{i}', patient=self.patient, doctor=self.doctor,
+                appointment_date=today + timedelta(days=1 + i // 8), appointment_time=time(9 + i % 8),
+                reason='Checkup', created_by=self.patient_user,
+            )
+            referral = Referral.objects.create(
+                referral_id=f'REF-QB-{i}', patient=self.patient, referring_doctor=self.doctor,
+                specialist=self.specialist, department=self.department, reason='Second opinion',
+            )
+            record = MedicalRecord.objects.create(
+                record_id=f'MR-QB-{i}', patient=self.patient, doctor=self.doctor, appointment=appointment,
+                record_type='consultation', record_date=today - timedelta(days=i), diagnosis='Hypertension',
+            )
+            prescription = Prescription.objects.create(
+                medical_record=record, medication_name='Lisinopril', dosage='10mg', frequency='daily',
+                duration='30 days',
+            )
+            vitals = VitalSign.objects.create(
+                patient=self.patient, heart_rate=70, systolic_bp=120, diastolic_bp=80, weight=70.0,
+            )
+            order = LabOrder.objects.create(patient=self.patient_user, doctor=self.doctor.user)
+            order.items.set(self.lab_tests)
+            result = LabResult.objects.create(order=order, test=self.lab_tests[0], result_value='5.0')
+            room = VideoRoom.objects.create(doctor=self.doctor.user, patient=self.patient_user, reason='Follow-up')
+            RoomParticipant.objects.create(room=room, user=self.doctor.user, role='doctor')
+            RoomParticipant.objects.create(room=room, user=self.patient_user, role='patient')
+            invoice = Invoice.objects.create(
+                invoice_id=f'INV-QB-{i}', patient=self.patient, appointment=appointment,
+                due_date=today + timedelta(days=30), subtotal=Decimal('500'), total_amount=Decimal('500'),
+            )
+            InvoiceItem.objects.create(
+                invoice=invoice, item_type='consultation', description='Consultation',
+                unit_price=Decimal('500'), total_price=Decimal('500'),
+            )
+            consent = Consent.objects.create(
+                patient=self.patient_user, department=f'Department {i}', description='Records access',
+            )
+            ConsentHistory.objects.create(consent=consent, action='GRANTED', actor=self.patient_user)
+        self.rows += n
+
+        hold, _ = SlotHold.objects.update_or_create(
+            patient=self.patient, defaults={
+                'doctor': self.doctor, 'appointment_date': today + timedelta(days=20),
+                'appointment_time': time(9), 'expires_at': timezone.now() + timedelta(hours=1),
+            },
+        )
+        # Detail routes are called with the first row of their collection
+        self.objects.update({
+            'users': self.patient_user.pk, 'doctors': self.doctor.pk, 'appointments': appointment.pk,
+            'referrals': referral.pk, 'holds': hold.pk, 'records': record.pk, 'prescriptions': prescription.pk,
+            'vitals': vitals.pk, 'tests': self.lab_tests[0].pk, 'orders': order.pk, 'results': result.pk,
+            'rooms': room.room_id, 'check-access': consent.department, 'consents': consent.pk,
+        })
+
+    def url(self, route):
+        """The /api/v1/ URL for `route`, its parameters filled from the fixture."""
+        def fill(match):
+            collection = route[:match.start()].rstrip('/').rpartition('/')[2]
+            return str(self.objects[collection])
+
+        path = '/' + API_PREFIX + re.sub(r'<\w+>', fill, route)
+        params = QUERY_PARAMS.get(route)
+        return f'{path}?{params.format(**self.params)}' if params else path
+
+
+def measure_routes(fixture, routes):
+    """{(route, role): QueryShapeRecorder} for a GET of each route as each fixture user."""
+    measured = {}
+    for role, user in fixture.users.items():
+        client = APIClient(raise_request_exception=False)
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+        # Per-process state (the token blacklist filter) loads on the first
+        # request; keep it out of the first route's count
+        client.get('/' + API_PREFIX + 'auth/user/')
+        for route in routes:
+            for cache in ('default', 'consents'):
+                caches[cache].clear()
+            with QueryShapeRecorder() as recorder:
+                response = client.get(fixture.url(route))
+                if response.streaming:
+                    b''.join(response.streaming_content)
+            recorder.status_code = response.status_code
+            measured[route, role] = recorder
+    return measured
@@ -0,0 +1,268 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.core import mail
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+
+from .middleware import QueryShapeMiddleware, query_shape
+from .models import OutboxEmail
+from .outbox import dispatch_pending, drain, enqueue_email
+from .ratelimit import SQLiteBackend, get_rate_limiter, parse_rate
+from .testing import DEFAULT_QUERY_BUDGET, QUERY_BUDGETS, ClinicFixture, api_get_routes, measure_routes
+
+User = get_user_model()
+
+
+class FlakyBackend:
+    """Email connection whose sends fail for addresses listed in `failing`."""
+
+    failing = set()
+    opened = 0
+
+    def __init__(self, *args, **kwargs):
+        self.sent = []
+
+    def open(self):
+        FlakyBackend.opened += 1
+
+    def close(self):
+        pass
+
+    def send_messages(self, messages):
+        for message in messages:
+            if set(message.to) & self.failing:
+                raise ConnectionError('mailbox unavailable')
+            self.sent.append(message)
+        return len(messages)
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class EmailOutboxTest(TestCase):
+    """Emails are queued with the business change and sent in batches."""
+
+    def test_dedupe_key_queues_once(self):
+        enqueue_email('Hello', 'Body', ['a@test.com'], dedupe_key='event:1')
+        enqueue_email('Hello', 'Body', ['a@test.com'], dedupe_key='event:1')
+        self.assertEqual(OutboxEmail.objects.count(), 1)
+
+    def test_rolled_back_change_sends_nothing(self):
+        try:
+            with transaction.atomic():
+                enqueue_email('Hello', 'Body', ['a@test.com'])
+                raise RuntimeError('business change failed')
+        except RuntimeError:
+            pass
+        self.assertEqual(drain(), (0, 0))
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_batch_goes_over_one_connection(self):
+        for i in range(5):
+            enqueue_email(f'Hello {i}', 'Body', [f'user{i}@test.com'])
+        FlakyBackend.opened = 0
+        connection = FlakyBackend()
+        self.assertEqual(dispatch_pending(connection=connection), (5, 0))
+        self.assertEqual(FlakyBackend.opened, 1)
+        self.assertEqual(len(connection.sent), 5)
+        self.assertFalse(OutboxEmail.objects.exclude(status=OutboxEmail.STATUS_SENT).exists())
+
+    @override_settings(EMAIL_OUTBOX_MAX_ATTEMPTS=2)
+    def test_failures_back_off_then_give_up(self):
+        good = enqueue_email('Hello', 'Body', ['ok@test.com'])
+        bad = enqueue_email('Hello', 'Body', ['bounce@test.com'])
+        connection = FlakyBackend()
+        connection.failing = {'bounce@test.com'}
+
+        self.assertEqual(dispatch_pending(connection=connection), (1, 1))
+        bad.refresh_from_db()
+        self.assertEqual((bad.status, bad.attempts), (OutboxEmail.STATUS_PENDING, 1))
+        self.assertGreater(bad.next_attempt_at, timezone.now())
+        self.assertIn('mailbox unavailable', bad.last_error)
+
+        # Not due yet, so nothing is retried immediately
+        self.assertEqual(dispatch_pending(connection=connection), (0, 0))
+
+        OutboxEmail.objects.filter(pk=bad.pk).update(next_attempt_at=timezone.now())
+        self.assertEqual(dispatch_pending(connection=connection), (0, 1))
+        bad.refresh_from_db()
+        self.assertEqual(bad.status, OutboxEmail.STATUS_FAILED)
+        good.refresh_from_db()
+        self.assertEqual(good.status, OutboxEmail.STATUS_SENT)
+
+    def test_password_reset_is_queued_not_sent(self):
+        User.objects.create_user(
+            username='reset_user', email='reset_user@test.com',
+            password='testpass123', role='patient'
+        )
+        with override_settings(RATELIMIT_ENABLE=False):
+            response = APIClient().post('/api/v1/auth/password-reset/', {'email': 'reset_user@test.com'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(OutboxEmail.objects.filter(recipients=['reset_user@test.com']).count(), 1)
+
+        self.assertEqual(drain(), (1, 0))
+        self.assertEqual(mail.outbox[0].to, ['reset_user@test.com'])
+
+
+def _hammer(path, hits, results):
+    backend = SQLiteBackend(path)
+    results.put(sum(backend.hit('shared-key', 'test', 15, 60)[0] for _ in range(hits)))
+
+
+@override_settings(
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    RATELIMIT_ENABLE=True,
+    RATELIMIT_URL='sqlite:///:memory:',
+)
+class RateLimitTest(TestCase):
+    """Sliding-window limits kept in a backend shared by all workers."""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate('5/m'), (5, 60))
+        self.assertEqual(parse_rate('100/10s'), (100, 10))
+        self.assertEqual(parse_rate('3/h'), (3, 3600))
+
+    def test_window_slides(self):
+        backend = SQLiteBackend(os.path.join(self.tmp, 'rl.sqlite3'))
+        results = [backend.hit('k', 'test', 3, 0.5) for _ in range(4)]
+        self.assertEqual([allowed for allowed, _, _ in results], [True, True, True, False])
+        self.assertGreater(results[-1][2], 0)
+
+        time.sleep(0.6)
+        self.assertTrue(backend.hit('k', 'test', 3, 0.5)[0])
+        self.assertEqual(backend.counters(), {'test:allowed': 4, 'test:blocked': 1})
+
+    def test_limit_is_shared_between_processes(self):
+        path = os.path.join(self.tmp, 'rl.sqlite3')
+        SQLiteBackend(path).counters()  # create the schema up front
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        workers = [context.Process(target=_hammer, args=(path, 10, results)) for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        allowed = sum(results.get(timeout=30) for _ in workers)
+        for worker in workers:
+            worker.join()
+        self.assertEqual(allowed, 15)
+
+    def test_login_is_throttled_with_retry_after(self):
+        User.objects.create_user(
+            username='throttled', email='throttled@test.com', password='testpass123', role='patient'
+        )
+        client = APIClient(REMOTE_ADDR='10.0.0.9')
+        codes = [
+            client.post('/api/v1/auth/login/', {'username': 'throttled@test.com', 'password': 'wrong'}).status_code
+            for _ in range(6)
+        ]
+        self.assertEqual(codes[-1], 429)
+        self.assertNotIn(429, codes[:5])
+
+        stats = get_rate_limiter().stats()
+        self.assertEqual(stats['routes']['auth.login'], {'allowed': 5, 'blocked': 1})
+
+        response = client.post('/api/v1/auth/login/', {'username': 'throttled@test.com', 'password': 'wrong'})
+        self.assertIn('Retry-After', response)
+        # Another client is unaffected
+        other = APIClient(REMOTE_ADDR='10.0.0.10').post(
+            '/api/v1/auth/login/', {'username': 'throttled@test.com', 'password': 'wrong'}
+        )
+        self.assertNotEqual(other.status_code, 429)
+
+    def test_backend_outage_lets_requests_through(self):
+        limiter = get_rate_limiter()
+        with mock.patch.object(limiter.backend, 'hit', side_effect=OSError('down')):
+            response = APIClient().post('/api/v1/auth/password-reset/', {'email': 'nobody@test.com'})
+        self.assertEqual(response.status_code, 200)
+        # Both the per-IP and the per-email check failed open
+        self.assertEqual(limiter.stats()['backend_errors'], {'auth.password_reset': 2})
+
+
+@override_settings(
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    RATELIMIT_ENABLE=False,
+    # Keep the blacklist filter's periodic sync out of the counts
+    JWT_BLACKLIST_FILTER_SYNC_SECONDS=3600,
+    JWT_BLACKLIST_FILTER_REBUILD_SECONDS=3600,
+)
+class QueryBudgetTest(TestCase):
+    """Every GET endpoint runs a fixed number of queries, whatever the result size."""
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        override = override_settings(STORAGES={
+            'default': {'BACKEND': 'django.core.files.storage.InMemoryStorage'},
+            'pdf_cache': {'BACKEND': 'core.storage.AtomicFileSystemStorage', 'OPTIONS': {'location': self.cache_dir}},
+        })
+        override.enable()
+        self.addCleanup(override.disable)
+        self.addCleanup(shutil.rmtree, self.cache_dir, ignore_errors=True)
+
+    def test_routes_cover_the_api(self):
+        routes = api_get_routes()
+        for route in ('appointments/appointments/', 'labs/orders/<pk>/', 'telemedicine/rooms/<room_id>/',
+                      'appointments/doctors/<doctor_id>/availability/', 'billing/invoices/'):
+            self.assertIn(route, routes)
+        self.assertNotIn('auth/deletion-certificate/', routes)
+        self.assertFalse([route for route in routes if 'format' in route])
+
+    def test_every_get_endpoint_stays_within_budget(self):
+        fixture = ClinicFixture()
+        fixture.add_rows(2)
+        routes = api_get_routes()
+        small = measure_routes(fixture, routes)
+        fixture.add_rows(4)
+        large = measure_routes(fixture, routes)
+
+        for (route, role), recorder in large.items():
+            with self.subTest(route=route, role=role):
+                self.assertLess(recorder.status_code, 500)
+                self.assertLessEqual(recorder.total, small[route, role].total,
+                                     'the query count grows with the number of rows')
+                self.assertLessEqual(recorder.total, QUERY_BUDGETS.get(route, DEFAULT_QUERY_BUDGET))
+                self.assertEqual(recorder.repeated(settings.QUERY_SHAPE_REPEAT_LIMIT), {})
+
+
+class QueryShapeMiddlewareTest(TestCase):
+    """Repeated query shapes within one request are reported."""
+
+    def test_literals_and_in_lists_share_a_shape(self):
+        self.assertEqual(
+            query_shape("SELECT * FROM users WHERE id = 7 AND role = 'doctor' AND dept IN (%s, %s, %s)"),
+            query_shape("SELECT * FROM users WHERE id = 12 AND role = 'admin' AND dept IN (%s)"),
+        )
+
+    @override_settings(QUERY_SHAPE_DETECTION=True, QUERY_SHAPE_REPEAT_LIMIT=3)
+    def test_repeated_shape_is_logged(self):
+        def n_plus_one(request):
+            for pk in range(3):
+                User.objects.filter(pk=pk).first()
+            return HttpResponse()
+
+        def batched(request):
+            list(User.objects.filter(pk__in=range(3)))
+            return HttpResponse()
+
+        with self.assertLogs('core.middleware', 'WARNING') as logs:
+            QueryShapeMiddleware(n_plus_one)(RequestFactory().get('/api/v1/things/'))
+            QueryShapeMiddleware(batched)(RequestFactory().get('/api/v1/batched/'))
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('GET /api/v1/things/ ran one query 3 times', logs.output[0])
+
+    @override_settings(QUERY_SHAPE_DETECTION=False)
+    def test_off_unless_enabled(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            QueryShapeMiddleware(lambda request: HttpResponse())
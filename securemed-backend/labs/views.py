@@ -23,13 +23,15 @@ class LabOrderViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
+        """Optimize queryset with select_related to prevent N+1 queries"""
         user = self.request.user
+        base_queryset = LabOrder.objects.select_related('patient', 'doctor').prefetch_related('items', 'results')
         if hasattr(user, 'patient_profile'):
-            return LabOrder.objects.filter(patient=user)
+            return base_queryset.filter(patient=user)
         elif hasattr(user, 'doctor_profile') or user.role == 'doctor':
-             return LabOrder.objects.all()
+             return base_queryset.all()
         elif user.is_staff:
-            return LabOrder.objects.all()
+            return base_queryset.all()
         return LabOrder.objects.none()
 
     def perform_create(self, serializer):
@@ -86,9 +88,9 @@ class LabWorklistViewSet(viewsets.ViewSet):
             # Generate sample ID (blinded identifier)
             sample_id = f"SAMPLE-{order.id:06d}"
             
-            # Get tests that haven't been processed yet
-            completed_test_ids = order.results.values_list('test_id', flat=True)
-            pending_tests = order.items.exclude(id__in=completed_test_ids)
+            # Get tests that haven't been processed yet (from the prefetched rows)
+            completed_test_ids = {result.test_id for result in order.results.all()}
+            pending_tests = [test for test in order.items.all() if test.id not in completed_test_ids]
             
             for test in pending_tests:
                 worklist.append({
@@ -6,9 +6,10 @@ from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from django.contrib.auth import authenticate
 from django.shortcuts import get_object_or_404
 
+from authentication.hashing import verify_password
+
 from .models import Prescription
 
 
@@ -55,14 +56,8 @@ def sign_prescription(request, prescription_id):
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    # Re-authenticate user with password
-    authenticated_user = authenticate(
-        request=request,
-        email=user.email,
-        password=password
-    )
-    
-    if authenticated_user is None:
+    # Re-authenticate user with password (hashed on the bounded hashing pool)
+    if not verify_password(user, password):
         return Response(
             {'error': 'Invalid password'},
             status=status.HTTP_401_UNAUTHORIZED
@@ -64,35 +64,36 @@ class MedicalRecordViewSet(viewsets.ReadOnlyModelViewSet):
                 "id": f"rec-{r.id}",
                 "date": r.created_at.date(), # Assuming generated field
                 "type": "visit", # or logic to determine type
-                "title": r.title or "Medical Record",
+                "title": r.get_record_type_display() or "Medical Record",
                 "description": r.notes[:50] if r.notes else "",
                 "details": [r.notes] if r.notes else []
             })
             
         # 2. Lab Orders (from our new app)
         from labs.models import LabOrder
-        orders = LabOrder.objects.filter(patient_id=patient_id)
+        orders = LabOrder.objects.filter(patient_id=patient_id).prefetch_related('items')
         for o in orders:
+            tests = o.items.all()
             events.append({
                 "id": f"lab-{o.id}",
                 "date": o.created_at.date(),
                 "type": "lab",
                 "title": f"Lab Order #{o.id}",
-                "description": f"{o.items.count()} tests ordered",
-                "details": [t.name for t in o.items.all()]
+                "description": f"{len(tests)} tests ordered",
+                "details": [t.name for t in tests]
             })
 
         # 3. Appointments
         from appointments.models import Appointment
-        appts = Appointment.objects.filter(patient_id=patient_id)
+        appts = Appointment.objects.filter(patient_id=patient_id).select_related('doctor__user')
         for a in appts:
              events.append({
                 "id": f"apt-{a.id}",
-                "date": a.start_time.date(),
+                "date": a.appointment_date,
                 "type": "appointment",
                 "title": f"Appointment with Dr. {a.doctor.user.last_name if a.doctor else 'Unknown'}",
                 "description": a.status,
-                "details": [f"Time: {a.start_time.strftime('%H:%M')}"]
+                "details": [f"Time: {a.appointment_time.strftime('%H:%M')}"]
             })
             
         # Sort by date desc
@@ -193,11 +194,12 @@ class PrescriptionViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         user = self.request.user
+        queryset = self.queryset.select_related('medical_record__doctor__user')
         if hasattr(user, 'doctor_profile'):
-             return self.queryset.filter(doctor=user.doctor_profile) # This needs update since Doctor is on MedicalRecord
+             return queryset.filter(medical_record__doctor=user.doctor_profile)
         elif hasattr(user, 'patient_profile'):
-             return self.queryset.filter(medical_record__patient=user.patient_profile)
-        return self.queryset
+             return queryset.filter(medical_record__patient=user.patient_profile)
+        return queryset
 
     @action(detail=True, methods=['post'])
     def sign(self, request, pk=None):
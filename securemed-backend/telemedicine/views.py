@@ -5,6 +5,7 @@ from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from django.db.models import Prefetch
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 
@@ -34,7 +35,9 @@ class VideoRoomViewSet(viewsets.ModelViewSet):
         user = self.request.user
         return VideoRoom.objects.filter(
             models.Q(doctor=user) | models.Q(patient=user)
-        ).select_related('doctor', 'patient')
+        ).select_related('doctor', 'patient').prefetch_related(
+            Prefetch('participants', queryset=RoomParticipant.objects.select_related('user'))
+        )
     
     def perform_create(self, serializer):
         """Create room with current user as doctor."""
@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+"""
+Benchmark: query count and latency of the two availability endpoints.
+
+Creates a doctor (username 'slots_bench_doctor') with a DoctorSchedule
+block for the benchmark date, then calls
+
+    GET /api/appointments/doctors/<id>/available_slots/?date=...
+    GET /api/appointments/doctors/<id>/availability/?date=...
+
+with an empty day, a half-booked day and a fully booked day (appointments
+of mixed durations), for slot lengths of 30 and 10 minutes. The query count
+per call should be the same in every row; latency is the median over the
+given number of calls.
+
+Usage:
+    python verification_tests/benchmark_availability.py [calls]
+    python verification_tests/benchmark_availability.py --cleanup
+"""
+
+import os
+import statistics
+import sys
+import time
+from datetime import timedelta
+
+import django
+
+# Setup Django environment
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from appointments.availability import get_doctor_availability
+from appointments.models import Appointment
+from appointments.views import DoctorViewSet
+from authentication.models import User
+from departments.models import Doctor, DoctorSchedule
+from patients.models import Patient
+
+PREFIX = 'slots_bench'
+
+
+def cleanup():
+    User.objects.filter(username__startswith=PREFIX).delete()
+
+
+def setup():
+    doctor_user = User.objects.create_user(username=f'{PREFIX}_doctor', email=f'{PREFIX}_doctor@test.com',
+                                           password='BenchP@ssw0rd123', last_name='Bench', role='doctor')
+    doctor = Doctor.objects.create(
+        user=doctor_user, doctor_id='DOC-BENCH-SLOTS', specialization='cardiology',
+        license_number='LIC-BENCH-SLOTS', qualification='MD', experience_years=10,
+        consultation_fee=500, phone='1234567890',
+    )
+    patient_user = User.objects.create_user(username=f'{PREFIX}_patient', email=f'{PREFIX}_patient@test.com',
+                                            password='BenchP@ssw0rd123', role='patient')
+    patient = Patient.objects.create(user=patient_user, patient_id='P-BENCH-SLOTS',
+                                     date_of_birth='1990-01-01', gender='F')
+    return doctor, patient, patient_user
+
+
+def book_day(doctor, patient, date, fraction, slot_duration):
+    """Book `fraction` of an 08:00-18:00 day with 1-3 slot appointments."""
+    Appointment.objects.filter(doctor=doctor).delete()
+    minute, end, n, appointments = 8 * 60, 18 * 60, 0, []
+    while minute < end:
+        length = slot_duration * (1 + n % 3)
+        if (n * 0.37) % 1 < fraction:
+            appointments.append(Appointment(
+                appointment_id=f'APT-BS-{n:05d}', patient=patient, doctor=doctor, appointment_date=date,
+                appointment_time=f'{minute // 60:02d}:{minute % 60:02d}', duration=length, reason='Bench',
+            ))
+        minute += length
+        n += 1
+    Appointment.objects.bulk_create(appointments)
+    return len(appointments)
+
+
+def measure(view, path, kwargs, user, calls):
+    factory = APIRequestFactory()
+    latencies, query_counts = [], set()
+    for _ in range(calls):
+        request = factory.get(path)
+        force_authenticate(request, user=user)
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = view(request, **kwargs)
+            latencies.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200, response.data
+        query_counts.add(len(queries.captured_queries))
+    return statistics.median(latencies), sorted(query_counts)
+
+
+def main():
+    if '--cleanup' in sys.argv:
+        cleanup()
+        print("Removed benchmark rows")
+        return
+
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    cleanup()
+    doctor, patient, user = setup()
+    date = timezone.now().date() + timedelta(days=7)
+    slots_view = DoctorViewSet.as_view({'get': 'available_slots'})
+
+    print("=" * 78)
+    print(f"Availability endpoints, {calls} calls each ({connection.vendor})")
+    print("=" * 78)
+    print(f"{'slot':>5} {'booked':>7}  {'available_slots':>26}  {'availability':>26}")
+    for slot_duration in (30, 10):
+        DoctorSchedule.objects.filter(doctor=doctor).delete()
+        DoctorSchedule.objects.create(doctor=doctor, weekday=date.weekday(), start_time='08:00',
+                                      end_time='18:00', slot_duration=slot_duration)
+        for fraction in (0.0, 0.5, 1.0):
+            booked = book_day(doctor, patient, date, fraction, slot_duration)
+            results = [
+                measure(slots_view, f'/api/appointments/doctors/{doctor.pk}/available_slots/?date={date}',
+                        {'pk': doctor.pk}, user, calls),
+                measure(get_doctor_availability, f'/api/appointments/doctors/{doctor.pk}/availability/?date={date}',
+                        {'doctor_id': doctor.pk}, user, calls),
+            ]
+            print(f"{slot_duration:>4}m {booked:>7}  " + "  ".join(
+                f"{median:7.2f} ms  queries={'/'.join(map(str, counts)):>4}" for median, counts in results
+            ))
+
+    cleanup()
+
+
+if __name__ == '__main__':
+    main()
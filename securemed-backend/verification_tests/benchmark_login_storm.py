@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+"""
+Benchmark: latency of an unrelated endpoint during a login storm.
+
+Runs a probe loop against the health endpoint while a number of threads
+hammer /api/v1/auth/login/ with valid credentials, and reports the probe's
+p50/p99 latency and how many logins were served or rejected (503) by the
+password hashing pool. Compare a run against the old sync-worker setup with
+one against gthread workers plus the hashing executor.
+
+Start the server with rate limiting off, e.g.
+    RATELIMIT_ENABLE=False gunicorn --workers 3 --worker-class gthread \\
+        --threads 4 config.wsgi:application
+
+Usage:
+    python verification_tests/benchmark_login_storm.py [storm_threads] [seconds]
+"""
+
+import os
+import statistics
+import sys
+import threading
+import time
+from collections import Counter
+
+import django
+import requests
+
+# Setup Django environment
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+
+from django.contrib.auth import get_user_model
+
+User = get_user_model()
+
+BASE_URL = os.environ.get('BENCHMARK_BASE_URL', 'http://127.0.0.1:8000/api/v1')
+EMAIL = 'login_storm@test.com'
+PASSWORD = 'StormP@ssw0rd123'
+
+
+def create_storm_user():
+    User.objects.filter(email=EMAIL).delete()
+    User.objects.create_user(
+        username='login_storm', email=EMAIL, password=PASSWORD, role='patient'
+    )
+
+
+def storm(stop, outcomes):
+    session = requests.Session()
+    while not stop.is_set():
+        response = session.post(f'{BASE_URL}/auth/login/', json={
+            'username': EMAIL, 'password': PASSWORD,
+        })
+        outcomes[response.status_code] += 1
+
+
+def probe(stop, latencies):
+    session = requests.Session()
+    while not stop.is_set():
+        start = time.perf_counter()
+        session.get(f'{BASE_URL}/admin/health/')
+        latencies.append((time.perf_counter() - start) * 1000)
+        time.sleep(0.05)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def measure(storm_threads, seconds):
+    stop = threading.Event()
+    outcomes = Counter()
+    latencies = []
+    threads = [threading.Thread(target=probe, args=(stop, latencies))]
+    threads += [threading.Thread(target=storm, args=(stop, outcomes)) for _ in range(storm_threads)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return latencies, outcomes
+
+
+def main():
+    storm_threads = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 15
+    create_storm_user()
+
+    print("=" * 70)
+    print(f"Health endpoint latency, {storm_threads} login threads for {seconds:.0f}s")
+    print("=" * 70)
+
+    for label, threads in (('idle', 0), ('login storm', storm_threads)):
+        latencies, outcomes = measure(threads, seconds)
+        print(f"{label:12} probes={len(latencies):5} "
+              f"p50={statistics.median(latencies):8.1f} ms  p99={percentile(latencies, 99):8.1f} ms")
+        if outcomes:
+            print(f"{'':12} login responses: {dict(sorted(outcomes.items()))}")
+
+
+if __name__ == '__main__':
+    main()
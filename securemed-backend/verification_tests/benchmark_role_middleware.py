@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+"""
+Microbenchmark for RoleMiddleware overhead per request.
+
+Measures the time the middleware adds on top of a no-op view for
+anonymous, allowed and denied requests. No database access is needed:
+requests carry an unsaved User so only the policy lookup is timed.
+
+Usage:
+    python verification_tests/benchmark_role_middleware.py [iterations]
+"""
+
+import logging
+import os
+import sys
+import time
+import django
+
+# Setup Django environment
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from authentication.middleware import RoleMiddleware
+from authentication.models import User
+
+
+def noop_view(request):
+    return HttpResponse()
+
+
+def build_request(factory, path, user):
+    request = factory.get(path)
+    request.user = user
+    return request
+
+
+def time_per_request(handler, request, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        handler(request)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    factory = RequestFactory()
+    # Keep decision logging in the measurement but discard the output
+    policy_logger = logging.getLogger('authentication.policy')
+    policy_logger.addHandler(logging.NullHandler())
+    policy_logger.propagate = False
+    middleware = RoleMiddleware(noop_view)
+
+    patient = User(id=1, email='bench@test.com', role='patient')
+    scenarios = [
+        ('anonymous, no token', '/api/v1/appointments/', AnonymousUser()),
+        ('patient, unrestricted path', '/api/v1/appointments/appointments/', patient),
+        ('patient, patient area', '/api/v1/patient/fhir-export/', patient),
+        ('patient, admin area (denied)', '/api/v1/admin/dashboard/stats/', patient),
+    ]
+
+    print("=" * 70)
+    print(f"RoleMiddleware overhead ({iterations} iterations per scenario)")
+    print("=" * 70)
+
+    for label, path, user in scenarios:
+        request = build_request(factory, path, user)
+        baseline = time_per_request(noop_view, request, iterations)
+        with_middleware = time_per_request(middleware, request, iterations)
+        print(f"{label:32} {with_middleware - baseline:8.2f} µs/request")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+"""
+Benchmark: first-available slot search across many doctors and days.
+
+Creates N doctors (usernames 'slot_search_bench_*', default 500) with
+weekday schedules and a random ~60% of their slots booked for the next
+14 days, builds their slot bitmaps, then times
+
+    GET /api/appointments/slots/search/?specialty=...&days=14&period=morning&limit=10
+
+and reports the median latency, the queries per search and whether any of
+them read the appointments table (none should).
+
+Usage:
+    python verification_tests/benchmark_slot_search.py [doctors] [searches]
+    python verification_tests/benchmark_slot_search.py --cleanup
+"""
+
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import timedelta
+
+import django
+
+# Setup Django environment
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+
+from django.db import connection, reset_queries
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from appointments.availability import search_available_slots
+from appointments.bitmaps import build
+from appointments.models import Appointment
+from authentication.models import User
+from departments.models import Doctor, DoctorSchedule
+from patients.models import Patient
+
+PREFIX = 'slot_search_bench'
+DAYS = 14
+SPECIALTIES = ['cardiology', 'neurology']
+
+
+def cleanup():
+    User.objects.filter(username__startswith=PREFIX).delete()
+
+
+def seed(count):
+    users = User.objects.bulk_create([
+        User(username=f'{PREFIX}_{i}', email=f'{PREFIX}_{i}@test.com', last_name=f'Bench{i}', role='doctor')
+        for i in range(count)
+    ])
+    doctors = Doctor.objects.bulk_create([
+        Doctor(user=user, doctor_id=f'DOC-SSB-{i:05d}', specialization=SPECIALTIES[i % len(SPECIALTIES)],
+               license_number=f'LIC-SSB-{i:05d}', qualification='MD', experience_years=5,
+               consultation_fee=300, phone='1234567890')
+        for i, user in enumerate(users)
+    ])
+    DoctorSchedule.objects.bulk_create([
+        DoctorSchedule(doctor=doctor, weekday=weekday, start_time=start, end_time=end, slot_duration=duration)
+        for doctor in doctors
+        for weekday in range(5)
+        for start, end, duration in (('08:00', '12:00', 20), ('13:00', '17:00', 30))
+    ])
+
+    patient_user = User.objects.create_user(username=f'{PREFIX}_patient', email=f'{PREFIX}_patient@test.com',
+                                            password='BenchP@ssw0rd123', role='patient')
+    patient = Patient.objects.create(user=patient_user, patient_id='P-SSB-00001',
+                                     date_of_birth='1990-01-01', gender='F')
+
+    rng = random.Random(7)
+    today = timezone.localdate()
+    appointments = []
+    for doctor in doctors:
+        for offset in range(DAYS):
+            date = today + timedelta(days=offset)
+            for minute in list(range(8 * 60, 12 * 60, 20)) + list(range(13 * 60, 17 * 60, 30)):
+                if rng.random() < 0.6:
+                    appointments.append(Appointment(
+                        appointment_id=f'APT-SSB-{len(appointments):07d}', patient=patient, doctor=doctor,
+                        appointment_date=date, appointment_time=f'{minute // 60:02d}:{minute % 60:02d}',
+                        reason='Bench',
+                    ))
+    Appointment.objects.bulk_create(appointments, batch_size=2000)
+    return doctors, patient_user, len(appointments)
+
+
+def main():
+    if '--cleanup' in sys.argv:
+        cleanup()
+        print("Removed benchmark rows")
+        return
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    searches = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    cleanup()
+
+    start = time.perf_counter()
+    doctors, user, booked = seed(count)
+    print(f"Seeded {count} doctors, {booked} appointments in {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    doctor_ids = [doctor.id for doctor in doctors]
+    for i in range(0, len(doctor_ids), 100):
+        build(doctor_ids[i:i + 100], timezone.localdate(), DAYS)
+    print(f"Built {count * DAYS} bitmaps in {time.perf_counter() - start:.2f}s")
+
+    factory = APIRequestFactory()
+    print("=" * 78)
+    for label, query in [
+        ('all doctors, any time', ''),
+        ('cardiology, mornings', 'specialty=cardiology&period=morning'),
+        ('neurology, after 16:00', 'specialty=neurology&after=16:00'),
+        ('all doctors, limit 50', 'limit=50'),
+    ]:
+        latencies, query_counts, touched = [], set(), False
+        for _ in range(searches):
+            request = factory.get(f'/api/appointments/slots/search/?days={DAYS}&{query}')
+            force_authenticate(request, user=user)
+            reset_queries()
+            with CaptureQueriesContext(connection) as queries:
+                t0 = time.perf_counter()
+                response = search_available_slots(request)
+                latencies.append((time.perf_counter() - t0) * 1000)
+            assert response.status_code == 200, response.data
+            query_counts.add(len(queries.captured_queries))
+            touched |= any('"appointments"' in q['sql'] for q in queries.captured_queries)
+        print(f"{label:<26} {statistics.median(latencies):7.2f} ms  "
+              f"queries={'/'.join(map(str, sorted(query_counts)))}  "
+              f"appointments table read: {'YES' if touched else 'no'}")
+    print("=" * 78)
+
+    cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+"""
+Benchmark: refresh latency against large simplejwt token tables.
+
+Seeds the outstanding/blacklisted token tables with synthetic rows (JTIs
+prefixed 'bench-'), then, with the Bloom filter off and on, times the
+blacklist check on its own and TokenRefreshView's serializer as a whole
+(check, blacklist the old token, store the rotated one; the two writes
+dominate once the check is out of the way). Also reports how long the
+filter takes to build and how large it is, how many rows each sync reads,
+and how long prune_jwt_tokens takes to clear the backlog.
+
+Seeded rows mimic an unpruned table: most tokens long expired, the rest
+issued over the last day, half of which have been rotated (blacklisted).
+On PostgreSQL rows are generated server side with generate_series; 50M rows
+take a while and a few GB of disk.
+
+Usage:
+    python verification_tests/benchmark_token_refresh.py [rows] [refreshes]
+    python verification_tests/benchmark_token_refresh.py --cleanup
+"""
+
+import os
+import statistics
+import sys
+import time
+from datetime import timedelta
+
+import django
+
+# Setup Django environment
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from authentication.blacklist import get_blacklist_filter
+from authentication.tokens import PrincipalRefreshToken, PrincipalTokenRefreshSerializer
+
+User = get_user_model()
+
+EMAIL = 'token_bench@test.com'
+LIVE_FRACTION = 0.02
+BATCH = 50_000
+
+
+def seed(rows):
+    outstanding = OutstandingToken._meta.db_table
+    blacklisted = BlacklistedToken._meta.db_table
+    now = timezone.now()
+    live = int(rows * LIVE_FRACTION)
+
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                INSERT INTO {outstanding} (jti, token, created_at, expires_at)
+                SELECT 'bench-' || i, '', %s - make_interval(secs => i),
+                       CASE WHEN i <= %s THEN %s ELSE %s END
+                FROM generate_series(1, %s) AS i
+            """, [now, live, now + timedelta(hours=12), now - timedelta(days=1), rows])
+            cursor.execute(f"""
+                INSERT INTO {blacklisted} (token_id, blacklisted_at)
+                SELECT id, %s FROM {outstanding}
+                WHERE jti LIKE 'bench-%%' AND substr(jti, 7)::bigint %% 2 = 0
+            """, [now])
+            cursor.execute(f'ANALYZE {outstanding}')
+            cursor.execute(f'ANALYZE {blacklisted}')
+        return
+
+    for start in range(0, rows, BATCH):
+        tokens = OutstandingToken.objects.bulk_create([
+            OutstandingToken(
+                jti=f'bench-{i}', token='', created_at=now,
+                expires_at=now + timedelta(hours=12) if i < live else now - timedelta(days=1),
+            )
+            for i in range(start, min(start + BATCH, rows))
+        ])
+        if tokens[0].pk is None:
+            tokens = OutstandingToken.objects.filter(jti__in=[t.jti for t in tokens])
+        BlacklistedToken.objects.bulk_create(
+            [BlacklistedToken(token=t) for t in tokens if int(t.jti[6:]) % 2 == 0]
+        )
+
+
+def cleanup():
+    OutstandingToken.objects.filter(jti__startswith='bench-').delete()
+    User.objects.filter(email=EMAIL).delete()
+
+
+def time_checks(user, count):
+    latencies = []
+    tokens = [PrincipalRefreshToken.for_user(user) for _ in range(count)]
+    for token in tokens:
+        start = time.perf_counter()
+        token.check_blacklist()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def time_refreshes(user, count):
+    latencies = []
+    token = PrincipalRefreshToken.for_user(user)
+    for _ in range(count):
+        serializer = PrincipalTokenRefreshSerializer(data={'refresh': str(token)})
+        start = time.perf_counter()
+        serializer.is_valid(raise_exception=True)
+        latencies.append((time.perf_counter() - start) * 1000)
+        token = serializer.validated_data['refresh']
+    return latencies
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def report(label, latencies):
+    print(f"{label:24} p50={statistics.median(latencies):7.2f} ms  "
+          f"p99={percentile(latencies, 99):7.2f} ms")
+
+
+def main():
+    if '--cleanup' in sys.argv:
+        cleanup()
+        print("Removed benchmark rows")
+        return
+
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    refreshes = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+
+    cleanup()
+    user = User.objects.create_user(username='token_bench', email=EMAIL, password='BenchP@ssw0rd123')
+
+    print("=" * 70)
+    print(f"Refresh latency with {rows:,} token rows ({connection.vendor})")
+    print("=" * 70)
+
+    start = time.perf_counter()
+    seed(rows)
+    print(f"{'seeding':24} {time.perf_counter() - start:7.1f} s")
+
+    with override_settings(JWT_BLACKLIST_FILTER=False):
+        report('check, database', time_checks(user, refreshes))
+        report('refresh, database', time_refreshes(user, refreshes))
+
+    with override_settings(JWT_BLACKLIST_FILTER=True):
+        blacklist_filter = get_blacklist_filter()
+        start = time.perf_counter()
+        blacklist_filter.rebuild()
+        stats = blacklist_filter.stats()
+        print(f"{'filter build':24} {time.perf_counter() - start:7.1f} s  "
+              f"{stats['entries']:,} JTIs in {stats['size_bytes'] / 2**20:.1f} MiB")
+        report('check, bloom filter', time_checks(user, refreshes))
+        report('refresh, bloom filter', time_refreshes(user, refreshes))
+        stats = blacklist_filter.stats()
+        print(f"{'':24} {stats['db_checks']} of {stats['checks']} checks reached the database")
+
+    # Every refresh syncs first: the worst case for the sync's reads
+    with override_settings(JWT_BLACKLIST_FILTER=True, JWT_BLACKLIST_FILTER_SYNC_SECONDS=0):
+        blacklist_filter = get_blacklist_filter()
+        blacklist_filter.rebuild()
+        # The first sync after a build reads its last SYNC_OVERLAP of rows
+        blacklist_filter.sync()
+        syncs, rows_synced = blacklist_filter.syncs, blacklist_filter.rows_synced
+        report('refresh, sync each time', time_refreshes(user, refreshes))
+        syncs, rows_synced = blacklist_filter.syncs - syncs, blacklist_filter.rows_synced - rows_synced
+        print(f"{'':24} {rows_synced / syncs:.2f} rows read per sync over {syncs} syncs")
+
+    start = time.perf_counter()
+    call_command('prune_jwt_tokens')
+    print(f"{'prune_jwt_tokens':24} {time.perf_counter() - start:7.1f} s")
+
+    cleanup()
+
+
+if __name__ == '__main__':
+    main()
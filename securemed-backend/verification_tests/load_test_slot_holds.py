@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+"""
+Load test: a burst of patients booking one doctor's freshly opened slots.
+
+Creates a doctor (username 'hold_load_doctor') with a small schedule on the
+target date and N patients (default 500), then releases all of them at once
+against the running server, twice:
+
+    direct  POST /appointments/appointments/ for a slot, next slot on 4xx
+    holds   POST /appointments/holds/ for a slot, next slot on 409, then
+            POST /appointments/holds/{id}/confirm/
+
+Each patient tries the slots in its own random order until it gets one or
+all are gone. For each mode it reports wall time, requests per second, the
+responses by status code, the 5xx count, and whether any slot ended up
+double booked (there should be none, and no 5xx).
+
+Start the server with rate limiting off against PostgreSQL, e.g.
+    RATELIMIT_ENABLE=False gunicorn --workers 4 --worker-class gthread \\
+        --threads 8 config.wsgi:application
+
+Usage:
+    python verification_tests/load_test_slot_holds.py [bookers] [slots]
+    python verification_tests/load_test_slot_holds.py --cleanup
+"""
+
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+
+import django
+import requests
+
+# Setup Django environment
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+
+from django.db.models import Count
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from appointments.models import Appointment, SlotHold
+from authentication.models import User
+from departments.models import Doctor, DoctorSchedule
+from patients.models import Patient
+
+BASE_URL = os.environ.get('BENCHMARK_BASE_URL', 'http://127.0.0.1:8000/api/v1')
+PREFIX = 'hold_load'
+
+
+def cleanup():
+    User.objects.filter(username__startswith=PREFIX).delete()
+
+
+def seed(bookers, slots):
+    date = timezone.localdate() + timedelta(days=2)
+    doctor_user = User.objects.create_user(username=f'{PREFIX}_doctor', email=f'{PREFIX}_doctor@test.com',
+                                           last_name='Popular', role='doctor')
+    doctor = Doctor.objects.create(
+        user=doctor_user, doctor_id='DOC-HOLD-LOAD', specialization='cardiology',
+        license_number='LIC-HOLD-LOAD', qualification='MD', experience_years=20,
+        consultation_fee=900, phone='1234567890',
+    )
+    end = 9 * 60 + 20 * slots
+    DoctorSchedule.objects.create(doctor=doctor, weekday=date.weekday(), start_time='09:00',
+                                  end_time=f'{end // 60:02d}:{end % 60:02d}', slot_duration=20)
+    times = [f'{(9 * 60 + 20 * i) // 60:02d}:{(9 * 60 + 20 * i) % 60:02d}' for i in range(slots)]
+
+    users = User.objects.bulk_create([
+        User(username=f'{PREFIX}_patient{i}', email=f'{PREFIX}_patient{i}@test.com', role='patient')
+        for i in range(bookers)
+    ])
+    Patient.objects.bulk_create([
+        Patient(user=user, patient_id=f'P-HL-{i:05d}', date_of_birth='1990-01-01', gender='F')
+        for i, user in enumerate(users)
+    ])
+    tokens = [str(RefreshToken.for_user(user).access_token) for user in users]
+    return doctor, str(date), times, tokens
+
+
+def book_direct(session, doctor, date, slot, outcomes):
+    response = session.post(f'{BASE_URL}/appointments/appointments/', json={
+        'doctor': doctor.id, 'appointment_date': date, 'appointment_time': slot, 'reason': 'Load test',
+    })
+    outcomes[f'book {response.status_code}'] += 1
+    return response.status_code == 201
+
+
+def book_with_hold(session, doctor, date, slot, outcomes):
+    response = session.post(f'{BASE_URL}/appointments/holds/', json={
+        'doctor': doctor.id, 'appointment_date': date, 'appointment_time': slot,
+    })
+    outcomes[f'hold {response.status_code}'] += 1
+    if response.status_code != 201:
+        return False
+    response = session.post(f"{BASE_URL}/appointments/holds/{response.json()['id']}/confirm/",
+                            json={'reason': 'Load test'})
+    outcomes[f'confirm {response.status_code}'] += 1
+    return response.status_code == 201
+
+
+def booker(attempt, token, doctor, date, times, start, outcomes, lock, seed):
+    session = requests.Session()
+    session.headers['Authorization'] = f'Bearer {token}'
+    order = list(times)
+    random.Random(seed).shuffle(order)
+    local = Counter()
+    start.wait()
+    for slot in order:
+        try:
+            if attempt(session, doctor, date, slot, local):
+                break
+        except requests.RequestException:
+            local['connection error'] += 1
+    with lock:
+        outcomes.update(local)
+
+
+def run(mode, attempt, doctor, date, times, tokens):
+    Appointment.objects.filter(doctor=doctor).delete()
+    SlotHold.objects.filter(doctor=doctor).delete()
+
+    outcomes, lock = Counter(), threading.Lock()
+    start = threading.Barrier(len(tokens) + 1)
+    threads = [
+        threading.Thread(target=booker, args=(attempt, token, doctor, date, times, start, outcomes, lock, i))
+        for i, token in enumerate(tokens)
+    ]
+    for thread in threads:
+        thread.start()
+    start.wait()
+    began = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - began
+
+    requests_made = sum(count for key, count in outcomes.items() if key != 'connection error')
+    server_errors = sum(count for key, count in outcomes.items() if key.endswith((' 500', ' 502', ' 503')))
+    double_booked = Appointment.objects.filter(doctor=doctor).exclude(status='cancelled').values(
+        'appointment_date', 'appointment_time'
+    ).annotate(n=Count('id')).filter(n__gt=1).count()
+    booked = Appointment.objects.filter(doctor=doctor).count()
+
+    print(f"{mode:7} {elapsed:6.2f}s  {requests_made / elapsed:7.1f} req/s  booked={booked}/{len(times)}  "
+          f"5xx={server_errors}  double-booked slots={double_booked}")
+    print(f"{'':7} {dict(sorted(outcomes.items()))}")
+
+
+def main():
+    if '--cleanup' in sys.argv:
+        cleanup()
+        print("Removed load test rows")
+        return
+
+    bookers = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    slots = int(sys.argv[2]) if len(sys.argv) > 2 else 12
+    cleanup()
+    doctor, date, times, tokens = seed(bookers, slots)
+
+    print("=" * 78)
+    print(f"{bookers} concurrent bookers, {slots} slots on {date}")
+    print("=" * 78)
+    run('direct', book_direct, doctor, date, times, tokens)
+    run('holds', book_with_hold, doctor, date, times, tokens)
+
+    cleanup()
+
+
+if __name__ == '__main__':
+    main()